@@ -0,0 +1,660 @@
+"""
+Benchmark de las etapas del pipeline sobre fixtures sintéticos, sin red.
+
+Genera en un directorio temporal un Table.html grande, PDFs de varias páginas,
+JPEGs de páginas y de encabezados, api_outputs y jsons normalizados, y levanta un
+servidor HTTP local que sustituye al host de los PDFs (GET /pdfs/<archivo>) y al
+endpoint de OpenAI (POST /v1/chat/completions). Cada etapa se mide llamando a la
+misma función que usa su script:
+
+    nuevos_documentos  parsear_tabla + construir_documentos   (a_nuevos_documentos)
+    descarga           download_file                          (c_scraper_parallel)
+    imagenes           process_pdf                            (d_extract_images)
+    imagenes_alta      process_pdf con MULTIRESOLUCION=False  (d_extract_images)
+    clasificacion      classify_and_save                      (e_classifier_images)
+    zonas              procesar_imagen                        (f_zones)
+    ocr                procesar_imagen                        (b_openai_api)
+    ocr_lotes          procesar_lote                          (b_openai_api)
+    ocr_router         procesar_lote + EnrutadorModelos       (b_openai_api)
+    normalizar         agrupar_paginas_por_documento          (c_normalizar_jsons)
+    json_unico         construir_registros                    (d_generar_json_unico)
+
+Los modelos se construyen sin pesos entrenados (misma arquitectura, mismo costo)
+para no depender de descargas. Las etapas cuyas dependencias no están instaladas
+se registran como omitidas.
+
+Cada ejecución se guarda en bench_resultados/<fecha>_<commit>.json para comparar
+entre commits.
+
+Uso:
+    python bench_pipeline.py                          # mide todas las etapas
+    python bench_pipeline.py --etapas descarga ocr    # solo algunas etapas
+    python bench_pipeline.py --comparar               # compara los dos últimos resultados
+    python bench_pipeline.py --comparar abc1234 def5678
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+BASE_DIR = Path(__file__).resolve().parent
+SCRAPING_DIR = BASE_DIR / "scraping"
+ENCABEZADOS_DIR = BASE_DIR / "encabezados"
+RESULTADOS_DIR = BASE_DIR / "bench_resultados"
+
+# 🔧 Tamaño de los fixtures
+REPETICIONES = 3
+REPETICIONES_TABLA = 50  # Copias de las filas del Table.html real
+NUM_PDFS = 6
+PAGINAS_POR_PDF = 4
+NUM_ENCABEZADOS = 24
+NUM_DOCUMENTOS_JSON = 400
+PAGINAS_POR_DOCUMENTO = 6
+SEMILLA = 42
+
+# Páginas A4: 100 DPI al generar el PDF; d_extract_images las rasteriza a su DPI
+TAMANO_PAGINA = (827, 1169)
+TAMANO_ENCABEZADO = (1600, 220)
+
+# Respuesta simulada del endpoint de OpenAI
+RESPUESTA_OCR = {
+    "tipo": "VOTACIÓN",
+    "fecha": "07/03/2025",
+    "hora": "06:54 PM",
+    "asunto": "PROYECTO DE LEY QUE MODIFICA LA LEY ORGÁNICA DE ELECCIONES",
+}
+TOKENS_PROMPT = 1100
+TOKENS_COMPLETION = 60
+# El modelo barato del enrutador devuelve una hora ilegible en 1 de cada N encabezados
+MODELO_BARATO = "gpt-4o-mini"
+INVALIDO_CADA = 4
+
+# Fechas y horas con las variantes que devuelve el OCR
+FECHAS = ["07/03/2025", "7/3/25", "07-03-2025", "07.03.2025", "7 /03/2025", None, "SIN FECHA"]
+HORAS = ["06:54 PM", "06:54:PM", "6:54PM", "18:54", "18:54:12", "00:06 AM", "06.54 P.M.", None]
+
+
+# ========== FIXTURES ==========
+
+
+def _dibujar_pagina(tamano: tuple[int, int], rng: random.Random) -> Image.Image:
+    """Página en escala de grises con líneas de "texto" y una tabla, similar a un acta."""
+    ancho, alto = tamano
+    imagen = Image.new("L", tamano, 255)
+    dibujo = ImageDraw.Draw(imagen)
+
+    y = int(alto * 0.05)
+    while y < alto * 0.95:
+        x = int(ancho * 0.08)
+        while x < ancho * 0.9:
+            largo = rng.randint(ancho // 40, ancho // 8)
+            dibujo.rectangle([x, y, x + largo, y + max(2, alto // 150)], fill=rng.randint(0, 60))
+            x += largo + ancho // 60
+        y += max(6, alto // 45)
+
+    for fila in range(0, alto // 2, max(10, alto // 30)):
+        dibujo.line([(0, alto // 3 + fila), (ancho, alto // 3 + fila)], fill=90)
+    return imagen
+
+
+def generar_pdfs(destino: Path, num_pdfs: int, paginas: int, rng: random.Random) -> list[str]:
+    destino.mkdir(parents=True, exist_ok=True)
+    nombres = []
+    for i in range(num_pdfs):
+        nombre = f"{uuid.uuid5(uuid.NAMESPACE_URL, f'https://example.org/{i}.pdf')}.pdf"
+        imagenes = [_dibujar_pagina(TAMANO_PAGINA, rng) for _ in range(paginas)]
+        imagenes[0].save(
+            destino / nombre, "PDF", resolution=100, save_all=True, append_images=imagenes[1:]
+        )
+        nombres.append(nombre)
+    return nombres
+
+
+def generar_imagenes(
+    destino: Path, cantidad: int, tamano: tuple[int, int], sufijo: str, rng: random.Random
+) -> list[Path]:
+    destino.mkdir(parents=True, exist_ok=True)
+    rutas = []
+    for i in range(cantidad):
+        doc_id = uuid.uuid5(uuid.NAMESPACE_URL, f"https://example.org/{i // 4}.pdf")
+        ruta = destino / f"{doc_id}_page{i % 4 + 1:03d}_{sufijo}.jpg"
+        _dibujar_pagina(tamano, rng).save(ruta, "JPEG", quality=90)
+        rutas.append(ruta)
+    return rutas
+
+
+def generar_api_outputs(
+    destino: Path, num_documentos: int, paginas: int, rng: random.Random
+) -> list[str]:
+    """JSONs con el formato de b_openai_api ({"output": ..., "meta": ...}); retorna los doc_id."""
+    destino.mkdir(parents=True, exist_ok=True)
+    doc_ids = []
+    for i in range(num_documentos):
+        doc_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"https://example.org/doc{i}.pdf"))
+        doc_ids.append(doc_id)
+        for pagina in range(1, paginas + 1):
+            salida = {
+                "output": {
+                    "tipo": rng.choice(["VOTACIÓN", "ASISTENCIA"]),
+                    "fecha": rng.choice(FECHAS),
+                    "hora": rng.choice(HORAS),
+                    "asunto": RESPUESTA_OCR["asunto"],
+                },
+                "meta": {
+                    "model": "gpt-5-mini",
+                    "tokens": {
+                        "prompt": TOKENS_PROMPT,
+                        "completion": TOKENS_COMPLETION,
+                        "total": TOKENS_PROMPT + TOKENS_COMPLETION,
+                    },
+                    "cost_usd": 0.0004,
+                },
+            }
+            with (destino / f"{doc_id}_page{pagina:03d}_.json").open("w", encoding="utf-8") as f:
+                json.dump(salida, f, ensure_ascii=False, indent=2)
+    return doc_ids
+
+
+# ========== SERVIDOR LOCAL (host de PDFs + OpenAI) ==========
+
+
+class _ManejadorLocal(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Encabezados y cuerpo van en escrituras separadas: con Nagle + ACK retardado cada
+    # respuesta keep-alive esperaría ~40 ms que la API real no agrega
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, estado: int, cuerpo: bytes, tipo: str) -> None:
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        ruta = self.server.pdfs_dir / Path(self.path).name
+        if not self.path.startswith("/pdfs/") or not ruta.is_file():
+            self._responder(404, b"no encontrado", "text/plain")
+            return
+        self._responder(200, ruta.read_bytes(), "application/pdf")
+
+    def _respuesta_ocr(self, modelo: str) -> dict:
+        if modelo == MODELO_BARATO and next(self.server.contador_barato) % INVALIDO_CADA == 0:
+            return {**RESPUESTA_OCR, "hora": "HORA ILEGIBLE"}
+        return RESPUESTA_OCR
+
+    def do_POST(self):
+        cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._responder(404, b"{}", "application/json")
+            return
+
+        # Solicitudes por lotes: cada imagen va precedida de un texto "ID: <id>"
+        ids = [
+            parte["text"].removeprefix("ID: ")
+            for parte in cuerpo["messages"][-1]["content"]
+            if parte["type"] == "text" and parte["text"].startswith("ID: ")
+        ]
+        modelo = cuerpo.get("model", "gpt-5-mini")
+        respuestas = [self._respuesta_ocr(modelo) for _ in ids or [None]]
+        contenido = dict(zip(ids, respuestas)) if ids else respuestas[0]
+
+        respuesta = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": modelo,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {
+                        "role": "assistant",
+                        "content": json.dumps(contenido, ensure_ascii=False),
+                    },
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": TOKENS_PROMPT * max(1, len(ids)),
+                "completion_tokens": TOKENS_COMPLETION * max(1, len(ids)),
+                "total_tokens": (TOKENS_PROMPT + TOKENS_COMPLETION) * max(1, len(ids)),
+            },
+        }
+        self._responder(200, json.dumps(respuesta).encode("utf-8"), "application/json")
+
+
+@contextmanager
+def servidor_local(pdfs_dir: Path):
+    """Levanta el servidor en un puerto libre de 127.0.0.1 y retorna su URL base."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ManejadorLocal)
+    servidor.pdfs_dir = pdfs_dir
+    servidor.contador_barato = itertools.count(1)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    try:
+        yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+# ========== MEDICIÓN ==========
+
+
+def medir(funcion, unidades: int, unidad: str, preparar=None) -> dict:
+    """Ejecuta `funcion` REPETICIONES veces (con `preparar` fuera del tiempo medido)."""
+    tiempos = []
+    for _ in range(REPETICIONES):
+        if preparar:
+            preparar()
+        # Los prints de progreso de los scripts no ensucian la tabla de resultados
+        with redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    mejor = min(tiempos)
+    return {
+        "segundos": round(mejor, 4),
+        "mediana": round(statistics.median(tiempos), 4),
+        "unidades": unidades,
+        "unidad": unidad,
+        "por_segundo": round(unidades / mejor, 2) if mejor else None,
+    }
+
+
+def _carpeta_limpia(ruta: Path):
+    def preparar():
+        if ruta.exists():
+            for archivo in ruta.rglob("*"):
+                if archivo.is_file():
+                    archivo.unlink()
+        ruta.mkdir(parents=True, exist_ok=True)
+
+    return preparar
+
+
+# ========== ETAPAS ==========
+
+
+def bench_nuevos_documentos(ctx: dict) -> dict:
+    from a_nuevos_documentos import construir_documentos, parsear_tabla
+    from bench_a_nuevos_documentos import generar_table_html
+
+    table_html = generar_table_html(
+        ctx["tmp"] / "Table.html", REPETICIONES_TABLA, origen=SCRAPING_DIR / "data" / "Table.html"
+    )
+    registros = parsear_tabla(table_html)
+    return medir(
+        lambda: construir_documentos(parsear_tabla(table_html)), len(registros), "registros"
+    )
+
+
+def bench_descarga(ctx: dict) -> dict:
+    import c_scraper_parallel as descarga
+
+    descarga.DOWNLOAD_DIR = str(ctx["tmp"] / "descargas")
+    filas = [
+        {"file_name": nombre, "clean_link": f"{ctx['url']}/pdfs/{nombre}"} for nombre in ctx["pdfs"]
+    ]
+
+    def descargar():
+        with ThreadPoolExecutor(max_workers=descarga.MAX_WORKERS) as executor:
+            for _, ok, error in executor.map(
+                lambda i: descarga.download_file(i, filas[i]), range(len(filas))
+            ):
+                if not ok:
+                    raise RuntimeError(error)
+
+    return medir(
+        descargar, len(filas), "documentos", preparar=_carpeta_limpia(Path(descarga.DOWNLOAD_DIR))
+    )
+
+
+def bench_imagenes(ctx: dict, multiresolucion: bool = True) -> dict:
+    import d_extract_images as imagenes
+
+    imagenes.PDFS_FOLDER = str(ctx["pdfs_dir"])
+    imagenes.IMAGES_FOLDER = str(ctx["tmp"] / "images")
+
+    def rasterizar():
+        for nombre in ctx["pdfs"]:
+            imagenes.process_pdf(nombre)
+
+    imagenes.MULTIRESOLUCION = multiresolucion
+    try:
+        return medir(
+            rasterizar,
+            len(ctx["pdfs"]) * PAGINAS_POR_PDF,
+            "páginas",
+            preparar=_carpeta_limpia(Path(imagenes.IMAGES_FOLDER)),
+        )
+    finally:
+        imagenes.MULTIRESOLUCION = True
+
+
+def bench_imagenes_alta(ctx: dict) -> dict:
+    """Todas las páginas a DPI, como antes de la rasterización multirresolución."""
+    return bench_imagenes(ctx, multiresolucion=False)
+
+
+def bench_clasificacion(ctx: dict) -> dict:
+    import e_classifier_images as clasificacion
+    import torch
+    from torchvision import models
+
+    # Arquitectura del script con pesos aleatorios: el costo de inferencia es el mismo
+    modelo = getattr(models, clasificacion.MODEL_NAME)(
+        weights=None, num_classes=len(clasificacion.CLASS_NAMES)
+    )
+    device = clasificacion.obtener_device()
+    modelo.to(device).eval()
+    transform = clasificacion.crear_transform(clasificacion.MODEL_NAME)
+    salida = ctx["tmp"] / "classification"
+
+    def clasificar():
+        with torch.no_grad():
+            for pagina in ctx["paginas"]:
+                clasificacion.classify_and_save(
+                    str(pagina),
+                    modelo,
+                    transform,
+                    clasificacion.CLASS_NAMES,
+                    str(salida),
+                    device,
+                )
+
+    return medir(clasificar, len(ctx["paginas"]), "páginas", preparar=_carpeta_limpia(salida))
+
+
+def bench_zonas(ctx: dict) -> dict:
+    import d_extract_images as imagenes
+    import f_zones as zonas
+
+    # Las páginas de los fixtures llevan el nombre de los PDFs generados: en modo
+    # multirresolución cada una se vuelve a rasterizar a alta resolución desde su PDF
+    imagenes.PDFS_FOLDER = str(ctx["pdfs_dir"])
+
+    # Sin los pesos entrenados se usa la arquitectura base de ultralytics (sin descargas)
+    pesos = SCRAPING_DIR / zonas.model_path
+    modelo = str(pesos) if pesos.exists() else "yolov8n.yaml"
+    entrada = ctx["paginas"][0].parent
+    salida = ctx["tmp"] / "zones"
+    # Se mide el modelo cargado en el proceso aunque haya un servidor de inferencia corriendo
+    zonas.USAR_SERVIDOR_INFERENCIA = False
+    zonas.cargar_modelo(modelo)
+
+    def recortar():
+        total = len(ctx["paginas"])
+        for idx, pagina in enumerate(ctx["paginas"], start=1):
+            zonas.procesar_imagen((idx, pagina.name, str(entrada), str(salida), modelo, total))
+
+    return medir(recortar, len(ctx["paginas"]), "páginas", preparar=_carpeta_limpia(salida))
+
+
+def _preparar_ocr(ctx: dict, router: bool = False):
+    # El cliente de utils_openai_ocr se crea al importar: apuntarlo antes al servidor local
+    os.environ["OPENAI_BASE_URL"] = f"{ctx['url']}/v1"
+    os.environ["OPENAI_API_KEY"] = "bench"
+    import b_openai_api as ocr
+    from utils_router_modelos import EnrutadorModelos
+
+    # ocr y ocr_lotes miden un solo modelo; ocr_router, el enrutador con estadísticas limpias
+    ocr.enrutador = EnrutadorModelos(ocr.NIVELES_MODELOS, prompt=ocr.PROMPT) if router else None
+    ocr.OUTPUT_DIR = str(ctx["tmp"] / "api_outputs_ocr")
+    filas = [
+        {
+            "file_name": ruta.name,
+            "json_name": f"{ruta.name.split('_encabezado')[0]}_.json",
+            "image_path": str(ruta),
+        }
+        for ruta in ctx["encabezados"]
+    ]
+    return ocr, filas
+
+
+def bench_ocr(ctx: dict) -> dict:
+    ocr, filas = _preparar_ocr(ctx)
+
+    def transcribir():
+        for idx, fila in enumerate(filas, start=1):
+            ok, file_name, error = ocr.procesar_imagen(fila, idx, len(filas))
+            if not ok:
+                raise RuntimeError(f"{file_name}: {error}")
+        # Los mensajes encolados se imprimen dentro del tiempo medido (y de la redirección)
+        ocr.metricas.vaciar()
+
+    return medir(
+        transcribir, len(filas), "encabezados", preparar=_carpeta_limpia(Path(ocr.OUTPUT_DIR))
+    )
+
+
+def bench_ocr_lotes(ctx: dict, router: bool = False) -> dict:
+    ocr, filas = _preparar_ocr(ctx, router)
+    lotes = [filas[i : i + ocr.BATCH_SIZE] for i in range(0, len(filas), ocr.BATCH_SIZE)]
+
+    def transcribir():
+        for inicio, lote in enumerate(lotes):
+            for ok, file_name, error in ocr.procesar_lote(
+                lote, inicio * ocr.BATCH_SIZE + 1, len(filas)
+            ):
+                if not ok:
+                    raise RuntimeError(f"{file_name}: {error}")
+        ocr.metricas.vaciar()
+
+    return medir(
+        transcribir, len(filas), "encabezados", preparar=_carpeta_limpia(Path(ocr.OUTPUT_DIR))
+    )
+
+
+def bench_ocr_router(ctx: dict) -> dict:
+    medicion = bench_ocr_lotes(ctx, router=True)
+    ocr = sys.modules["b_openai_api"]
+    medicion["modelos"] = ocr.enrutador.estadisticas()
+    ocr.enrutador = None
+    return medicion
+
+
+def bench_normalizar(ctx: dict) -> dict:
+    from c_normalizar_jsons import agrupar_paginas_por_documento
+
+    return medir(
+        lambda: agrupar_paginas_por_documento(ctx["api_outputs_dir"]),
+        NUM_DOCUMENTOS_JSON * PAGINAS_POR_DOCUMENTO,
+        "páginas",
+    )
+
+
+def bench_json_unico(ctx: dict) -> dict:
+    from c_normalizar_jsons import agrupar_paginas_por_documento, escribir_documentos
+    from d_generar_json_unico import cargar_jsons, construir_registros
+
+    jsons_dir = ctx["tmp"] / "jsons"
+    escribir_documentos(agrupar_paginas_por_documento(ctx["api_outputs_dir"]), jsons_dir)
+    urls = {doc_id: f"https://example.org/{doc_id}.pdf" for doc_id in ctx["doc_ids"]}
+
+    return medir(
+        lambda: construir_registros(cargar_jsons(jsons_dir), urls),
+        NUM_DOCUMENTOS_JSON * PAGINAS_POR_DOCUMENTO,
+        "páginas",
+    )
+
+
+ETAPAS = {
+    "nuevos_documentos": bench_nuevos_documentos,
+    "descarga": bench_descarga,
+    "imagenes": bench_imagenes,
+    "imagenes_alta": bench_imagenes_alta,
+    "clasificacion": bench_clasificacion,
+    "zonas": bench_zonas,
+    "ocr": bench_ocr,
+    "ocr_lotes": bench_ocr_lotes,
+    "ocr_router": bench_ocr_router,
+    "normalizar": bench_normalizar,
+    "json_unico": bench_json_unico,
+}
+
+
+def preparar_fixtures(tmp: Path) -> dict:
+    rng = random.Random(SEMILLA)
+    ctx = {"tmp": tmp, "pdfs_dir": tmp / "pdfs_origen"}
+    ctx["pdfs"] = generar_pdfs(ctx["pdfs_dir"], NUM_PDFS, PAGINAS_POR_PDF, rng)
+    ctx["paginas"] = generar_imagenes(
+        tmp / "paginas", NUM_PDFS * PAGINAS_POR_PDF, TAMANO_PAGINA, "", rng
+    )
+    ctx["encabezados"] = generar_imagenes(
+        tmp / "encabezados", NUM_ENCABEZADOS, TAMANO_ENCABEZADO, "encabezado1_", rng
+    )
+    ctx["api_outputs_dir"] = tmp / "api_outputs"
+    ctx["doc_ids"] = generar_api_outputs(
+        ctx["api_outputs_dir"], NUM_DOCUMENTOS_JSON, PAGINAS_POR_DOCUMENTO, rng
+    )
+    return ctx
+
+
+# ========== RESULTADOS ==========
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def guardar_resultado(etapas: dict) -> Path:
+    commit = _git("rev-parse", "--short", "HEAD") or "sin-git"
+    if _git("status", "--porcelain", "--untracked-files=no"):
+        commit += "-dirty"
+
+    resultado = {
+        "commit": commit,
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parametros": {
+            "repeticiones": REPETICIONES,
+            "repeticiones_tabla": REPETICIONES_TABLA,
+            "num_pdfs": NUM_PDFS,
+            "paginas_por_pdf": PAGINAS_POR_PDF,
+            "num_encabezados": NUM_ENCABEZADOS,
+            "num_documentos_json": NUM_DOCUMENTOS_JSON,
+            "paginas_por_documento": PAGINAS_POR_DOCUMENTO,
+        },
+        "etapas": etapas,
+    }
+
+    RESULTADOS_DIR.mkdir(parents=True, exist_ok=True)
+    destino = RESULTADOS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}_{commit}.json"
+    with destino.open("w", encoding="utf-8") as file:
+        json.dump(resultado, file, ensure_ascii=False, indent=2)
+        file.write("\n")
+    return destino
+
+
+def _resolver_resultado(referencia: str) -> Path:
+    """Acepta una ruta o un commit (se usa el resultado más reciente de ese commit)."""
+    ruta = Path(referencia)
+    if ruta.is_file():
+        return ruta
+    candidatos = sorted(RESULTADOS_DIR.glob(f"*_{referencia}*.json"))
+    if not candidatos:
+        raise FileNotFoundError(f"No hay resultados guardados para '{referencia}'")
+    return candidatos[-1]
+
+
+def comparar(referencias: list[str]) -> None:
+    if referencias:
+        if len(referencias) != 2:
+            raise SystemExit("--comparar recibe cero o dos referencias (commit o archivo)")
+        rutas = [_resolver_resultado(r) for r in referencias]
+    else:
+        rutas = sorted(RESULTADOS_DIR.glob("*.json"))[-2:]
+        if len(rutas) < 2:
+            raise SystemExit(f"Se necesitan al menos dos resultados en {RESULTADOS_DIR}")
+
+    antes, despues = (json.loads(r.read_text(encoding="utf-8")) for r in rutas)
+    print(f"📊 {antes['commit']} ({antes['fecha']}) → {despues['commit']} ({despues['fecha']})")
+    for etapa in ETAPAS:
+        a = antes["etapas"].get(etapa, {})
+        b = despues["etapas"].get(etapa, {})
+        if "segundos" not in a or "segundos" not in b:
+            print(f"  {etapa:18} {'-':>9}   {'-':>9}")
+            continue
+        cambio = (b["segundos"] - a["segundos"]) / a["segundos"] * 100 if a["segundos"] else 0
+        marca = "🟢" if cambio <= -5 else "🔴" if cambio >= 5 else "⚪"
+        print(
+            f"  {etapa:18} {a['segundos']:8.3f}s → {b['segundos']:8.3f}s  {cambio:+6.1f}% {marca}"
+        )
+
+
+def imprimir_medicion(etapa: str, medicion: dict) -> None:
+    if "omitida" in medicion:
+        print(f"  {etapa:18} ⏭️  omitida ({medicion['omitida']})")
+        return
+    print(
+        f"  {etapa:18} {medicion['segundos']:8.3f}s (mediana {medicion['mediana']:.3f}s) | "
+        f"{medicion['por_segundo']} {medicion['unidad']}/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offline de las etapas del pipeline")
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), help="Etapas a medir")
+    parser.add_argument(
+        "--comparar", nargs="*", metavar="REF", help="Comparar resultados guardados"
+    )
+    args = parser.parse_args()
+
+    if args.comparar is not None:
+        comparar(args.comparar)
+        return
+
+    # Los scripts usan rutas relativas a su carpeta y sus métricas van a una ejecución propia
+    os.environ.setdefault("PIPELINE_RUN_ID", f"bench-{time.strftime('%Y%m%d-%H%M%S')}")
+    sys.path[:0] = [str(SCRAPING_DIR), str(ENCABEZADOS_DIR)]
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        print("🧪 Generando fixtures sintéticos...")
+        ctx = preparar_fixtures(Path(tmp))
+
+        with servidor_local(ctx["pdfs_dir"]) as url:
+            ctx["url"] = url
+            print(f"🌐 Servidor local en {url}\n⏱️  Resultados (mejor de {REPETICIONES}):")
+            for etapa in args.etapas or ETAPAS:
+                try:
+                    resultados[etapa] = ETAPAS[etapa](ctx)
+                except ImportError as e:
+                    resultados[etapa] = {"omitida": f"falta {e.name or e}"}
+                imprimir_medicion(etapa, resultados[etapa])
+
+    destino = guardar_resultado(resultados)
+    print(f"\n💾 Resultado guardado en {destino}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,40 @@
 from __future__ import annotations
 
 import csv
+import json
 import re
 from pathlib import Path
 
 INPUT_DIR = Path("../scraping/data/zones")
+MANIFEST_NAME = "manifiesto.jsonl"
 OUTPUT_PATH = Path("./encabezados.csv")
 
+ZONE_PATTERN = re.compile(r"_encabezado\d+_")
 
-def build_records(input_dir: Path) -> list[tuple[str, str, str]]:
-    pattern = re.compile(r"_encabezado\d+_")
-    records: list[tuple[str, str, str]] = []
+
+def _json_name(stem: str) -> str:
+    return f"{ZONE_PATTERN.sub('_', stem)}.json"
+
+
+def build_records_from_manifest(manifest_path: Path) -> list[tuple[str, str, str, str]]:
+    """Registros a partir del manifiesto de f_zones: página completa + bbox del encabezado."""
+    records: list[tuple[str, str, str, str]] = []
+
+    with manifest_path.open(encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            zone = json.loads(line)
+            file_name = zone["file_name"]
+            bbox = ",".join(str(value) for value in zone["bbox"])
+            records.append((file_name, _json_name(Path(file_name).stem), zone["image_path"], bbox))
+
+    return sorted(records)
+
+
+def build_records(input_dir: Path) -> list[tuple[str, str, str, str]]:
+    """Registros a partir de los JPEG de recortes (f_zones con GUARDAR_RECORTES = True)."""
+    records: list[tuple[str, str, str, str]] = []
 
     for image_path in sorted(input_dir.iterdir()):
         if not image_path.is_file():
@@ -19,21 +43,16 @@ def build_records(input_dir: Path) -> list[tuple[str, str, str]]:
             continue
 
         file_name = image_path.name
-        stem = image_path.stem
-        json_stem = pattern.sub("_", stem)
-        if json_stem == stem:
-            json_stem = stem
-        json_name = f"{json_stem}.json"
-        records.append((file_name, json_name, str(image_path)))
+        records.append((file_name, _json_name(image_path.stem), str(image_path), ""))
 
     return records
 
 
-def write_csv(records: list[tuple[str, str, str]], output_path: Path) -> None:
+def write_csv(records: list[tuple[str, str, str, str]], output_path: Path) -> None:
     output_path.parent.mkdir(parents=True, exist_ok=True)
     with output_path.open(mode="w", newline="", encoding="utf-8") as csvfile:
         writer = csv.writer(csvfile)
-        writer.writerow(["file_name", "json_name", "image_path"])
+        writer.writerow(["file_name", "json_name", "image_path", "bbox"])
         writer.writerows(records)
 
 
@@ -45,7 +64,11 @@ def main() -> None:
     if not input_dir.exists():
         raise FileNotFoundError(f"No se encontró el directorio de entrada: {input_dir}")
 
-    records = build_records(input_dir)
+    manifest_path = input_dir / MANIFEST_NAME
+    if manifest_path.exists():
+        records = build_records_from_manifest(manifest_path)
+    else:
+        records = build_records(input_dir)
     write_csv(records, output_path)
 
 
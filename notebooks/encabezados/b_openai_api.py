@@ -1,5 +1,6 @@
 IMAGE_CSV_PATH = "./encabezados.csv"
 OUTPUT_DIR = "./api_outputs"
+CHECKPOINT_PATH = "./ocr_checkpoint.jsonl"  # estado por json_name (ver utils_checkpoint.py)
 
 
 MODEL = "gpt-5-mini"
@@ -8,23 +9,56 @@ PROMPT = "EN BASE AL TEXTO DE LA IMAGEN DEVUELVE ÚNICAMENTE UN JSON CON LAS LLA
 NUM_WORKERS = 16  # Número de hilos para procesamiento paralelo
 MAX_RETRIES = 3  # Número máximo de reintentos por imagen
 RETRY_DELAY_BASE = 5  # Segundos de espera base entre reintentos (se multiplica exponencialmente)
-
+CONNECT_TIMEOUT = 10  # Segundos máximos para abrir la conexión con la API
+READ_TIMEOUT = 90  # Segundos máximos sin recibir datos de la API
+REQUEST_DEADLINE = 150  # Segundos máximos por llamada; al vencer se cancela y se reintenta
+BATCH_SIZE = 8  # Encabezados por solicitud (1 = una imagen por llamada, sin lotes)
+RESUMEN_INTERVALO = 15  # Segundos entre resúmenes en vivo (costo, tokens/s, latencia p50/p95)
+MAX_FAILED_RUNS = 3  # Ejecuciones fallidas tras las que una imagen se aparca y no se reenvía
+RETRY_PARKED = False  # True = volver a intentar las imágenes aparcadas en esta ejecución
+
+# 🧭 Enrutador: primero el modelo barato con max_tokens ajustado; solo se escalan las
+# respuestas que no cumplen el esquema tipo/fecha/hora/asunto (ver utils_router_modelos.py)
+USAR_ROUTER = True
+# Niveles (modelo, max_tokens) de menor a mayor costo
+NIVELES_MODELOS = [("gpt-4o-mini", 300), (MODEL, 2500)]
+# Historial de latencia, costo y tasa de éxito por modelo; el enrutador parte de él
+ROUTER_STATS_PATH = "./router_estadisticas.json"
+
+import csv
 import os
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
-
-import pandas as pd
-from utils_openai_ocr import process_image_ocr
 
-# Lock para escritura segura en consola
-print_lock = Lock()
+from utils_checkpoint import Checkpoint
+from utils_openai_ocr import (
+    configurar_cliente,
+    configurar_log,
+    process_image_ocr,
+    process_images_ocr_batch,
+)
+from utils_router_modelos import EnrutadorModelos, validar_encabezado
+from utils_metricas import Metricas, MetricasAsincronas, perfilar
+
+# Los workers solo encolan mensajes y eventos; un hilo de fondo los imprime y registra
+metricas = MetricasAsincronas(Metricas("ocr"), intervalo=RESUMEN_INTERVALO)
+enrutador = (
+    EnrutadorModelos(NIVELES_MODELOS, prompt=PROMPT, historial_path=ROUTER_STATS_PATH)
+    if USAR_ROUTER
+    else None
+)
 
 
 def safe_print(message):
-    """Imprime de forma segura en entorno multi-thread"""
-    with print_lock:
-        print(message)
+    """Encola un mensaje sin bloquear al worker (ver MetricasAsincronas)"""
+    metricas.log(message)
+
+
+def _parsear_bbox(valor):
+    """Convierte la columna bbox de encabezados.csv ("x_min,y_min,x_max,y_max") en tupla."""
+    if not isinstance(valor, str) or not valor.strip():
+        return None
+    return tuple(int(v) for v in valor.split(","))
 
 
 def procesar_imagen(row_data, idx, total):
@@ -32,7 +66,7 @@ def procesar_imagen(row_data, idx, total):
     Procesa una imagen individual con reintentos
 
     Args:
-        row_data: dict con la información de la fila (file_name, json_name, image_path)
+        row_data: dict con la información de la fila (file_name, json_name, image_path, bbox)
         idx: índice actual
         total: total de imágenes a procesar
 
@@ -56,14 +90,36 @@ def procesar_imagen(row_data, idx, total):
         try:
             safe_print(f"[{idx}/{total}] Procesando: {file_name} (intento {intento}/{MAX_RETRIES})")
 
-            result = process_image_ocr(
-                image_path=image_path,
-                resize_percent=100,
-                model=MODEL,
-                max_tokens=2500,
-                prompt=PROMPT,
-                output_path=output_path,
-            )
+            with metricas.medir("llamada", llamadas=1) as datos:
+                datos["errores"] = 1
+                if enrutador is not None:
+                    result = enrutador.procesar(
+                        image_path,
+                        output_path=output_path,
+                        bbox=_parsear_bbox(row_data.get("bbox")),
+                    )
+                else:
+                    result = process_image_ocr(
+                        image_path=image_path,
+                        resize_percent=100,
+                        model=MODEL,
+                        max_tokens=2500,
+                        prompt=PROMPT,
+                        output_path=output_path,
+                        bbox=_parsear_bbox(row_data.get("bbox")),
+                    )
+                datos["errores"] = 0
+                datos["tokens_prompt"] = result["meta"]["tokens"]["prompt"]
+                datos["tokens_completion"] = result["meta"]["tokens"]["completion"]
+                datos["costo_usd"] = (
+                    result["meta"]
+                    .get("router", {})
+                    .get("cost_usd_total", result["meta"]["cost_usd"])
+                )
+                # Tokens de imagen estimados sin y con preprocesado (ver utils_preprocesado.py)
+                imagen = result["meta"].get("imagen", {})
+                datos["tokens_imagen_antes"] = imagen.get("tokens_antes", 0)
+                datos["tokens_imagen_despues"] = imagen.get("tokens_despues", 0)
 
             safe_print(f"[{idx}/{total}] ✓ {file_name} - Guardado exitosamente")
             return (True, file_name, None)
@@ -85,101 +141,269 @@ def procesar_imagen(row_data, idx, total):
     return (False, file_name, "Número máximo de reintentos alcanzado")
 
 
-# Crear directorio de salida si no existe
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-# Leer el CSV
-df = pd.read_csv(IMAGE_CSV_PATH)
-
-# Obtener lista de archivos JSON ya procesados
-archivos_procesados = set()
-if os.path.exists(OUTPUT_DIR):
-    for archivo in os.listdir(OUTPUT_DIR):
-        if archivo.endswith(".json"):
-            archivos_procesados.add(archivo)
-
-print("\n" + "=" * 60)
-print("📊 ESTADO DEL PROCESAMIENTO")
-print("=" * 60)
-print(f"📁 Total de imágenes en CSV: {len(df)}")
-print(f"✅ Ya procesadas correctamente (se omitirán): {len(archivos_procesados)}")
-
-# Filtrar el DataFrame para excluir los ya procesados
-df_filtrado = df[~df["json_name"].isin(archivos_procesados)]
-
-print(f"🔄 Pendientes por procesar: {len(df_filtrado)}")
-print(f"⚙️  Trabajadores paralelos: {NUM_WORKERS}")
-print(f"🔁 Reintentos máximos por imagen: {MAX_RETRIES}")
-print(f"⏱️  Delay base entre reintentos: {RETRY_DELAY_BASE}s")
-
-if len(archivos_procesados) > 0:
-    porcentaje_completado = (len(archivos_procesados) / len(df)) * 100
-    print(f"📈 Progreso total: {porcentaje_completado:.1f}% completado")
-
-print("=" * 60)
-
-# Verificar si hay algo que procesar
-if len(df_filtrado) == 0:
-    print("\n✨ ¡Todo está procesado! No hay imágenes pendientes.\n")
-    exit(0)
-
-# Preparar datos para procesamiento paralelo
-tareas = []
-for idx, (index, row) in enumerate(df_filtrado.iterrows(), 1):
-    row_data = {
-        "file_name": row["file_name"],
-        "json_name": row["json_name"],
-        "image_path": row["image_path"],
-    }
-    tareas.append((row_data, idx, len(df_filtrado)))
-
-# Procesar en paralelo con ThreadPoolExecutor
-start_time = time.time()
-exitosos = 0
-fallidos = 0
-errores = []
-
-print(f"\n🚀 Iniciando procesamiento paralelo...\n")
-
-with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
-    # Enviar todas las tareas
-    futures = {executor.submit(procesar_imagen, *tarea): tarea for tarea in tareas}
-
-    # Procesar resultados conforme se completan
-    for future in as_completed(futures):
+def procesar_lote(filas, idx, total):
+    """
+    Procesa un lote de encabezados en una sola llamada (ver process_images_ocr_batch).
+    Si el lote falla tras MAX_RETRIES intentos, cada imagen se procesa por separado.
+
+    Returns:
+        list[tuple]: (success, file_name, error_msg) por cada fila del lote
+    """
+    if len(filas) == 1:
+        return [procesar_imagen(filas[0], idx, total)]
+
+    items = [
+        {
+            "image_path": fila["image_path"],
+            "output_path": os.path.join(OUTPUT_DIR, fila["json_name"]),
+            "bbox": _parsear_bbox(fila.get("bbox")),
+        }
+        for fila in filas
+        if os.path.exists(fila["image_path"])
+    ]
+    if len(items) < len(filas):
+        # Las filas sin imagen se reportan como en procesar_imagen
+        return [procesar_imagen(fila, idx + i, total) for i, fila in enumerate(filas)]
+
+    # Con enrutador, el lote va al nivel activo más barato y solo se escalan las respuestas
+    # inválidas a los niveles siguientes
+    modelo, max_tokens = MODEL, 2500
+    fallback = None
+    lote = {}  # duración de la llamada del lote, medida al llegar la primera respuesta inválida
+    if enrutador is not None:
+        nivel = enrutador.primer_nivel_activo()
+        modelo, max_tokens = enrutador.niveles[nivel]
+        siguiente = min(nivel + 1, len(enrutador.niveles) - 1)
+
+        def fallback(item):
+            # process_images_ocr_batch llama a fallback recién terminada la llamada del lote
+            lote.setdefault("segundos", time.perf_counter() - inicio)
+            enrutador.registrar(modelo, lote["segundos"] / len(items), valido=False)
+            return enrutador.procesar(
+                item["image_path"],
+                output_path=item["output_path"],
+                bbox=item["bbox"],
+                desde=siguiente,
+            )
+
+    rango = f"{idx}-{idx + len(filas) - 1}/{total}"
+    for intento in range(1, MAX_RETRIES + 1):
         try:
-            success, file_name, error_msg = future.result()
-            if success:
-                exitosos += 1
-            else:
-                fallidos += 1
-                if error_msg:
-                    errores.append((file_name, error_msg))
+            safe_print(
+                f"[{rango}] Procesando lote de {len(filas)} (intento {intento}/{MAX_RETRIES})"
+            )
+
+            with metricas.medir("llamada", llamadas=1, encabezados=len(filas)) as datos:
+                datos["errores"] = 1
+                lote.clear()
+                inicio = time.perf_counter()
+                salidas = process_images_ocr_batch(
+                    items,
+                    resize_percent=100,
+                    model=modelo,
+                    max_tokens=max_tokens,
+                    prompt=PROMPT,
+                    # Cada imagen del lote debe cumplir el mismo esquema que una respuesta
+                    # individual; las que no, se reprocesan por separado
+                    validar=validar_encabezado,
+                    fallback=fallback,
+                )
+                datos["errores"] = 0
+                datos["tokens_prompt"] = sum(s["meta"]["tokens"]["prompt"] for s in salidas)
+                datos["tokens_completion"] = sum(s["meta"]["tokens"]["completion"] for s in salidas)
+                datos["costo_usd"] = sum(
+                    s["meta"].get("router", {}).get("cost_usd_total", s["meta"]["cost_usd"])
+                    for s in salidas
+                )
+                imagenes = [s["meta"].get("imagen", {}) for s in salidas]
+                datos["tokens_imagen_antes"] = sum(i.get("tokens_antes", 0) for i in imagenes)
+                datos["tokens_imagen_despues"] = sum(i.get("tokens_despues", 0) for i in imagenes)
+
+            if enrutador is not None:
+                # Latencia aproximada por encabezado: duración de la llamada del lote (sin
+                # las llamadas individuales de los escalados) entre su tamaño
+                segundos = lote.get("segundos", time.perf_counter() - inicio) / len(items)
+                for s in salidas:
+                    if "router" not in s["meta"]:  # resuelto por el lote, sin escalar
+                        enrutador.registrar(
+                            modelo, segundos, valido=True, costo=s["meta"]["cost_usd"]
+                        )
+
+            safe_print(f"[{rango}] ✓ Lote guardado exitosamente")
+            return [(True, fila["file_name"], None) for fila in filas]
+
         except Exception as e:
-            fallidos += 1
-            safe_print(f"✗ Error inesperado en thread: {str(e)}")
-
-# Resumen final
-elapsed_time = time.time() - start_time
-total_procesados = exitosos + fallidos
-
-print("\n" + "=" * 60)
-print("RESUMEN DE PROCESAMIENTO")
-print("=" * 60)
-print(f"Total procesados: {total_procesados}")
-print(f"✓ Exitosos: {exitosos}")
-print(f"✗ Fallidos: {fallidos}")
-print(f"⏱ Tiempo total: {elapsed_time:.2f} segundos")
-if total_procesados > 0:
-    print(f"⚡ Promedio: {elapsed_time/total_procesados:.2f} seg/imagen")
-print("=" * 60)
-
-# Mostrar errores si hay
-if errores:
-    print("\nERRORES ENCONTRADOS:")
-    print("-" * 60)
-    for file_name, error_msg in errores[:10]:  # Mostrar máximo 10 errores
-        print(f"  • {file_name}: {error_msg}")
-    if len(errores) > 10:
-        print(f"  ... y {len(errores) - 10} errores más")
-    print("-" * 60)
+            if intento < MAX_RETRIES:
+                delay = RETRY_DELAY_BASE * (2 ** (intento - 1))
+                safe_print(f"[{rango}] ⚠ Error en lote (reintentando en {delay}s): {e}")
+                time.sleep(delay)
+            else:
+                safe_print(f"[{rango}] ✗ Lote fallido, se procesa imagen por imagen: {e}")
+
+    return [procesar_imagen(fila, idx + i, total) for i, fila in enumerate(filas)]
+
+
+def abrir_checkpoint():
+    """
+    Abre el checkpoint; la primera vez lo siembra con los JSON que ya existen en
+    OUTPUT_DIR (único listado del directorio) para no volver a procesarlos.
+    """
+    nuevo = not os.path.exists(CHECKPOINT_PATH)
+    checkpoint = Checkpoint(CHECKPOINT_PATH)
+    if nuevo and os.path.isdir(OUTPUT_DIR):
+        existentes = (a for a in os.listdir(OUTPUT_DIR) if a.endswith(".json"))
+        sembrados = checkpoint.sembrar(existentes)
+        print(f"🗂️  Checkpoint creado con {sembrados} JSON existentes en {OUTPUT_DIR}")
+    return checkpoint
+
+
+def cargar_pendientes(checkpoint):
+    """Recorre el CSV y retorna (filas pendientes, filas totales, ya procesadas, aparcadas)."""
+    max_intentos = None if RETRY_PARKED else MAX_FAILED_RUNS
+    filas = []
+    total = procesadas = aparcadas = 0
+    with open(IMAGE_CSV_PATH, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            total += 1
+            if checkpoint.completado(row["json_name"]):
+                procesadas += 1
+            elif not checkpoint.pendiente(row["json_name"], max_intentos):
+                aparcadas += 1
+            else:
+                filas.append(
+                    {
+                        "file_name": row["file_name"],
+                        "json_name": row["json_name"],
+                        "image_path": row["image_path"],
+                        "bbox": row.get("bbox"),
+                    }
+                )
+    return filas, total, procesadas, aparcadas
+
+
+def main():
+    # Crear directorio de salida si no existe
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    checkpoint = abrir_checkpoint()
+    filas, total_csv, procesadas, aparcadas = cargar_pendientes(checkpoint)
+
+    print("\n" + "=" * 60)
+    print("📊 ESTADO DEL PROCESAMIENTO")
+    print("=" * 60)
+    print(f"📁 Total de imágenes en CSV: {total_csv}")
+    print(f"✅ Ya procesadas correctamente (se omitirán): {procesadas}")
+    print(f"🅿️  Aparcadas tras {MAX_FAILED_RUNS} ejecuciones fallidas: {aparcadas}")
+    print(f"🔄 Pendientes por procesar: {len(filas)}")
+    print(f"⚙️  Trabajadores paralelos: {NUM_WORKERS}")
+    print(f"🔁 Reintentos máximos por imagen: {MAX_RETRIES}")
+    print(f"⏱️  Delay base entre reintentos: {RETRY_DELAY_BASE}s")
+    print(f"⌛ Deadline por llamada: {REQUEST_DEADLINE}s (lectura {READ_TIMEOUT}s)")
+    print(f"📦 Encabezados por solicitud: {BATCH_SIZE}")
+
+    if procesadas > 0:
+        porcentaje_completado = (procesadas / total_csv) * 100
+        print(f"📈 Progreso total: {porcentaje_completado:.1f}% completado")
+
+    print("=" * 60)
+
+    # Verificar si hay algo que procesar
+    if len(filas) == 0:
+        print("\n✨ ¡Todo está procesado! No hay imágenes pendientes.\n")
+        checkpoint.cerrar()
+        return
+
+    # Preparar datos para procesamiento paralelo
+    tamano_lote = max(1, BATCH_SIZE)
+    tareas = [
+        (filas[inicio : inicio + tamano_lote], inicio + 1, len(filas))
+        for inicio in range(0, len(filas), tamano_lote)
+    ]
+
+    # Procesar en paralelo con ThreadPoolExecutor
+    start_time = time.time()
+    exitosos = 0
+    fallidos = 0
+    errores = []
+
+    print(f"\n🚀 Iniciando procesamiento paralelo...\n")
+    # Una conexión keep-alive por worker; las llamadas colgadas se cortan en REQUEST_DEADLINE
+    configurar_cliente(
+        workers=NUM_WORKERS,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        deadline=REQUEST_DEADLINE,
+    )
+    configurar_log(metricas.log)
+
+    with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+        # Enviar todas las tareas
+        futures = {executor.submit(procesar_lote, *tarea): tarea for tarea in tareas}
+
+        # Procesar resultados conforme se completan
+        # (solo este hilo escribe en el checkpoint: cada resultado queda en disco al llegar)
+        for completadas, future in enumerate(as_completed(futures), start=1):
+            metricas.cola(len(futures) - completadas)
+            filas_lote = futures[future][0]
+            try:
+                resultados = future.result()
+            except Exception as e:
+                resultados = [(False, fila["file_name"], str(e)) for fila in filas_lote]
+                safe_print(f"✗ Error inesperado en thread: {str(e)}")
+
+            for fila, (success, file_name, error_msg) in zip(filas_lote, resultados):
+                checkpoint.registrar(fila["json_name"], success, error_msg)
+                if success:
+                    exitosos += 1
+                else:
+                    fallidos += 1
+                    if error_msg:
+                        errores.append((file_name, error_msg))
+
+    # Vaciar el registro asíncrono antes del resumen final
+    configurar_log(print)
+    metricas.cerrar()
+    if enrutador is not None:
+        enrutador.imprimir_estadisticas()
+        enrutador.guardar_estadisticas(ROUTER_STATS_PATH)
+
+    # Una línea por json_name para que la próxima carga sea igual de rápida
+    if checkpoint.lineas > 2 * len(checkpoint):
+        checkpoint.compactar()
+    checkpoint.cerrar()
+
+    # Resumen final
+    elapsed_time = time.time() - start_time
+    total_procesados = exitosos + fallidos
+
+    print("\n" + "=" * 60)
+    print("RESUMEN DE PROCESAMIENTO")
+    print("=" * 60)
+    print(f"Total procesados: {total_procesados}")
+    print(f"✓ Exitosos: {exitosos}")
+    print(f"✗ Fallidos: {fallidos}")
+    print(f"⏱ Tiempo total: {elapsed_time:.2f} segundos")
+    if total_procesados > 0:
+        print(f"⚡ Promedio: {elapsed_time/total_procesados:.2f} seg/imagen")
+    print("=" * 60)
+
+    # Mostrar errores si hay
+    if errores:
+        print("\nERRORES ENCONTRADOS:")
+        print("-" * 60)
+        for file_name, error_msg in errores[:10]:  # Mostrar máximo 10 errores
+            print(f"  • {file_name}: {error_msg}")
+        if len(errores) > 10:
+            print(f"  ... y {len(errores) - 10} errores más")
+        print("-" * 60)
+
+    aparcadas = checkpoint.errores_aparcados(MAX_FAILED_RUNS)
+    if aparcadas:
+        print(
+            f"\n🅿️  {len(aparcadas)} imágenes aparcadas (no se reenviarán; ver {CHECKPOINT_PATH})"
+        )
+
+
+if __name__ == "__main__":
+    with perfilar("ocr"):
+        main()
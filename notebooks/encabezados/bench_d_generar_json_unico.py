@@ -0,0 +1,225 @@
+"""
+Benchmark de la normalización de fecha/hora de d_generar_json_unico.
+
+Compara la versión original (varios re.sub + hasta seis strptime por registro)
+con el parser precompilado y cacheado:
+
+1. Verifica que ambas devuelven exactamente lo mismo sobre los casos de
+   errores.csv, todas las fechas/horas de jsons/ y variantes sintéticas del OCR.
+2. Mide construir_registros + ordenar + escribir sobre los jsons actuales con
+   cada versión (caché vacía al inicio de cada repetición).
+3. Compara el modo streaming (orden externo por bloques y escritura compacta)
+   con el modo en memoria: mismos registros en el mismo orden y tiempo de cada uno.
+"""
+
+import csv
+import itertools
+import json
+import re
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import d_generar_json_unico as generador
+
+JSONS_DIR = Path("./jsons")
+ERRORES_PATH = Path("./errores.csv")
+DOCUMENTS_HISTORICOS_CSV_PATH = Path("../scraping/data/documentos_historico.csv")
+REPETICIONES = 5
+BLOQUE_PEQUENO = 50  # fuerza varios bloques en disco para verificar la mezcla
+
+
+def _normalizar_fecha_original(fecha: str | None) -> str | None:
+    """Implementación previa, conservada solo como referencia para el benchmark."""
+    if not fecha:
+        return None
+
+    fecha = fecha.strip()
+    fecha = fecha.replace("-", "/").replace(".", "/")
+    fecha = re.sub(r"\s+", "", fecha)
+
+    partes = fecha.split("/")
+    if len(partes) == 3 and len(partes[2]) == 2:
+        partes[2] = f"20{partes[2]}"
+        fecha = "/".join(partes)
+
+    try:
+        fecha_dt = datetime.strptime(fecha, "%d/%m/%Y")
+    except ValueError:
+        return None
+
+    return fecha_dt.strftime("%Y-%m-%d")
+
+
+def _normalizar_hora_original(hora: str | None) -> str | None:
+    """Implementación previa, conservada solo como referencia para el benchmark."""
+    if not hora:
+        return None
+
+    hora = hora.strip().upper()
+    hora = hora.replace(".", "")
+    hora = re.sub(r":\s*(AM|PM)$", r"\1", hora)
+    hora = re.sub(r"(?<=\d)(AM|PM)$", r" \1", hora)
+    hora = re.sub(r"\s+(AM|PM)$", r" \1", hora)
+    hora = re.sub(r"\s+", " ", hora)
+
+    if re.search(r"\b00:(\d{1,2})(?::\d{1,2})?\s*(AM|PM)$", hora):
+        hora = re.sub(r"\b00:", "12:", hora, count=1)
+
+    formatos = ["%I:%M %p", "%I:%M%p", "%I:%M:%S %p", "%I:%M:%S%p", "%H:%M", "%H:%M:%S"]
+    for formato in formatos:
+        try:
+            return datetime.strptime(hora, formato).strftime("%H:%M:%S")
+        except ValueError:
+            continue
+
+    return None
+
+
+def casos_sinteticos() -> tuple[list[str], list[str]]:
+    """Combinaciones de las variantes de formato que produce el OCR."""
+    dias = ["1", "01", "7", "29", "30", "31", "00", "32"]
+    meses = ["2", "02", "12", "13", "0"]
+    anios = ["24", "2024", "2023", "1999", "024", "0000"]
+    separadores = ["/", "-", ".", " / ", "/ "]
+    fechas = [
+        f"{d}{sep}{m}{sep}{a}"
+        for d, m, a, sep in itertools.product(dias, meses, anios, separadores)
+    ]
+    fechas += ["", " ", "SIN FECHA", "07/03", "07/03/2025/1", "07//03/2025", "\t07/03/2025\n"]
+
+    horas_base = ["0", "00", "6", "06", "12", "13", "18", "23", "24"]
+    minutos = ["0", "00", "5", "54", "59", "60"]
+    segundos = [None, "00", "7", "32", "59", "60"]
+    sufijos = ["", " AM", "PM", " pm", ":PM", ": AM", " :PM", " P.M.", "  A.M", " P M", "HRS"]
+    horas = []
+    for h, m, s, sufijo in itertools.product(horas_base, minutos, segundos, sufijos):
+        base = f"{h}:{m}" if s is None else f"{h}:{m}:{s}"
+        horas.append(base + sufijo)
+    horas += ["", " ", "18.30", "06 :54 PM", "06: 54 PM", "06:54::PM", "6:54 p. m.", "10:00:06 AM"]
+    return fechas, horas
+
+
+def cargar_casos() -> tuple[list, list]:
+    fechas, horas = casos_sinteticos()
+
+    if ERRORES_PATH.exists():
+        with ERRORES_PATH.open(encoding="utf-8", newline="") as file:
+            for fila in csv.DictReader(file):
+                fechas.append(fila["fecha"] or None)
+                horas.append(fila["hora"] or None)
+
+    for json_path in generador.cargar_jsons(JSONS_DIR):
+        with json_path.open(encoding="utf-8") as file:
+            for pagina in json.load(file).values():
+                fechas.append(pagina.get("fecha"))
+                horas.append(pagina.get("hora"))
+
+    return fechas, horas
+
+
+def verificar_equivalencia() -> bool:
+    fechas, horas = cargar_casos()
+    generador.normalizar_fecha.cache_clear()
+    generador.normalizar_hora.cache_clear()
+
+    diferencias = [
+        ("fecha", valor, esperado, obtenido)
+        for valor in fechas
+        if (esperado := _normalizar_fecha_original(valor))
+        != (obtenido := generador.normalizar_fecha(valor))
+    ]
+    diferencias += [
+        ("hora", valor, esperado, obtenido)
+        for valor in horas
+        if (esperado := _normalizar_hora_original(valor))
+        != (obtenido := generador.normalizar_hora(valor))
+    ]
+
+    print(f"🔎 Casos comparados: {len(fechas)} fechas, {len(horas)} horas")
+    for campo, valor, esperado, obtenido in diferencias[:20]:
+        print(f"  ❌ {campo} {valor!r}: original={esperado!r} nuevo={obtenido!r}")
+    print(f"  {'resultados idénticos':20} : {'✅' if not diferencias else '❌'}")
+    return not diferencias
+
+
+def construir_archivo(destino: Path) -> int:
+    """Misma secuencia que main(): registros, orden por fecha y escritura del JSON."""
+    urls_por_id = generador.cargar_urls(DOCUMENTS_HISTORICOS_CSV_PATH)
+    registros, _ = generador.construir_registros(generador.cargar_jsons(JSONS_DIR), urls_por_id)
+    registros = generador.ordenar_registros_por_fecha_desc(registros)
+    generador.escribir_registros(registros, destino)
+    return len(registros)
+
+
+def medir(nombre: str, funcion, preparar) -> tuple[float, int]:
+    tiempos = []
+    total = 0
+    for _ in range(REPETICIONES):
+        preparar()
+        inicio = time.perf_counter()
+        total = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"  {nombre:22} : {mejor:7.3f} s (mejor de {REPETICIONES}, {total} registros)")
+    return mejor
+
+
+def main() -> None:
+    verificar_equivalencia()
+
+    nuevas = (generador.normalizar_fecha, generador.normalizar_hora)
+
+    def usar_originales():
+        generador.normalizar_fecha = _normalizar_fecha_original
+        generador.normalizar_hora = _normalizar_hora_original
+
+    def usar_nuevas():
+        generador.normalizar_fecha, generador.normalizar_hora = nuevas
+        for funcion in nuevas:
+            funcion.cache_clear()
+
+    json_paths = generador.cargar_jsons(JSONS_DIR)
+    urls_por_id = generador.cargar_urls(DOCUMENTS_HISTORICOS_CSV_PATH)
+
+    def solo_registros():
+        return len(generador.construir_registros(json_paths, urls_por_id)[0])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        destino = Path(tmp) / "encabezados_unificados.json"
+
+        print("⏱️  construir_registros:")
+        t_original = medir("original (strptime)", solo_registros, usar_originales)
+        t_nuevo = medir("precompilado + caché", solo_registros, usar_nuevas)
+        print(f"  {'speedup':22} : {t_original / t_nuevo:7.2f}x")
+
+        print("⏱️  Archivo completo (registros + orden + escritura):")
+        t_original = medir(
+            "original (strptime)", lambda: construir_archivo(destino), usar_originales
+        )
+        salida_original = destino.read_bytes()
+        t_nuevo = medir("precompilado + caché", lambda: construir_archivo(destino), usar_nuevas)
+        print(f"  {'speedup':22} : {t_original / t_nuevo:7.2f}x")
+
+        identico = destino.read_bytes() == salida_original
+        print(f"  {'JSON idéntico':22} : {'✅' if identico else '❌'}")
+
+        print("⏱️  Streaming (orden externo + escritura compacta):")
+        errores_path = Path(tmp) / "errores.csv"
+        registros_memoria = json.loads(destino.read_bytes())
+
+        def streaming(tamano_bloque=None):
+            return generador.generar_streaming(
+                json_paths, urls_por_id, destino, errores_path, tamano_bloque
+            )[0]
+
+        medir("streaming", streaming, usar_nuevas)
+        for nombre, tamano_bloque in (("un bloque", None), ("bloques de 50", BLOQUE_PEQUENO)):
+            streaming(tamano_bloque)
+            iguales = json.loads(destino.read_bytes()) == registros_memoria
+            print(f"  {'mismos registros':22} : {'✅' if iguales else '❌'} ({nombre})")
+
+
+if __name__ == "__main__":
+    main()
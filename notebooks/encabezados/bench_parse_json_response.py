@@ -0,0 +1,266 @@
+"""
+Benchmark y fuzzing de parse_json_response (utils_openai_ocr).
+
+Compara la versión original (diez re.sub, round-trip unicode-escape y hasta tres
+json.loads fallidos) con la extracción en una pasada:
+
+1. Corpus de respuestas mal formadas que devuelven los modelos (vallas markdown,
+   texto alrededor, repr de Python, comas colgantes, JSON escapado o truncado).
+2. NUM_CASOS variantes aleatorias que combinan esas mutaciones sobre encabezados
+   sintéticos, cada una con su resultado esperado.
+
+Reporta aciertos de cada versión, regresiones (la original acierta y la nueva no)
+y el tiempo sobre respuestas válidas y sobre el corpus completo.
+"""
+
+import json
+import os
+import random
+import re
+import time
+
+# utils_openai_ocr crea el cliente al importarse; no se hace ninguna llamada
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+import utils_openai_ocr
+
+NUM_CASOS = 5000
+REPETICIONES = 5
+SEMILLA = 42
+
+TIPOS = ["ASISTENCIA", "VOTACIÓN", None]
+FECHAS = ["07/03/2025", "7/3/25", "07-03-2025", None]
+HORAS = ["06:54 PM", "18:54", "6:54PM", None]
+ASUNTOS = [
+    "PROYECTO DE LEY QUE MODIFICA LA LEY ORGÁNICA DE ELECCIONES",
+    "MOCIÓN DE ORDEN DEL DÍA N° 1234",
+    'DICTAMEN "EN MAYORÍA" DE LA COMISIÓN DE ECONOMÍA',
+    "LEY DEL 'BUEN PAGADOR'",
+    "CUESTIÓN PREVIA: None True False",
+    "REGISTRO DE ASISTENCIA {SESIÓN} [PLENO]",
+    None,
+]
+
+# Respuestas mal formadas observadas en los modelos: (respuesta, resultado esperado)
+ESPERADO = {"tipo": "VOTACIÓN", "fecha": "07/03/2025", "hora": "06:54 PM", "asunto": "LEY"}
+CORPUS = [
+    ('{"tipo": "VOTACIÓN", "fecha": "07/03/2025", "hora": "06:54 PM", "asunto": "LEY"}', ESPERADO),
+    (
+        '```json\n{"tipo": "VOTACIÓN", "fecha": "07/03/2025", "hora": "06:54 PM", "asunto": "LEY"}\n```',
+        ESPERADO,
+    ),
+    (
+        '```\n{\n  "tipo": "VOTACIÓN",\n  "fecha": "07/03/2025",\n  "hora": "06:54 PM",\n'
+        '  "asunto": "LEY"\n}\n```',
+        ESPERADO,
+    ),
+    (
+        'Aquí está el JSON solicitado:\n{"tipo": "VOTACIÓN", "fecha": "07/03/2025", '
+        '"hora": "06:54 PM", "asunto": "LEY"}\nEspero que sea útil.',
+        ESPERADO,
+    ),
+    (
+        "{'tipo': 'VOTACIÓN', 'fecha': '07/03/2025', 'hora': '06:54 PM', 'asunto': 'LEY'}",
+        ESPERADO,
+    ),
+    (
+        '{"tipo": "VOTACIÓN", "fecha": "07/03/2025", "hora": None, "asunto": None}',
+        {**ESPERADO, "hora": None, "asunto": None},
+    ),
+    (
+        '{"tipo": "VOTACIÓN", "fecha": "07/03/2025", "hora": "06:54 PM", "asunto": "LEY",}',
+        ESPERADO,
+    ),
+    (
+        '"{\\"tipo\\": \\"VOTACIÓN\\", \\"fecha\\": \\"07/03/2025\\", \\"hora\\": \\"06:54 PM\\", '
+        '\\"asunto\\": \\"LEY\\"}"',
+        ESPERADO,
+    ),
+    (
+        '{\\n  \\"tipo\\": \\"VOTACIÓN\\",\\n  \\"fecha\\": \\"07/03/2025\\",\\n  '
+        '\\"hora\\": \\"06:54 PM\\",\\n  \\"asunto\\": \\"LEY\\"\\n}',
+        ESPERADO,
+    ),
+    (
+        '"""{"tipo": "VOTACIÓN", "fecha": "07/03/2025", "hora": "06:54 PM", "asunto": "LEY"}"""',
+        ESPERADO,
+    ),
+    (
+        'json\n{"tipo": "VOTACIÓN", "fecha": "07/03/2025", "hora": "06:54 PM", "asunto": "LEY"}',
+        ESPERADO,
+    ),
+    (
+        '{"1": {"tipo": "VOTACIÓN", "fecha": "07/03/2025", "hora": "06:54 PM", "asunto": "LEY"}, '
+        '"2": {"tipo": "ASISTENCIA", "fecha": null, "hora": null, "asunto": null},}',
+        {"1": ESPERADO, "2": {"tipo": "ASISTENCIA", "fecha": None, "hora": None, "asunto": None}},
+    ),
+    (
+        '{"tipo": "VOTACIÓN", "fecha": "07/03/2025", "hora": "06:54 PM", "asunto": "PROYECTO DE',
+        None,
+    ),
+    ("No se pudo leer el encabezado de la imagen.", None),
+    ("", None),
+]
+
+
+def _log(_mensaje):
+    pass
+
+
+def _parse_json_response_original(content):
+    """Implementación previa, conservada solo como referencia para el benchmark."""
+    original_content = content
+
+    try:
+        content = re.sub(r"^```(?:json|JSON)?\s*\n?", "", content.strip())
+        content = re.sub(r"\n?```\s*$", "", content.strip())
+        content = re.sub(r"^[\'\"\`]{3,}\s*", "", content.strip())
+        content = re.sub(r"\s*[\'\"\`]{3,}$", "", content.strip())
+        content = re.sub(r"^json\s*\n?", "", content.strip(), flags=re.IGNORECASE)
+        content = content.strip()
+        content = re.sub(r"\bNone\b", "null", content)
+        content = re.sub(r"\bTrue\b", "true", content)
+        content = re.sub(r"\bFalse\b", "false", content)
+
+        try:
+            if "\\n" in content or "\\t" in content or '\\"' in content:
+                content = content.encode().decode("unicode-escape")
+        except:
+            pass
+
+        open_braces = content.count("{")
+        close_braces = content.count("}")
+        open_brackets = content.count("[")
+        close_brackets = content.count("]")
+        if open_braces != close_braces or open_brackets != close_brackets:
+            _log("⚠️ Advertencia: JSON posiblemente incompleto")
+
+        parsed = json.loads(content)
+        return parsed
+
+    except (json.JSONDecodeError, Exception) as e:
+        _log(f"⚠️ Error parseando JSON: {str(e)[:100]}")
+        try:
+            return json.loads(original_content)
+        except:
+            try:
+                cleaned = re.sub(r"\bNone\b", "null", original_content)
+                cleaned = re.sub(r"\bTrue\b", "true", cleaned)
+                cleaned = re.sub(r"\bFalse\b", "false", cleaned)
+                return json.loads(cleaned)
+            except:
+                return original_content
+
+
+# ========== FUZZING ==========
+
+
+def _encabezado(rng: random.Random) -> dict:
+    return {
+        "tipo": rng.choice(TIPOS),
+        "fecha": rng.choice(FECHAS),
+        "hora": rng.choice(HORAS),
+        "asunto": rng.choice(ASUNTOS),
+    }
+
+
+MUTACIONES = {
+    "valla_json": lambda t, rng: f"```json\n{t}\n```",
+    "valla": lambda t, rng: f"```\n{t}\n```",
+    "comillas_triples": lambda t, rng: f'"""{t}"""',
+    "texto_antes": lambda t, rng: f"Aquí está el resultado:\n{t}",
+    "texto_despues": lambda t, rng: f"{t}\n\nNota: el asunto podría estar incompleto.",
+    "coma_colgante": lambda t, rng: t[:-1] + rng.choice([",}", ",\n}"]) if t.endswith("}") else t,
+    "indentado": lambda t, rng: t.replace(", ", ",\n  ").replace("{", "{\n  ", 1),
+    "serializado": lambda t, rng: json.dumps(t, ensure_ascii=rng.random() < 0.5),
+    "escapado": lambda t, rng: json.dumps(t, ensure_ascii=False)[1:-1],
+}
+
+
+def generar_casos(cantidad: int, rng: random.Random) -> list[tuple[str, str, object]]:
+    """Retorna (categoría, respuesta, esperado); esperado None = no debe parsearse."""
+    casos = [("corpus", respuesta, esperado) for respuesta, esperado in CORPUS]
+    for _ in range(cantidad):
+        valor = _encabezado(rng)
+        if rng.random() < 0.2:  # respuesta de un lote: {"1": {...}, "2": {...}}
+            valor = {str(i): _encabezado(rng) for i in range(1, rng.randint(2, 8) + 1)}
+
+        if rng.random() < 0.3:
+            casos.append(("valido", json.dumps(valor, ensure_ascii=rng.random() < 0.5), valor))
+            continue
+
+        texto = repr(valor) if rng.random() < 0.3 else json.dumps(valor, ensure_ascii=False)
+        nombres = rng.sample(sorted(MUTACIONES), rng.randint(1, 2))
+        esperado = valor
+        if rng.random() < 0.1:  # respuesta cortada por max_tokens antes de cerrar el objeto
+            texto = texto[: rng.randint(1, len(texto) - 2)]
+            esperado = None
+            nombres = [n for n in nombres if n != "coma_colgante"] + ["truncado"]
+        for nombre in nombres:
+            if nombre in MUTACIONES:
+                texto = MUTACIONES[nombre](texto, rng)
+        casos.append(("+".join(sorted(nombres)), texto, esperado))
+    return casos
+
+
+def _correcto(resultado, esperado) -> bool:
+    if esperado is None:
+        return not isinstance(resultado, (dict, list))
+    return resultado == esperado
+
+
+def verificar(casos: list) -> bool:
+    aciertos = {"original": 0, "nuevo": 0}
+    regresiones = []
+    fallos_por_categoria: dict[str, int] = {}
+    for categoria, respuesta, esperado in casos:
+        ok_original = _correcto(_parse_json_response_original(respuesta), esperado)
+        ok_nuevo = _correcto(utils_openai_ocr.parse_json_response(respuesta), esperado)
+        aciertos["original"] += ok_original
+        aciertos["nuevo"] += ok_nuevo
+        if not ok_nuevo:
+            fallos_por_categoria[categoria] = fallos_por_categoria.get(categoria, 0) + 1
+            if ok_original:
+                regresiones.append((categoria, respuesta))
+
+    print(f"🔎 Casos: {len(casos)} ({len(CORPUS)} del corpus + {NUM_CASOS} aleatorios)")
+    for version, total in aciertos.items():
+        print(f"  {version:22} : {total:6} correctos ({total / len(casos):.1%})")
+    for categoria, total in sorted(fallos_por_categoria.items(), key=lambda x: -x[1])[:10]:
+        print(f"  ⚠️ nuevo falla {total:4} en {categoria}")
+    for categoria, respuesta in regresiones[:10]:
+        print(f"  ❌ regresión [{categoria}]: {respuesta[:120]!r}")
+    print(f"  {'sin regresiones':22} : {'✅' if not regresiones else '❌'}")
+    return not regresiones
+
+
+def medir(nombre: str, funcion, respuestas: list[str]) -> float:
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        for respuesta in respuestas:
+            funcion(respuesta)
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"  {nombre:22} : {mejor * 1e6 / len(respuestas):8.2f} µs/respuesta")
+    return mejor
+
+
+def main() -> None:
+    utils_openai_ocr.configurar_log(_log)
+    casos = generar_casos(NUM_CASOS, random.Random(SEMILLA))
+    verificar(casos)
+
+    grupos = {
+        "válidas": [r for c, r, _ in casos if c == "valido"],
+        "mal formadas": [r for c, r, _ in casos if c != "valido"],
+        "todas": [r for _, r, _ in casos],
+    }
+    for grupo, respuestas in grupos.items():
+        print(f"⏱️  Respuestas {grupo} ({len(respuestas)}):")
+        t_original = medir("original (regex)", _parse_json_response_original, respuestas)
+        t_nuevo = medir("una pasada", utils_openai_ocr.parse_json_response, respuestas)
+        print(f"  {'speedup':22} : {t_original / t_nuevo:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
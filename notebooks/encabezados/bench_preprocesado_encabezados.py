@@ -0,0 +1,173 @@
+"""
+Evaluación del preprocesado de encabezados (utils_preprocesado) antes del OCR.
+
+Toma una muestra de encabezados.csv con imagen disponible y salida ya guardada en
+api_outputs/ (la referencia) y compara el recorte tal cual (resize_percent=100)
+con la imagen preprocesada:
+
+1. Sin red: tamaño, bytes del PNG, tokens de imagen estimados y tiempo de
+   preprocesado por encabezado.
+2. Con --api: envía ambas versiones al modelo y compara cada respuesta con la
+   referencia campo por campo (tipo, fecha y hora normalizadas, asunto por
+   similitud), además de latencia p50/p95, tokens de prompt y costo.
+
+Uso (notebooks/ en PYTHONPATH para utils_metricas):
+    PYTHONPATH=.. python bench_preprocesado_encabezados.py          # solo tamaños y tokens
+    PYTHONPATH=.. python bench_preprocesado_encabezados.py --api --muestra 30
+    PYTHONPATH=.. python bench_preprocesado_encabezados.py --guardar ./preprocesadas
+"""
+
+import argparse
+import csv
+import difflib
+import json
+import os
+import random
+import time
+import unicodedata
+from pathlib import Path
+
+import d_generar_json_unico as generador
+import utils_openai_ocr
+from b_openai_api import IMAGE_CSV_PATH, MODEL, OUTPUT_DIR, PROMPT, _parsear_bbox
+from utils_metricas import percentil
+
+MUESTRA = 20
+SEMILLA = 42
+MAX_TOKENS = 2500
+UMBRAL_ASUNTO = 0.9  # similitud mínima (difflib) para contar el asunto como correcto
+CAMPOS = ("tipo", "fecha", "hora", "asunto")
+
+
+def cargar_muestra(n: int) -> list[dict]:
+    """Filas con imagen existente y referencia en OUTPUT_DIR, muestreadas con SEMILLA."""
+    filas = []
+    with open(IMAGE_CSV_PATH, newline="", encoding="utf-8") as f:
+        for fila in csv.DictReader(f):
+            referencia = Path(OUTPUT_DIR) / fila["json_name"]
+            if not referencia.exists() or not os.path.exists(fila["image_path"]):
+                continue
+            with open(referencia, encoding="utf-8") as r:
+                salida = json.load(r).get("output")
+            if isinstance(salida, dict):
+                filas.append({**fila, "referencia": salida})
+    random.Random(SEMILLA).shuffle(filas)
+    return filas[:n]
+
+
+def _sin_tildes(texto) -> str:
+    texto = unicodedata.normalize("NFKD", str(texto or "")).upper().strip()
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def comparar_campos(salida, referencia: dict) -> dict[str, bool]:
+    """Acierto por campo de una respuesta frente a la referencia."""
+    if not isinstance(salida, dict):
+        return {campo: False for campo in CAMPOS}
+    similitud = difflib.SequenceMatcher(
+        None, _sin_tildes(salida.get("asunto")), _sin_tildes(referencia.get("asunto"))
+    ).ratio()
+    return {
+        "tipo": _sin_tildes(salida.get("tipo")) == _sin_tildes(referencia.get("tipo")),
+        "fecha": generador.normalizar_fecha(salida.get("fecha"))
+        == generador.normalizar_fecha(referencia.get("fecha")),
+        "hora": generador.normalizar_hora(salida.get("hora"))
+        == generador.normalizar_hora(referencia.get("hora")),
+        "asunto": similitud >= UMBRAL_ASUNTO,
+    }
+
+
+def preparar(fila: dict, preprocesar: bool) -> tuple[float, dict, bytes]:
+    utils_openai_ocr.PREPROCESAR_IMAGENES = preprocesar
+    inicio = time.perf_counter()
+    buffer, info = utils_openai_ocr.preparar_imagen(
+        fila["image_path"], 100, _parsear_bbox(fila.get("bbox")), MODEL
+    )
+    return time.perf_counter() - inicio, info, buffer.getvalue()
+
+
+def llamar(fila: dict, preprocesar: bool) -> dict:
+    utils_openai_ocr.PREPROCESAR_IMAGENES = preprocesar
+    inicio = time.perf_counter()
+    resultado = utils_openai_ocr.process_image_ocr(
+        fila["image_path"],
+        resize_percent=100,
+        model=MODEL,
+        max_tokens=MAX_TOKENS,
+        prompt=PROMPT,
+        bbox=_parsear_bbox(fila.get("bbox")),
+    )
+    return {
+        "segundos": time.perf_counter() - inicio,
+        "tokens_prompt": resultado["meta"]["tokens"]["prompt"],
+        "costo_usd": resultado["meta"]["cost_usd"],
+        "aciertos": comparar_campos(resultado["output"], fila["referencia"]),
+    }
+
+
+def imprimir_offline(medidas: dict[str, list]) -> None:
+    print(f"\n📏 Imágenes ({MODEL}):")
+    for nombre, lista in medidas.items():
+        kb = sum(info["bytes"] for _, info, _ in lista) / len(lista) / 1024
+        tokens = sum(info["tokens_despues"] for _, info, _ in lista) / len(lista)
+        tiempos = [segundos * 1000 for segundos, _, _ in lista]
+        print(
+            f"  {nombre:13} : {kb:8.1f} KB | ~{tokens:7.0f} tokens de imagen | "
+            f"preparar p50 {percentil(tiempos, 50):6.1f} ms"
+        )
+
+
+def imprimir_api(resultados: dict[str, list]) -> None:
+    print("\n🎯 Respuestas frente a la referencia (api_outputs/):")
+    for nombre, lista in resultados.items():
+        n = len(lista)
+        aciertos = " ".join(
+            f"{campo}={sum(r['aciertos'][campo] for r in lista) / n:5.1%}" for campo in CAMPOS
+        )
+        latencias = [r["segundos"] for r in lista]
+        print(
+            f"  {nombre:13} : {aciertos} | latencia p50 {percentil(latencias, 50):.2f}s "
+            f"p95 {percentil(latencias, 95):.2f}s | prompt "
+            f"{sum(r['tokens_prompt'] for r in lista) / n:.0f} tokens | "
+            f"${sum(r['costo_usd'] for r in lista):.4f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluación del preprocesado de encabezados")
+    parser.add_argument("--api", action="store_true", help="Llamar al modelo con ambas versiones")
+    parser.add_argument("--muestra", type=int, default=MUESTRA, help="Encabezados a evaluar")
+    parser.add_argument("--guardar", type=Path, help="Carpeta donde dejar las preprocesadas")
+    args = parser.parse_args()
+
+    filas = cargar_muestra(args.muestra)
+    if not filas:
+        print(f"⚠️ No hay encabezados con imagen y referencia en {OUTPUT_DIR}")
+        return
+    print(f"🧪 {len(filas)} encabezados con referencia")
+
+    # Los mensajes por imagen de utils_openai_ocr se silencian durante la evaluación
+    utils_openai_ocr.configurar_log(lambda mensaje: None)
+    medidas = {
+        nombre: [preparar(fila, preprocesar) for fila in filas]
+        for nombre, preprocesar in (("original", False), ("preprocesada", True))
+    }
+    imprimir_offline(medidas)
+
+    if args.guardar:
+        args.guardar.mkdir(parents=True, exist_ok=True)
+        for fila, (_, _, png) in zip(filas, medidas["preprocesada"]):
+            (args.guardar / f"{Path(fila['file_name']).stem}.png").write_bytes(png)
+        print(f"💾 Preprocesadas guardadas en {args.guardar}")
+
+    if args.api:
+        resultados = {"original": [], "preprocesada": []}
+        for idx, fila in enumerate(filas, 1):
+            print(f"[{idx}/{len(filas)}] {fila['file_name']}")
+            for nombre in resultados:
+                resultados[nombre].append(llamar(fila, nombre == "preprocesada"))
+        imprimir_api(resultados)
+
+
+if __name__ == "__main__":
+    main()
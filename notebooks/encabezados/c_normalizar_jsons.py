@@ -8,9 +8,15 @@ from typing import Any
 
 INPUT_DIR = "./api_outputs"
 OUTPUT_DIR = "./jsons"
+# Páginas omitidas por d_deduplicar_paginas: reciben el resultado de su página canónica
+DUPLICADOS_PATH = "../scraping/data/paginas_duplicadas.jsonl"
+# PDFs con el mismo contenido bajo otra URL (ver scraping/utils_almacen_pdfs.py): reciben las
+# páginas del documento que sí se procesó
+INDICE_PDFS_PATH = "../scraping/data/pdfs/indice_contenido.jsonl"
 
 FILENAME_PATTERN = re.compile(r"^(?P<doc_id>[a-f0-9-]+)_page(?P<page>\d+)_\.json$", re.IGNORECASE)
 DATE_PATTERN = re.compile(r"^(?P<dia>\d{1,2})/(?P<mes>\d{1,2})/(?P<anio>\d{4})$")
+PAGE_PATTERN = re.compile(r"^(?P<doc_id>[a-f0-9-]+)_page(?P<page>\d+)_$", re.IGNORECASE)
 
 
 def agrupar_paginas_por_documento(input_dir: Path) -> dict[str, dict[str, dict[str, Any]]]:
@@ -57,6 +63,69 @@ def agrupar_paginas_por_documento(input_dir: Path) -> dict[str, dict[str, dict[s
     return documentos
 
 
+def replicar_duplicados(
+    documentos: dict[str, dict[str, dict[str, Any]]], duplicados_path: Path
+) -> int:
+    """Copia a cada página duplicada el resultado de su página canónica, si existe."""
+    if not duplicados_path.exists():
+        return 0
+
+    replicadas = 0
+    with duplicados_path.open(encoding="utf-8") as file:
+        for line in file:
+            try:
+                registro = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            duplicado = PAGE_PATTERN.match(registro["pagina"])
+            canonica = PAGE_PATTERN.match(registro["canonica"])
+            if not duplicado or not canonica:
+                continue
+
+            output = documentos.get(canonica.group("doc_id"), {}).get(canonica.group("page"))
+            if output is None:
+                continue  # sin resultado de la canónica no se crea el documento del duplicado
+            paginas = documentos[duplicado.group("doc_id")]
+            if duplicado.group("page") not in paginas:
+                paginas[duplicado.group("page")] = dict(output)
+                replicadas += 1
+
+    return replicadas
+
+
+def replicar_alias(documentos: dict[str, dict[str, dict[str, Any]]], indice_path: Path) -> int:
+    """Copia las páginas de un documento a los demás file_name con el mismo sha256."""
+    if not indice_path.exists():
+        return 0
+
+    sha_por_documento: dict[str, str] = {}
+    with indice_path.open(encoding="utf-8") as file:
+        for line in file:
+            try:
+                registro = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            sha_por_documento[Path(registro["file_name"]).stem] = registro["sha256"]
+
+    grupos: dict[str, list[str]] = defaultdict(list)
+    for doc_id, sha256 in sha_por_documento.items():
+        grupos[sha256].append(doc_id)
+
+    replicados = 0
+    for doc_ids in grupos.values():
+        origen = next((doc_id for doc_id in doc_ids if documentos.get(doc_id)), None)
+        if origen is None:
+            continue
+        for doc_id in doc_ids:
+            if not documentos.get(doc_id):
+                documentos[doc_id] = {
+                    page: dict(output) for page, output in documentos[origen].items()
+                }
+                replicados += 1
+
+    return replicados
+
+
 def escribir_documentos(documentos: dict[str, dict[str, dict[str, Any]]], output_dir: Path) -> None:
     output_dir.mkdir(parents=True, exist_ok=True)
 
@@ -81,6 +150,14 @@ def main() -> None:
         raise FileNotFoundError(f"No se encontró el directorio de entrada: {input_dir}")
 
     documentos = agrupar_paginas_por_documento(input_dir)
+    replicadas = replicar_duplicados(documentos, (base_dir / DUPLICADOS_PATH).resolve())
+    if replicadas:
+        print(f"[OK] {replicadas} páginas duplicadas reciben el resultado de su página canónica.")
+    replicados = replicar_alias(documentos, (base_dir / INDICE_PDFS_PATH).resolve())
+    if replicados:
+        print(
+            f"[OK] {replicados} documentos reciben las páginas de otro PDF con el mismo contenido."
+        )
 
     if not documentos:
         print("No se encontraron archivos JSON para normalizar.")
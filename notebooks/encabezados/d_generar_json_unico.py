@@ -1,17 +1,29 @@
 from __future__ import annotations
 
 import csv
+import heapq
+import itertools
 import json
+import os
 import re
+import tempfile
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Iterator
 
 JSONS_DIR = Path("./jsons")
 DOCUMENTS_HISTORICOS_CSV_PATH = Path("../scraping/data/documentos_historico.csv")
 OUTPUT_PATH = Path("../../public/db/encabezados_unificados.json")
 ERRORES_PATH = Path("./errores.csv")
 
+# 🔧 Streaming: los registros se generan documento a documento, se ordenan por bloques
+# en disco y se escriben como un arreglo JSON compacto, con memoria constante. Con False
+# se construye la lista completa y se escribe con indent=2 como antes.
+MODO_STREAMING = True
+# 🔧 Registros por bloque ordenado en memoria antes de volcarlo a disco
+TAMANO_BLOQUE_ORDEN = 100_000
+
 
 def _orden_pagina(pagina: str) -> tuple[int, str]:
     try:
@@ -70,80 +82,87 @@ def cargar_urls(documentos_csv_path: Path) -> dict[str, str]:
     return urls_por_id
 
 
-def _normalizar_fecha(fecha: str | None) -> str | None:
+# Fechas tras unificar separadores y quitar espacios: día/mes/año (año de 2 o 4 dígitos).
+# Los rangos de día y mes son los mismos que acepta strptime con "%d/%m/%Y".
+FECHA_PATTERN = re.compile(
+    r"(3[01]|[12][0-9]|0[1-9]|[1-9])/(1[0-2]|0[1-9]|[1-9])/([0-9]{4}|[0-9]{2})"
+)
+
+# Horas tras pasar a mayúsculas y quitar puntos: "H:M", "H:M:S" y sus variantes de
+# 12 horas con el sufijo pegado, separado por espacios o por ":" ("06:54:PM").
+HORA_PATTERN = re.compile(
+    r"(?P<hora>[0-9]{1,2}):(?P<minuto>[0-9]{1,2})(?::(?P<segundo>[0-9]{1,2}))?"
+    r"(?:\s*(?::\s*)?(?P<sufijo>AM|PM))?"
+)
+
+# Tamaño de la caché de valores crudos: el OCR repite mucho las mismas fechas y horas
+TAMANO_CACHE_NORMALIZACION = 8192
+
+
+@lru_cache(maxsize=TAMANO_CACHE_NORMALIZACION)
+def normalizar_fecha(fecha: str | None) -> str | None:
+    """Fecha del OCR ("12/12/2013", "12-12-13", …) como YYYY-MM-DD, o None si no es válida."""
     if not fecha:
         return None
 
-    fecha = fecha.strip()
-
-    # Reemplazar guiones o puntos por barras para compatibilidad
-    fecha = fecha.replace("-", "/").replace(".", "/")
+    # Guiones o puntos como barras y sin espacios entre números
+    fecha = "".join(fecha.replace("-", "/").replace(".", "/").split())
 
-    # Si la fecha trae espacios entre números, los normalizamos
-    fecha = re.sub(r"\s+", "", fecha)
+    match = FECHA_PATTERN.fullmatch(fecha)
+    if not match:
+        return None
 
-    # Asegurarse que el año tenga cuatro dígitos (si trae dos, asumimos 20xx)
-    partes = fecha.split("/")
-    if len(partes) == 3 and len(partes[2]) == 2:
-        partes[2] = f"20{partes[2]}"
-        fecha = "/".join(partes)
+    dia, mes, anio = match.groups()
+    # Si el año trae dos dígitos, asumimos 20xx
+    if len(anio) == 2:
+        anio = f"20{anio}"
 
     try:
-        fecha_dt = datetime.strptime(fecha, "%d/%m/%Y")
+        fecha_dt = datetime(int(anio), int(mes), int(dia))
     except ValueError:
         return None
 
     return fecha_dt.strftime("%Y-%m-%d")
 
 
-def _normalizar_hora(hora: str | None) -> str | None:
+@lru_cache(maxsize=TAMANO_CACHE_NORMALIZACION)
+def normalizar_hora(hora: str | None) -> str | None:
+    """Hora del OCR ("5:30 PM", "17:30:00", …) en 24 horas, o None si no es válida."""
     if not hora:
         return None
 
-    hora = hora.strip().upper()
-
-    # Reemplazar puntos, espacios y caracteres no numéricos antes del sufijo
-    hora = hora.replace(".", "")
-
-    # Corregir casos como "06:54:PM" -> "06:54PM"
-    hora = re.sub(r":\s*(AM|PM)$", r"\1", hora)
-
-    # Quitar sufijos mal espaciados, e.g., "06:54: PM" -> "06:54 PM"
-    hora = re.sub(r"(?<=\d)(AM|PM)$", r" \1", hora)
-    hora = re.sub(r"\s+(AM|PM)$", r" \1", hora)
-
-    # Normalizar múltiples espacios
-    hora = re.sub(r"\s+", " ", hora)
-
-    # Corregir casos "00:06 AM" -> "12:06 AM" antes de usar formato de 12 horas
-    if re.search(r"\b00:(\d{1,2})(?::\d{1,2})?\s*(AM|PM)$", hora):
-        hora = re.sub(r"\b00:", "12:", hora, count=1)
-
-    # Quitar segundos si existen: "06:54:32 PM" -> "06:54:32 PM"
-    # Mantenerlos para parsing directo
+    match = HORA_PATTERN.fullmatch(hora.strip().upper().replace(".", ""))
+    if not match:
+        return None
 
-    formatos = [
-        "%I:%M %p",
-        "%I:%M%p",
-        "%I:%M:%S %p",
-        "%I:%M:%S%p",
-        "%H:%M",
-        "%H:%M:%S",
-    ]
+    hora_txt, minuto_txt, segundo_txt, sufijo = match.group("hora", "minuto", "segundo", "sufijo")
+    horas, minutos = int(hora_txt), int(minuto_txt)
+    segundos = int(segundo_txt) if segundo_txt else 0
+
+    if sufijo:
+        # Corregir casos "00:06 AM" -> "12:06 AM" antes de usar formato de 12 horas.
+        # Como la versión con expresiones regulares, si la hora no es "00" pero los
+        # minutos sí y hay segundos, la corrección recae sobre los minutos.
+        if hora_txt == "00":
+            horas = 12
+        elif minuto_txt == "00" and segundo_txt:
+            minutos = 12
+
+        if not 1 <= horas <= 12:
+            return None
+        horas = horas % 12 + (12 if sufijo == "PM" else 0)
+    elif horas > 23:
+        return None
 
-    for formato in formatos:
-        try:
-            hora_dt = datetime.strptime(hora, formato)
-            return hora_dt.strftime("%H:%M:%S")
-        except ValueError:
-            continue
+    if minutos > 59 or segundos > 59:
+        return None
 
-    return None
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
 
 
 def _combinar_fecha_hora(fecha: str | None, hora: str | None) -> str | None:
-    fecha_norm = _normalizar_fecha(fecha)
-    hora_norm = _normalizar_hora(hora)
+    fecha_norm = normalizar_fecha(fecha)
+    hora_norm = normalizar_hora(hora)
 
     if not fecha_norm or not hora_norm:
         return None
@@ -151,12 +170,15 @@ def _combinar_fecha_hora(fecha: str | None, hora: str | None) -> str | None:
     return f"{fecha_norm} {hora_norm}"
 
 
-def construir_registros(
-    json_paths: Iterable[Path], urls_por_id: dict[str, str]
-) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
-    registros: list[dict[str, Any]] = []
-    errores: list[dict[str, Any]] = []
-
+def iterar_registros(
+    json_paths: Iterable[Path],
+    urls_por_id: dict[str, str],
+    al_error: Callable[[dict[str, Any]], None] | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Genera los registros documento a documento (solo un JSON abierto a la vez).
+    Cada página sin fecha/hora válida se pasa además a `al_error`.
+    """
     for json_path in json_paths:
         doc_id = json_path.stem
 
@@ -185,8 +207,8 @@ def construir_registros(
             hora_original = pagina_data.get("hora")
             fecha_hora = _combinar_fecha_hora(fecha_original, hora_original)
 
-            if not fecha_hora:
-                errores.append(
+            if not fecha_hora and al_error is not None:
+                al_error(
                     {
                         "id": doc_id,
                         "pagina": pagina_normalizada,
@@ -201,17 +223,21 @@ def construir_registros(
             else:
                 url_pag = None
 
-            registros.append(
-                {
-                    "id": f"{doc_id}_{pagina_formateada}",
-                    "tipo": pagina_data.get("tipo"),
-                    "fecha_hora": fecha_hora,
-                    "asunto": pagina_data.get("asunto"),
-                    "pagina": pagina_normalizada,
-                    "url": url_pag,
-                }
-            )
+            yield {
+                "id": f"{doc_id}_{pagina_formateada}",
+                "tipo": pagina_data.get("tipo"),
+                "fecha_hora": fecha_hora,
+                "asunto": pagina_data.get("asunto"),
+                "pagina": pagina_normalizada,
+                "url": url_pag,
+            }
+
 
+def construir_registros(
+    json_paths: Iterable[Path], urls_por_id: dict[str, str]
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    errores: list[dict[str, Any]] = []
+    registros = list(iterar_registros(json_paths, urls_por_id, errores.append))
     return registros, errores
 
 
@@ -219,10 +245,33 @@ def escribir_registros(registros: list[dict[str, Any]], output_path: Path) -> No
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     with output_path.open("w", encoding="utf-8") as file:
-        json.dump(registros, file, ensure_ascii=False, indent=2, sort_keys=False)
+        # Una sola escritura: json.dump con indent hace una llamada a write() por token
+        file.write(json.dumps(registros, ensure_ascii=False, indent=2, sort_keys=False))
         file.write("\n")
 
 
+def escribir_registros_streaming(registros: Iterable[dict[str, Any]], output_path: Path) -> int:
+    """
+    Escribe los registros a medida que llegan como un arreglo JSON compacto (un
+    registro por línea). Se escribe a un temporal que reemplaza al destino al
+    terminar, así el sitio nunca lee un archivo a medias. Retorna cuántos escribió.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    temporal = output_path.with_name(output_path.name + ".tmp")
+    total = 0
+
+    with temporal.open("w", encoding="utf-8") as file:
+        file.write("[")
+        for registro in registros:
+            file.write(",\n" if total else "\n")
+            file.write(json.dumps(registro, ensure_ascii=False, separators=(",", ":")))
+            total += 1
+        file.write("\n]\n")
+
+    os.replace(temporal, output_path)
+    return total
+
+
 def escribir_errores(errores: list[dict[str, Any]], errores_path: Path) -> None:
     if not errores:
         if errores_path.exists():
@@ -247,6 +296,115 @@ def ordenar_registros_por_fecha_desc(registros: list[dict[str, Any]]) -> list[di
     return registros_con_fecha + registros_sin_fecha
 
 
+def _volcar_bloque(registros: list[dict[str, Any]], directorio: str) -> Path:
+    """Escribe un bloque ya ordenado como JSON Lines en `directorio`."""
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=directorio, suffix=".jsonl", delete=False
+    ) as file:
+        for registro in registros:
+            file.write(json.dumps(registro, ensure_ascii=False))
+            file.write("\n")
+    return Path(file.name)
+
+
+def _leer_bloque(path: Path) -> Iterator[dict[str, Any]]:
+    with path.open(encoding="utf-8") as file:
+        for linea in file:
+            yield json.loads(linea)
+
+
+def ordenar_por_fecha_desc_streaming(
+    registros: Iterable[dict[str, Any]], tamano_bloque: int | None = None
+) -> Iterator[dict[str, Any]]:
+    """
+    Mismo orden que ordenar_registros_por_fecha_desc (fecha_hora descendente, estable,
+    y al final los registros sin fecha en su orden original) con memoria acotada:
+    ordena bloques de `tamano_bloque` registros, los vuelca a disco y los mezcla con
+    heapq.merge. Si todo cabe en un bloque, no toca el disco.
+    """
+    tamano_bloque = tamano_bloque or TAMANO_BLOQUE_ORDEN
+
+    with tempfile.TemporaryDirectory(prefix="encabezados_orden_") as directorio:
+        bloques: list[Path] = []
+        con_fecha: list[dict[str, Any]] = []
+        sin_fecha: list[dict[str, Any]] = []
+        sin_fecha_paths: list[Path] = []
+
+        for registro in registros:
+            if registro.get("fecha_hora"):
+                con_fecha.append(registro)
+                if len(con_fecha) >= tamano_bloque:
+                    con_fecha.sort(key=lambda r: r["fecha_hora"], reverse=True)
+                    bloques.append(_volcar_bloque(con_fecha, directorio))
+                    con_fecha = []
+            else:
+                sin_fecha.append(registro)
+                if len(sin_fecha) >= tamano_bloque:
+                    sin_fecha_paths.append(_volcar_bloque(sin_fecha, directorio))
+                    sin_fecha = []
+
+        con_fecha.sort(key=lambda r: r["fecha_hora"], reverse=True)
+        if bloques:
+            # heapq.merge es estable: ante empates respeta el orden de los bloques
+            bloques.append(_volcar_bloque(con_fecha, directorio))
+            yield from heapq.merge(
+                *(_leer_bloque(path) for path in bloques),
+                key=lambda r: r["fecha_hora"],
+                reverse=True,
+            )
+        else:
+            yield from con_fecha
+        del con_fecha
+
+        for path in sin_fecha_paths:
+            yield from _leer_bloque(path)
+        yield from sin_fecha
+
+
+def generar_streaming(
+    json_paths: Iterable[Path],
+    urls_por_id: dict[str, str],
+    output_path: Path,
+    errores_path: Path,
+    tamano_bloque: int | None = None,
+) -> tuple[int, int]:
+    """
+    Lectura, orden y escritura encadenadas como generadores; los errores de fecha/hora
+    se escriben a medida que aparecen. Sin registros no se toca ninguno de los dos
+    archivos (como en el modo en memoria). Retorna (registros, errores).
+    """
+    errores_path.parent.mkdir(parents=True, exist_ok=True)
+    errores_temporal = errores_path.with_name(errores_path.name + ".tmp")
+    n_errores = 0
+    total = 0
+
+    with errores_temporal.open("w", encoding="utf-8", newline="") as file:
+        escritor = csv.DictWriter(file, fieldnames=["id", "pagina", "fecha", "hora"])
+        escritor.writeheader()
+
+        def al_error(error: dict[str, Any]) -> None:
+            nonlocal n_errores
+            escritor.writerow(error)
+            n_errores += 1
+
+        registros = iterar_registros(json_paths, urls_por_id, al_error)
+        primero = next(registros, None)
+        if primero is not None:
+            ordenados = ordenar_por_fecha_desc_streaming(
+                itertools.chain([primero], registros), tamano_bloque
+            )
+            total = escribir_registros_streaming(ordenados, output_path)
+
+    if total and n_errores:
+        os.replace(errores_temporal, errores_path)
+        return total, n_errores
+
+    errores_temporal.unlink()
+    if total:
+        errores_path.unlink(missing_ok=True)
+    return total, n_errores
+
+
 def main() -> None:
     base_dir = Path(__file__).resolve().parent
     jsons_dir = (base_dir / JSONS_DIR).resolve()
@@ -256,6 +414,21 @@ def main() -> None:
 
     json_paths = cargar_jsons(jsons_dir)
     urls_por_id = cargar_urls(documentos_csv_path)
+
+    if MODO_STREAMING:
+        total, n_errores = generar_streaming(json_paths, urls_por_id, output_path, errores_path)
+        if not total:
+            print("No se generaron registros a partir de los JSONs disponibles.")
+            return
+        print(f"[OK] Se generaron {total} registros en '{output_path}'.")
+        if n_errores:
+            print(
+                f"[ADVERTENCIA] {n_errores} registros no pudieron convertir fecha/hora. Ver '{errores_path}'."
+            )
+        else:
+            print("[OK] Todas las fechas y horas se normalizaron correctamente.")
+        return
+
     registros, errores = construir_registros(json_paths, urls_por_id)
 
     if not registros:
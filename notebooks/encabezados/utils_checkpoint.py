@@ -0,0 +1,145 @@
+"""
+Checkpoint de trabajo del OCR en un log JSONL de solo anexado.
+
+Cada línea registra el resultado de un encabezado:
+
+    {"json_name": "..._page003_.json", "estado": "ok", "intentos": 1, "ts": 1760000000.0}
+    {"json_name": "..._page007_.json", "estado": "error", "intentos": 2, "error": "...", "ts": ...}
+
+Al abrirlo se reproduce el log (la última línea de cada json_name manda), así que
+reanudar no requiere listar api_outputs. Un encabezado que falla en `max_intentos`
+ejecuciones queda aparcado y deja de enviarse (y de facturarse) hasta que se pida
+reintentarlo. Una línea final truncada por una interrupción se descarta del archivo
+al abrirlo, para que el siguiente registro empiece en una línea nueva.
+
+Uso:
+    checkpoint = Checkpoint("./ocr_checkpoint.jsonl")
+    if checkpoint.pendiente(json_name, max_intentos=3):
+        ...
+        checkpoint.registrar(json_name, exito, error)
+    checkpoint.cerrar()
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+OK = "ok"
+ERROR = "error"
+
+
+def _truncar_linea_incompleta(path: Path) -> None:
+    """Corta el archivo tras el último salto de línea (descarta una línea a medio escribir)."""
+    with path.open("rb+") as file:
+        tamano = file.seek(0, os.SEEK_END)
+        fin = tamano
+        while fin > 0:
+            inicio = max(0, fin - 4096)
+            file.seek(inicio)
+            bloque = file.read(fin - inicio)
+            salto = bloque.rfind(b"\n")
+            if salto >= 0:
+                fin = inicio + salto + 1
+                break
+            fin = inicio
+        if fin < tamano:
+            file.truncate(fin)
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.estados: dict[str, dict] = {}
+        self.lineas = 0
+        self._archivo = None
+
+        if self.path.exists():
+            _truncar_linea_incompleta(self.path)
+            with self.path.open(encoding="utf-8") as file:
+                for linea in file:
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        continue  # línea corrupta
+                    self.estados[registro["json_name"]] = registro
+                    self.lineas += 1
+
+    def __len__(self) -> int:
+        return len(self.estados)
+
+    def completado(self, json_name: str) -> bool:
+        return self.estados.get(json_name, {}).get("estado") == OK
+
+    def intentos(self, json_name: str) -> int:
+        return self.estados.get(json_name, {}).get("intentos", 0)
+
+    def aparcado(self, json_name: str, max_intentos: int) -> bool:
+        registro = self.estados.get(json_name)
+        if registro is None or registro["estado"] != ERROR:
+            return False
+        return registro["intentos"] >= max_intentos
+
+    def pendiente(self, json_name: str, max_intentos: int | None = None) -> bool:
+        """No completado y, si se indica max_intentos, no aparcado."""
+        if self.completado(json_name):
+            return False
+        return max_intentos is None or not self.aparcado(json_name, max_intentos)
+
+    def registrar(self, json_name: str, exito: bool, error: str | None = None) -> None:
+        """Anexa el resultado de un encabezado; la línea queda en disco al retornar."""
+        registro = {
+            "json_name": json_name,
+            "estado": OK if exito else ERROR,
+            "intentos": self.intentos(json_name) + 1,
+            "ts": round(time.time(), 3),
+        }
+        if not exito and error:
+            registro["error"] = str(error)[:500]
+        self._escribir([registro])
+
+    def sembrar(self, json_names) -> int:
+        """Marca como completados encabezados ya procesados antes de existir el checkpoint."""
+        registros = [
+            {"json_name": nombre, "estado": OK, "intentos": 1, "ts": round(time.time(), 3)}
+            for nombre in json_names
+            if not self.completado(nombre)
+        ]
+        self._escribir(registros)
+        return len(registros)
+
+    def _escribir(self, registros: list[dict]) -> None:
+        if not registros:
+            return
+        if self._archivo is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._archivo = self.path.open("a", encoding="utf-8")
+        self._archivo.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in registros))
+        self._archivo.flush()
+        for registro in registros:
+            self.estados[registro["json_name"]] = registro
+        self.lineas += len(registros)
+
+    def errores_aparcados(self, max_intentos: int) -> list[tuple[str, str]]:
+        return [
+            (nombre, registro.get("error", ""))
+            for nombre, registro in self.estados.items()
+            if self.aparcado(nombre, max_intentos)
+        ]
+
+    def compactar(self) -> None:
+        """Reescribe el log con una línea por encabezado (escritura atómica)."""
+        self.cerrar()
+        temporal = self.path.with_suffix(".tmp")
+        with temporal.open("w", encoding="utf-8") as file:
+            for registro in self.estados.values():
+                file.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporal, self.path)
+        self.lineas = len(self.estados)
+
+    def cerrar(self) -> None:
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
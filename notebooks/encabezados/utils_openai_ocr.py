@@ -1,10 +1,15 @@
 import base64
+import importlib.util
 import json
+import math
 import os
 import re
+import time
 from io import BytesIO
 
+import httpx
 import openai
+import utils_preprocesado as preprocesado
 from dotenv import load_dotenv
 from PIL import Image
 
@@ -12,15 +17,234 @@ from PIL import Image
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 
+# 🔌 Cliente HTTP: pool keep-alive, timeouts y deadline por solicitud
+HTTP_POOL_SIZE = 16  # conexiones keep-alive (crear_cliente lo ajusta al número de workers)
+HTTP_CONNECT_TIMEOUT = 10  # segundos para abrir la conexión
+HTTP_READ_TIMEOUT = 120  # segundos máximos sin recibir datos del servidor
+HTTP_REQUEST_DEADLINE = 180  # segundos máximos por solicitud completa, incluida la respuesta
+HTTP_KEEPALIVE = 60  # segundos que una conexión ociosa sigue abierta
+HTTP_USAR_HTTP2 = True  # solo si el paquete h2 está instalado
+HTTP_MAX_RETRIES = 2  # reintentos internos del SDK (429, 5xx, timeouts)
+
+# 🔧 Enderezar, recortar, reducir y binarizar cada encabezado antes de enviarlo
+# (utils_preprocesado.py); con False se envía el recorte al resize_percent indicado.
+# Desactivado hasta validar la precisión del modelo con recortes reales:
+#     PYTHONPATH=.. python bench_preprocesado_encabezados.py --api
+PREPROCESAR_IMAGENES = False
+
+
+class _StreamConDeadline(httpx.SyncByteStream):
+    """Corta la lectura del cuerpo si la solicitud supera su deadline."""
+
+    def __init__(self, stream, limite, request):
+        self.stream = stream
+        self.limite = limite
+        self.request = request
+
+    def __iter__(self):
+        for chunk in self.stream:
+            if time.monotonic() > self.limite:
+                raise httpx.ReadTimeout("Deadline de la solicitud excedido", request=self.request)
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+
+
+class _TransporteConDeadline(httpx.BaseTransport):
+    """
+    Transporte que limita la duración total de cada solicitud. El read timeout de
+    httpx solo mide el tiempo entre lecturas; una respuesta lenta pero constante
+    ocuparía al worker indefinidamente. Al vencer se lanza ReadTimeout, que el SDK
+    y los reintentos de b_openai_api tratan como cualquier timeout.
+    """
+
+    def __init__(self, transporte, deadline):
+        self.transporte = transporte
+        self.deadline = deadline
+
+    def handle_request(self, request):
+        limite = time.monotonic() + self.deadline
+        timeout = dict(request.extensions.get("timeout", {}))
+        timeout["read"] = min(timeout.get("read") or self.deadline, self.deadline)
+        request.extensions["timeout"] = timeout
+
+        response = self.transporte.handle_request(request)
+        if time.monotonic() > limite:
+            response.close()
+            raise httpx.ReadTimeout("Deadline de la solicitud excedido", request=request)
+        response.stream = _StreamConDeadline(response.stream, limite, request)
+        return response
+
+    def close(self):
+        self.transporte.close()
+
+
+def crear_cliente(
+    workers=HTTP_POOL_SIZE,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    read_timeout=HTTP_READ_TIMEOUT,
+    deadline=HTTP_REQUEST_DEADLINE,
+    http2=HTTP_USAR_HTTP2,
+    max_retries=HTTP_MAX_RETRIES,
+):
+    """
+    Crea un cliente OpenAI cuyo pool tiene una conexión keep-alive por worker
+    (ningún hilo espera conexión libre y no se reabren conexiones TLS entre
+    llamadas), con timeouts de conexión/lectura y deadline por solicitud.
+    """
+    http2 = http2 and importlib.util.find_spec("h2") is not None
+    transporte = httpx.HTTPTransport(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=workers,
+            max_keepalive_connections=workers,
+            keepalive_expiry=HTTP_KEEPALIVE,
+        ),
+    )
+    timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    # Cliente httpx propio: el SDK lo acepta como http_client y usa su transporte tal cual
+    http_client = httpx.Client(
+        transport=_TransporteConDeadline(transporte, deadline),
+        timeout=timeout,
+        follow_redirects=True,
+    )
+    return openai.OpenAI(
+        api_key=api_key, http_client=http_client, timeout=timeout, max_retries=max_retries
+    )
+
+
+def configurar_cliente(**kwargs):
+    """Reemplaza el cliente del módulo (ver crear_cliente) y cierra el anterior."""
+    global client
+    anterior = client
+    client = crear_cliente(**kwargs)
+    anterior.close()
+
+
 # Inicializar cliente OpenAI
-client = openai.OpenAI(api_key=api_key)
+client = crear_cliente()
+
+# Modelos disponibles con visión, sus precios por 1K tokens y cómo cuentan los tokens
+# de imagen: por teselas de 512 px ("base" + "tesela" por tesela) o por parches de 32 px
+# ("parche", hasta "max_parches", por "multiplicador")
+VISION_MODELS = {
+    "gpt-4o": {
+        "input": 0.0025,
+        "output": 0.010,
+        "use_max_completion_tokens": False,
+        "imagen": {"base": 85, "tesela": 170},
+    },
+    "gpt-4o-mini": {
+        "input": 0.00015,
+        "output": 0.0006,
+        "use_max_completion_tokens": False,
+        "imagen": {"base": 2833, "tesela": 5667},
+    },
+    "gpt-5": {
+        "input": 0.00125,
+        "output": 0.010,
+        "use_max_completion_tokens": True,
+        "imagen": {"base": 70, "tesela": 140},
+    },
+    "gpt-5-mini": {
+        "input": 0.00025,
+        "output": 0.002,
+        "use_max_completion_tokens": True,
+        "imagen": {"parche": 32, "max_parches": 1536, "multiplicador": 1.62},
+    },
+}
+
+# Destino de los mensajes por llamada (modelo, tokens, costo, rutas). Por defecto
+# print; b_openai_api lo redirige a su registro asíncrono para no serializar hilos.
+_log = print
+
+
+def configurar_log(funcion):
+    """Redirige los mensajes del módulo a `funcion` (recibe un str)."""
+    global _log
+    _log = funcion
 
 
 # 🧹 Limpiar y parsear JSON de respuestas de modelos
+LITERALES_PYTHON = {"None": "null", "True": "true", "False": "false"}
+
+# Caracteres que cambian el estado del escaneo; el texto entre ellos se copia en bloque
+_TOKEN_JSON = re.compile(r"[\"'\\{}\[\]\n]|\b(?:None|True|False)\b")
+
+
+def _reparar_json(texto, inicio):
+    """
+    Recorre `texto` una sola vez desde `inicio` (primer '{' o '[') hasta cerrar ese
+    objeto y devuelve una versión JSON válida: cadenas con comilla simple pasan a
+    comilla doble, None/True/False fuera de cadenas a null/true/false, se escapan los
+    saltos de línea dentro de cadenas y se quitan comas colgantes. Retorna None si el
+    objeto no se cierra (respuesta truncada) o los cierres no coinciden.
+    """
+    salida = []
+    pila = []
+    comilla = None  # '"' o "'" mientras se está dentro de una cadena
+    posicion = inicio
+
+    for token in _TOKEN_JSON.finditer(texto, inicio):
+        if token.start() < posicion:
+            continue  # carácter ya consumido como parte de un escape
+        c = token.group()
+        salida.append(texto[posicion : token.start()])
+        posicion = token.end()
+
+        if comilla:
+            if c == "\\":
+                # Copiar el escape completo; \' no existe en JSON
+                siguiente = texto[posicion : posicion + 1]
+                salida.append("'" if siguiente == "'" else "\\" + siguiente)
+                posicion += 1
+            elif c == comilla:
+                salida.append('"')
+                comilla = None
+            elif c == '"':
+                salida.append('\\"')
+            elif c == "\n":
+                salida.append("\\n")
+            else:
+                salida.append(c)
+            continue
+
+        if c in "\"'":
+            comilla = c
+            salida.append('"')
+        elif c in "{[":
+            pila.append("}" if c == "{" else "]")
+            salida.append(c)
+        elif c in "}]":
+            if not pila or pila.pop() != c:
+                return None
+            # Coma colgante: último fragmento no vacío antes del cierre
+            k = len(salida) - 1
+            while k > 0 and not salida[k].strip():
+                k -= 1
+            previo = salida[k].rstrip()
+            if previo.endswith(","):
+                salida[k] = previo[:-1]
+            salida.append(c)
+            if not pila:
+                return "".join(salida)
+        else:
+            salida.append(LITERALES_PYTHON.get(c, c))
+
+    return None
+
+
 def parse_json_response(content):
     """
     Intenta parsear JSON de forma robusta, manejando casos donde viene envuelto
-    en bloques de código markdown o con comillas adicionales.
+    en bloques de código markdown, con texto alrededor o con literales de Python.
+
+    Cada paso es lineal y solo se ejecuta si el anterior falla:
+    1. json.loads directo (la respuesta normal con response_format=json_object).
+    2. json.loads del primer '{' (o '[') al último cierre: vallas ``` y texto extra.
+    3. _reparar_json: comillas simples, None/True/False, comas colgantes.
+    4. JSON escapado ({\\"tipo\\": ...} o {\\n ...}): se decodifica y se reintenta.
 
     Args:
         content: String que posiblemente contiene JSON
@@ -28,91 +252,120 @@ def parse_json_response(content):
     Returns:
         dict o el contenido original si no se pudo parsear
     """
-    # Guardar el contenido original por si falla todo
-    original_content = content
-
+    texto = content
     try:
-        # 1. Eliminar bloques de código markdown con diferentes variantes
-        # Patrones: ```json, ```JSON, ``` al inicio, ``` al final
-        content = re.sub(r"^```(?:json|JSON)?\s*\n?", "", content.strip())
-        content = re.sub(r"\n?```\s*$", "", content.strip())
+        parsed = json.loads(texto)
+        if not isinstance(parsed, str):
+            return parsed
+        texto = parsed  # JSON serializado dentro de un string
+    except (TypeError, ValueError):
+        if not isinstance(texto, str):
+            return content
+
+    inicio = texto.find("{")
+    if inicio < 0:
+        inicio = texto.find("[")
+    if inicio < 0:
+        _log(f"⚠️ Error parseando JSON: no contiene objeto: {texto[:100]!r}")
+        return content
+
+    fin = texto.rfind("}" if texto[inicio] == "{" else "]") + 1
+    try:
+        return json.loads(texto[inicio:fin])
+    except ValueError:
+        pass
 
-        # 2. Eliminar comillas triples al inicio y final (''' o """)
-        content = re.sub(r"^[\'\"\`]{3,}\s*", "", content.strip())
-        content = re.sub(r"\s*[\'\"\`]{3,}$", "", content.strip())
+    reparado = _reparar_json(texto, inicio)
+    if reparado is not None:
+        try:
+            return json.loads(reparado)
+        except ValueError:
+            pass
 
-        # 3. Eliminar posibles etiquetas "json" sueltas
-        content = re.sub(r"^json\s*\n?", "", content.strip(), flags=re.IGNORECASE)
+    if "\\" in texto:
+        try:
+            decodificado = json.loads(f'"{texto[inicio:fin]}"', strict=False)
+        except ValueError:
+            decodificado = None
+        if decodificado:
+            parsed = parse_json_response(decodificado)
+            if parsed is not decodificado:
+                return parsed
 
-        # 4. Limpiar espacios en blanco adicionales
-        content = content.strip()
+    motivo = "JSON incompleto" if reparado is None else "JSON inválido"
+    _log(f"⚠️ Error parseando JSON ({motivo}): {texto[inicio : inicio + 100]!r}")
+    return content
 
-        # 5. Reemplazar valores Python por valores JSON válidos
-        # Importante: usar word boundaries para evitar reemplazos incorrectos
-        content = re.sub(r"\bNone\b", "null", content)
-        content = re.sub(r"\bTrue\b", "true", content)
-        content = re.sub(r"\bFalse\b", "false", content)
 
-        # 6. Intentar decodificar caracteres escapados si viene como string literal
-        # Por ejemplo: "{\n  \"key\": \"value\"\n}" -> real JSON
-        try:
-            # Intentar decodificar con codecs si detectamos escapes
-            if "\\n" in content or "\\t" in content or '\\"' in content:
-                # Usar decode de unicode-escape para strings con escapes
-                content = content.encode().decode("unicode-escape")
-        except:
-            pass  # Si falla, continuar con el contenido sin decodificar
-
-        # 7. Validar que el JSON esté completo (verificar corchetes/llaves)
-        # Contar apertura y cierre de llaves y corchetes
-        open_braces = content.count("{")
-        close_braces = content.count("}")
-        open_brackets = content.count("[")
-        close_brackets = content.count("]")
-
-        if open_braces != close_braces or open_brackets != close_brackets:
-            print(
-                f"⚠️ Advertencia: JSON posiblemente incompleto (llaves: {open_braces}/{close_braces}, corchetes: {open_brackets}/{close_brackets})"
+def estimar_tokens_imagen(ancho, alto, model):
+    """
+    Tokens de entrada que factura una imagen de ancho × alto px (detail "high"), según
+    el esquema de VISION_MODELS[model]["imagen"].
+    """
+    esquema = VISION_MODELS.get(model, VISION_MODELS["gpt-4o-mini"])["imagen"]
+
+    if "parche" in esquema:
+        lado = esquema["parche"]
+        parches = math.ceil(ancho / lado) * math.ceil(alto / lado)
+        if parches > esquema["max_parches"]:
+            # Se reduce la imagen hasta que entre en el máximo de parches
+            escala = math.sqrt(esquema["max_parches"] * lado * lado / (ancho * alto))
+            parches = min(
+                esquema["max_parches"],
+                math.ceil(ancho * escala / lado) * math.ceil(alto * escala / lado),
             )
+        return math.ceil(parches * esquema["multiplicador"])
 
-        # 8. Intentar parsear como JSON
-        parsed = json.loads(content)
-        return parsed
+    # Teselas: la imagen se ajusta a 2048 × 2048 y luego su lado corto a 768 (solo reduce)
+    escala = min(1.0, 2048 / max(ancho, alto))
+    ancho, alto = ancho * escala, alto * escala
+    escala = min(1.0, 768 / min(ancho, alto))
+    ancho, alto = ancho * escala, alto * escala
+    teselas = math.ceil(ancho / 512) * math.ceil(alto / 512)
+    return esquema["base"] + esquema["tesela"] * teselas
 
-    except (json.JSONDecodeError, Exception) as e:
-        print(f"⚠️ Error parseando JSON: {str(e)[:100]}")
-        # Si falla, intentar estrategias adicionales
-        try:
-            # Estrategia 1: Intentar con el contenido original sin limpiar
-            return json.loads(original_content)
-        except:
-            try:
-                # Estrategia 2: Aplicar solo reemplazo de None/True/False al original
-                cleaned = re.sub(r"\bNone\b", "null", original_content)
-                cleaned = re.sub(r"\bTrue\b", "true", cleaned)
-                cleaned = re.sub(r"\bFalse\b", "false", cleaned)
-                return json.loads(cleaned)
-            except:
-                # Si todo falla, retornar el contenido original
-                return original_content
-
-
-# 🔧 Redimensionar en memoria
-def resize_image_in_memory(image_path, resize_percent=50):
+
+# 🔧 Recortar, preprocesar y codificar en memoria
+def preparar_imagen(image_path, resize_percent=50, bbox=None, model="gpt-4o-mini"):
+    """
+    Abre la imagen, la recorta a `bbox` (x_min, y_min, x_max, y_max) si se indica y,
+    con PREPROCESAR_IMAGENES, la endereza, recorta, reduce y binariza
+    (utils_preprocesado.preprocesar; resize_percent no se aplica). Sin preprocesado
+    la redimensiona al `resize_percent` %.
+
+    Returns:
+        (buffer PNG, info) con tamaños, bytes y tokens de imagen estimados antes
+        (recorte al resize_percent %) y después del preprocesado
+    """
     img = Image.open(image_path)
+    if bbox is not None:
+        img = img.crop(tuple(bbox))
     original_size = img.size
+    antes = (
+        int(original_size[0] * resize_percent / 100),
+        int(original_size[1] * resize_percent / 100),
+    )
 
-    new_width = int(original_size[0] * resize_percent / 100)
-    new_height = int(original_size[1] * resize_percent / 100)
-    img = img.resize((new_width, new_height), Image.LANCZOS)
+    info = {"original": list(original_size), "tokens_antes": estimar_tokens_imagen(*antes, model)}
+    if PREPROCESAR_IMAGENES:
+        img, info["preprocesado"] = preprocesado.preprocesar(img)
+    elif antes != original_size:
+        img = img.resize(antes, Image.LANCZOS)
 
     # Convertir a bytes en memoria
     buffer = BytesIO()
-    img.save(buffer, format="PNG")
+    img.save(buffer, format="PNG", optimize=PREPROCESAR_IMAGENES)
+    info["final"] = list(img.size)
+    info["bytes"] = buffer.tell()
+    info["tokens_despues"] = estimar_tokens_imagen(*img.size, model)
     buffer.seek(0)
 
-    print(f"📏 Imagen original: {original_size}, redimensionada a: ({new_width}, {new_height})")
-    return buffer
+    _log(
+        f"📏 Imagen original: {original_size}, enviada: {img.size} "
+        f"({info['bytes'] / 1024:.1f} KB, ~{info['tokens_antes']} → "
+        f"~{info['tokens_despues']} tokens de imagen)"
+    )
+    return buffer, info
 
 
 # 🧪 Codificar imagen desde buffer
@@ -127,22 +380,19 @@ def extract_text_from_image(
     max_tokens,
     prompt,
     system_prompt=None,
+    image_ids=None,
 ):
-    # Modelos disponibles con visión y sus precios por 1K tokens
-    vision_models = {
-        "gpt-4o": {"input": 0.0025, "output": 0.010, "use_max_completion_tokens": False},
-        "gpt-4o-mini": {"input": 0.00015, "output": 0.0006, "use_max_completion_tokens": False},
-        "gpt-5": {"input": 0.00125, "output": 0.010, "use_max_completion_tokens": True},
-        "gpt-5-mini": {"input": 0.00025, "output": 0.002, "use_max_completion_tokens": True},
-    }
-
+    """
+    Envía una o varias imágenes en una sola solicitud. `base64_image` puede ser una
+    lista; con `image_ids`, cada imagen va precedida de un texto "ID: <id>".
+    """
     # Validación modelo
-    if model not in vision_models:
-        print(f"⚠️ Modelo {model} no reconocido. Usando gpt-4o-mini")
+    if model not in VISION_MODELS:
+        _log(f"⚠️ Modelo {model} no reconocido. Usando gpt-4o-mini")
         model = "gpt-4o-mini"
 
-    pricing = vision_models[model]
-    print(f"🤖 Usando modelo: {model} (JSON mode activado)")
+    pricing = VISION_MODELS[model]
+    _log(f"🤖 Usando modelo: {model} (JSON mode activado)")
 
     # Construcción de mensajes
     messages = []
@@ -151,22 +401,19 @@ def extract_text_from_image(
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
 
-    # Agregar mensaje del usuario con la imagen
-    messages.append(
-        {
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": prompt,
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{base64_image}"},
-                },
-            ],
-        }
-    )
+    # Agregar mensaje del usuario con la(s) imagen(es)
+    imagenes = base64_image if isinstance(base64_image, list) else [base64_image]
+    content = [{"type": "text", "text": prompt}]
+    for i, imagen in enumerate(imagenes):
+        if image_ids:
+            content.append({"type": "text", "text": f"ID: {image_ids[i]}"})
+        content.append(
+            {
+                "type": "image_url",
+                "image_url": {"url": f"data:image/png;base64,{imagen}"},
+            }
+        )
+    messages.append({"role": "user", "content": content})
 
     # Construcción de request compatible con todos los modelos
     request_params = {
@@ -191,10 +438,10 @@ def extract_text_from_image(
     total_tokens = prompt_tokens + completion_tokens
 
     cost = (prompt_tokens * pricing["input"] + completion_tokens * pricing["output"]) / 1000
-    print(
+    _log(
         f"\n📊 Tokens usados: prompt={prompt_tokens}, completion={completion_tokens}, total={total_tokens}"
     )
-    print(f"💵 Costo real estimado: ${cost:.5f} USD")
+    _log(f"💵 Costo real estimado: ${cost:.5f} USD")
 
     # Retornar contenido y metadata
     return {
@@ -221,6 +468,7 @@ def process_image_ocr(
     output_path=None,
     prompt=None,
     system_prompt=None,
+    bbox=None,
 ):
     """
     Procesa una imagen con OCR usando diferentes modelos y configuraciones
@@ -230,12 +478,13 @@ def process_image_ocr(
 
     Args:
         image_path: Ruta a la imagen
-        resize_percent: Porcentaje de redimensionado (100 = tamaño original)
+        resize_percent: Porcentaje de redimensionado (100 = original; sin PREPROCESAR_IMAGENES)
         model: Modelo de OpenAI a usar ('gpt-4o', 'gpt-4o-mini', 'gpt-5', 'gpt-5-mini')
         max_tokens: Máximo de tokens en la respuesta
         prompt: Prompt personalizado para el OCR (DEBE mencionar formato JSON)
         output_path: Ruta donde guardar el JSON de salida (opcional)
         system_prompt: Mensaje del sistema para agregar contexto (opcional)
+        bbox: Caja (x_min, y_min, x_max, y_max) a recortar de la imagen antes de enviarla (opcional)
 
     Returns:
         dict: Diccionario con estructura {"output": contenido_ocr, "meta": metadata}
@@ -246,8 +495,8 @@ def process_image_ocr(
         Si contiene tablas, extrae los datos de forma estructurada.
         Responde ÚNICAMENTE en formato JSON válido."""
 
-    # Redimensionar en memoria
-    img_buffer = resize_image_in_memory(image_path, resize_percent)
+    # Recortar y preprocesar (o redimensionar) en memoria
+    img_buffer, info_imagen = preparar_imagen(image_path, resize_percent, bbox, model)
 
     # Codificar a base64
     b64_img = encode_image_base64_from_buffer(img_buffer)
@@ -261,22 +510,127 @@ def process_image_ocr(
 
     # Verificar si se parseó correctamente
     if isinstance(parsed_content, (dict, list)):
-        print("✅ Contenido parseado como JSON exitosamente")
+        _log("✅ Contenido parseado como JSON exitosamente")
     else:
-        print("ℹ️ Contenido mantenido como texto (no es JSON válido)")
+        _log("ℹ️ Contenido mantenido como texto (no es JSON válido)")
 
     # Construir la salida con la estructura solicitada
-    output_json = {"output": parsed_content, "meta": result["meta"]}
+    output_json = {"output": parsed_content, "meta": {**result["meta"], "imagen": info_imagen}}
 
     # Guardar en archivo si se especificó output_path
     if output_path:
         with open(output_path, "w", encoding="utf-8") as f:
             json.dump(output_json, f, indent=2, ensure_ascii=False)
-        print(f"💾 JSON guardado en: {output_path}")
+        _log(f"💾 JSON guardado en: {output_path}")
 
     return output_json
 
 
+# 📦 Prompt para varias imágenes por solicitud: la respuesta es un objeto con un JSON por id
+BATCH_PROMPT_TEMPLATE = (
+    "SE ENVÍAN {n} IMÁGENES, CADA UNA PRECEDIDA DE SU ID. APLICA LA SIGUIENTE INSTRUCCIÓN A "
+    "CADA IMAGEN POR SEPARADO Y DEVUELVE UN ÚNICO JSON CUYAS LLAVES SEAN LOS IDS ({ids}) Y CUYO "
+    "VALOR SEA EL JSON DE ESA IMAGEN.\n\nINSTRUCCIÓN: {prompt}"
+)
+
+
+def _validar_lote(parsed, ids, validar=None):
+    """Retorna {id: salida} con las respuestas válidas (un objeto JSON por id)."""
+    if not isinstance(parsed, dict):
+        return {}
+    return {
+        i: parsed[i]
+        for i in ids
+        if isinstance(parsed.get(i), dict) and (validar is None or validar(parsed[i]))
+    }
+
+
+def process_images_ocr_batch(
+    items,
+    resize_percent=40,
+    model="gpt-4o-mini",
+    max_tokens=2000,
+    prompt=None,
+    system_prompt=None,
+    validar=None,
+    fallback=None,
+):
+    """
+    Procesa varios encabezados en una sola solicitud y reparte la respuesta.
+
+    Las imágenes van como partes separadas del mismo mensaje, cada una precedida de
+    su id, y se pide un JSON {id: resultado}. Las imágenes cuyo resultado no valida
+    (id ausente, valor que no es un objeto o que no pasa `validar`) se reprocesan con
+    `fallback(item)` o, por defecto, con una llamada individual a process_image_ocr.
+
+    Args:
+        items: Lista de dicts con image_path, output_path y opcionalmente bbox
+        max_tokens: Máximo de tokens de respuesta por imagen (se multiplica por el lote)
+        validar: Función opcional salida -> bool para aceptar cada resultado del lote
+        fallback: Función opcional item -> {"output", "meta"} para los no válidos
+        (resto de argumentos como en process_image_ocr)
+
+    Returns:
+        list[dict]: Un {"output": ..., "meta": ...} por item, en el mismo orden
+    """
+    if prompt is None:
+        prompt = """Extrae toda la información visible en esta imagen.
+        Responde ÚNICAMENTE en formato JSON válido."""
+
+    ids = [str(i) for i in range(1, len(items) + 1)]
+    preparadas = [
+        preparar_imagen(item["image_path"], resize_percent, item.get("bbox"), model)
+        for item in items
+    ]
+    imagenes = [encode_image_base64_from_buffer(buffer) for buffer, _ in preparadas]
+    prompt_lote = BATCH_PROMPT_TEMPLATE.format(n=len(items), ids=", ".join(ids), prompt=prompt)
+
+    result = extract_text_from_image(
+        imagenes, model, max_tokens * len(items), prompt_lote, system_prompt, image_ids=ids
+    )
+    validos = _validar_lote(parse_json_response(result["content"]), ids, validar)
+    _log(f"📦 Lote de {len(items)} imágenes: {len(validos)} respuestas válidas")
+
+    # Tokens y costo del lote repartidos entre las imágenes que respondió
+    meta_lote = result["meta"]
+    n_validos = max(len(validos), 1)
+    meta_item = {
+        **meta_lote,
+        "tokens": {k: round(v / n_validos) for k, v in meta_lote["tokens"].items()},
+        "cost_usd": round(meta_lote["cost_usd"] / n_validos, 6),
+        "batch": {"size": len(items), "valid": len(validos), "tokens": meta_lote["tokens"]},
+    }
+
+    salidas = []
+    for id_item, item, (_, info_imagen) in zip(ids, items, preparadas):
+        if id_item not in validos:
+            _log(f"↩️ Respuesta inválida para {item['image_path']}: llamada individual")
+            if fallback is not None:
+                salidas.append(fallback(item))
+                continue
+            salidas.append(
+                process_image_ocr(
+                    item["image_path"],
+                    resize_percent=resize_percent,
+                    model=model,
+                    max_tokens=max_tokens,
+                    output_path=item.get("output_path"),
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    bbox=item.get("bbox"),
+                )
+            )
+            continue
+
+        output_json = {"output": validos[id_item], "meta": {**meta_item, "imagen": info_imagen}}
+        if item.get("output_path"):
+            with open(item["output_path"], "w", encoding="utf-8") as f:
+                json.dump(output_json, f, indent=2, ensure_ascii=False)
+        salidas.append(output_json)
+
+    return salidas
+
+
 # ========================================
 # 📚 EJEMPLO DE USO
 # ========================================
@@ -296,7 +650,7 @@ def process_image_ocr(
 # # Ejemplo con todos los parámetros
 # result = process_image_ocr(
 #     image_path="ruta/a/tu/imagen.jpg",           # Ruta a la imagen (requerido)
-#     resize_percent=80,                            # Porcentaje de redimensionado (default: 40)
+#     resize_percent=80,                            # Porcentaje de redimensionado sin preprocesado (default: 40)
 #     model="gpt-4o-mini",                         # Modelo: "gpt-4o", "gpt-4o-mini", "gpt-5", "gpt-5-mini" (default: "gpt-4o-mini")
 #     max_tokens=2000,                             # Máximo de tokens en la respuesta (default: 2000)
 #     prompt="Extrae la tabla y devuelve en JSON", # ⚠️ IMPORTANTE: DEBE mencionar JSON en el prompt
@@ -311,6 +665,15 @@ def process_image_ocr(
 # print(result["meta"]["model"])                   # Modelo utilizado
 # ```
 #
+# # Varios encabezados en una sola solicitud (el prompt fijo se paga una vez por lote)
+# results = process_images_ocr_batch(
+#     [
+#         {"image_path": "pagina1.jpg", "bbox": (0, 0, 1600, 220), "output_path": "p1.json"},
+#         {"image_path": "pagina2.jpg", "output_path": "p2.json"},
+#     ],
+#     model="gpt-5-mini",
+# )
+#
 # ✨ Ventajas de JSON mode (response_format):
 # - ✅ Garantiza que el modelo SIEMPRE responda con JSON válido
 # - ✅ No necesitas parsing complejo ni manejo de markdown
@@ -0,0 +1,156 @@
+"""
+Preprocesado de encabezados antes de enviarlos a la API de visión.
+
+El recorte de YOLO incluye márgenes, fondo gris con ruido de escaneo y la
+resolución completa de la página (300 DPI): todo se factura como tokens de imagen
+y alarga la subida. `preprocesar` deja solo lo que el modelo necesita leer:
+
+1. Endereza: busca en ±ANGULO_MAXIMO, primero con PASO_GRUESO y luego con
+   PASO_ANGULO alrededor del mejor, el ángulo que da el perfil de filas más nítido
+   (las líneas de texto quedan horizontales).
+2. Recorta los márgenes sin tinta (umbral de Otsu; ignora motas sueltas).
+3. Reduce la imagen hasta que la altura de las letras (altura x, en mayúsculas la
+   de las capitales) sea ALTURA_X_OBJETIVO píxeles. Nunca amplía.
+4. Binariza a blanco y negro (PNG de 1 bit, mucho más liviano que el gris).
+
+Uso:
+    imagen, info = preprocesar(Image.open("encabezado.jpg"))
+    info  # {"angulo": 0.75, "altura_x": 31, "escala": 0.39, "recorte": [x0, y0, x1, y1]}
+"""
+
+import numpy as np
+from PIL import Image
+
+# 🔧 Altura de las letras (px) en la imagen enviada; los modelos de visión leen bien desde ~10 px
+ALTURA_X_OBJETIVO = 12
+# 🔧 Inclinación máxima que se corrige (grados), pasos de la búsqueda gruesa y fina y
+# mínimo para rotar
+ANGULO_MAXIMO = 3.0
+PASO_GRUESO = 1.0
+PASO_ANGULO = 0.25
+ANGULO_MINIMO = 0.3
+# 🔧 Blanco alrededor del texto tras recortar (px en la imagen final)
+MARGEN_PX = 4
+# 🔧 True = PNG de 1 bit; False = escala de grises (si el modelo confunde caracteres finos)
+BINARIZAR = True
+
+ANCHO_ENDEREZADO = 600  # ancho de la imagen reducida en la que se busca el ángulo
+MIN_TINTA_FILA = 2  # píxeles de tinta para que una fila o columna cuente como texto
+MIN_ALTO_LINEA = 3  # filas mínimas de una línea de texto al estimar la altura x
+# Fracción de la tinta de la fila más cargada a partir de la cual una fila es cuerpo de letra
+# (deja fuera tildes, ascendentes y descendentes, que son tramos con poca tinta)
+FRACCION_CUERPO = 0.25
+
+
+def umbral_otsu(pixeles: np.ndarray) -> int:
+    """Umbral de Otsu de una imagen en escala de grises (uint8)."""
+    hist = np.bincount(pixeles.ravel(), minlength=256).astype(np.float64)
+    prob = hist / max(hist.sum(), 1)
+    omega = np.cumsum(prob)
+    mu = np.cumsum(prob * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        varianza = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    return int(np.nanargmax(varianza))
+
+
+def mascara_tinta(gris: Image.Image) -> np.ndarray:
+    """Máscara booleana de tinta; si el fondo resulta oscuro (texto claro) se invierte."""
+    pixeles = np.asarray(gris)
+    tinta = pixeles <= umbral_otsu(pixeles)
+    return ~tinta if tinta.mean() > 0.5 else tinta
+
+
+def estimar_angulo(tinta: np.ndarray) -> float:
+    """Ángulo (grados) que endereza las líneas: máxima varianza del perfil de filas."""
+    imagen = Image.fromarray(tinta.astype(np.uint8) * 255)
+    if imagen.width > ANCHO_ENDEREZADO:
+        alto = max(1, round(imagen.height * ANCHO_ENDEREZADO / imagen.width))
+        imagen = imagen.resize((ANCHO_ENDEREZADO, alto), Image.Resampling.BILINEAR)
+
+    puntajes = {}
+
+    def mejor(angulos):
+        for angulo in angulos:
+            angulo = round(float(angulo), 4)
+            if angulo not in puntajes and abs(angulo) <= ANGULO_MAXIMO:
+                rotada = np.asarray(imagen.rotate(angulo, Image.Resampling.BILINEAR, fillcolor=0))
+                puntajes[angulo] = float(rotada.sum(axis=1, dtype=np.float64).var())
+        return max(puntajes, key=puntajes.get)
+
+    # Búsqueda gruesa en todo el rango y fina entre los vecinos del mejor ángulo grueso
+    grueso = mejor(np.arange(-ANGULO_MAXIMO, ANGULO_MAXIMO + PASO_GRUESO / 2, PASO_GRUESO))
+    return mejor(
+        np.arange(grueso - PASO_GRUESO, grueso + PASO_GRUESO + PASO_ANGULO / 2, PASO_ANGULO)
+    )
+
+
+def caja_tinta(tinta: np.ndarray) -> tuple[int, int, int, int] | None:
+    """(x0, y0, x1, y1) de las filas y columnas con tinta, o None si está en blanco."""
+    filas = np.flatnonzero(tinta.sum(axis=1) >= MIN_TINTA_FILA)
+    columnas = np.flatnonzero(tinta.sum(axis=0) >= MIN_TINTA_FILA)
+    if len(filas) == 0 or len(columnas) == 0:
+        return None
+    return int(columnas[0]), int(filas[0]), int(columnas[-1]) + 1, int(filas[-1]) + 1
+
+
+def estimar_altura_x(tinta: np.ndarray) -> int | None:
+    """
+    Mediana, entre las líneas de texto, de las filas con al menos FRACCION_CUERPO de la
+    tinta de la fila más cargada de su línea (el cuerpo de las letras). Las franjas con
+    poca tinta (tildes separadas de su línea, motas) no cuentan como líneas.
+    """
+    perfil = tinta.sum(axis=1)
+    minimo_linea = perfil.max() * FRACCION_CUERPO
+    con_texto = perfil >= MIN_TINTA_FILA
+    alturas = []
+    inicio = None
+    for y, hay_texto in enumerate(np.append(con_texto, False)):
+        if hay_texto and inicio is None:
+            inicio = y
+        elif not hay_texto and inicio is not None:
+            linea = perfil[inicio:y]
+            if len(linea) >= MIN_ALTO_LINEA and linea.max() >= minimo_linea:
+                alturas.append(int((linea >= linea.max() * FRACCION_CUERPO).sum()))
+            inicio = None
+    return int(np.median(alturas)) if alturas else None
+
+
+def preprocesar(imagen: Image.Image) -> tuple[Image.Image, dict]:
+    """Encabezado enderezado, recortado, reducido y binarizado, y los parámetros aplicados."""
+    gris = imagen.convert("L")
+    info = {"angulo": 0.0, "altura_x": None, "escala": 1.0, "recorte": None}
+
+    angulo = estimar_angulo(mascara_tinta(gris))
+    if abs(angulo) >= ANGULO_MINIMO:
+        gris = gris.rotate(angulo, Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+        info["angulo"] = angulo
+
+    tinta = mascara_tinta(gris)
+    caja = caja_tinta(tinta)
+    if caja is None:
+        return gris, info  # sin texto: se envía tal cual
+    gris = gris.crop(caja)
+    tinta = tinta[caja[1] : caja[3], caja[0] : caja[2]]
+    info["recorte"] = list(caja)
+
+    altura_x = estimar_altura_x(tinta)
+    info["altura_x"] = altura_x
+    if altura_x and altura_x > ALTURA_X_OBJETIVO:
+        escala = ALTURA_X_OBJETIVO / altura_x
+        tamano = (max(1, round(gris.width * escala)), max(1, round(gris.height * escala)))
+        gris = gris.resize(tamano, Image.Resampling.LANCZOS)
+        info["escala"] = round(escala, 4)
+
+    if BINARIZAR:
+        pixeles = np.asarray(gris)
+        fondo = pixeles > umbral_otsu(pixeles)
+        if fondo.mean() < 0.5:
+            fondo = ~fondo  # texto claro sobre fondo oscuro: se invierte
+        gris = Image.fromarray(np.where(fondo, 255, 0).astype(np.uint8)).convert("1")
+
+    # Fondo blanco alrededor para que el texto no toque el borde
+    con_margen = Image.new(
+        gris.mode, (gris.width + 2 * MARGEN_PX, gris.height + 2 * MARGEN_PX), 255
+    )
+    con_margen.paste(gris, (MARGEN_PX, MARGEN_PX))
+    return con_margen, info
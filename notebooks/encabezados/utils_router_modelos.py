@@ -0,0 +1,270 @@
+"""
+Enrutador de modelos para el OCR de encabezados.
+
+Cada encabezado se envía primero al nivel más barato y rápido (modelo + max_tokens
+ajustado). Si la respuesta no cumple el esquema esperado (tipo/fecha/hora/asunto)
+o la llamada falla, se escala al siguiente nivel. Por cada modelo se registran
+latencia, costo y tasa de éxito; un nivel cuya tasa de éxito cae por debajo de la
+mínima (con al menos MUESTRAS_MINIMAS intentos) se omite en adelante.
+
+Con `historial_path`, el enrutador parte de las estadísticas guardadas por las
+últimas HISTORIAL_EJECUCIONES ejecuciones (guardar_estadisticas): un nivel que ya
+no rendía empieza omitido, y la tasa mínima de cada nivel es su punto de
+equilibrio de costo frente al siguiente (ver tasa_minima). Un nivel omitido deja
+de aparecer en las ejecuciones nuevas, así que se vuelve a probar cuando sale de
+esa ventana.
+
+Uso:
+    enrutador = EnrutadorModelos(
+        [("gpt-4o-mini", 300), ("gpt-5-mini", 2500)],
+        prompt=PROMPT,
+        historial_path="router_estadisticas.json",
+    )
+    resultado = enrutador.procesar("pagina.jpg", output_path="salida.json", bbox=(0, 0, 1600, 220))
+    enrutador.guardar_estadisticas("router_estadisticas.json")
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from d_generar_json_unico import normalizar_fecha, normalizar_hora
+from utils_openai_ocr import VISION_MODELS, process_image_ocr
+from utils_metricas import percentil
+
+LLAVES_ENCABEZADO = ("tipo", "fecha", "hora", "asunto")
+TIPOS_VALIDOS = {"ASISTENCIA", "VOTACIÓN", "VOTACION"}
+
+# 🔧 Un nivel con menos de este porcentaje de respuestas válidas deja de intentarse
+# (si no hay costos conocidos para calcular su punto de equilibrio)
+TASA_MINIMA_EXITO = 0.5
+MUESTRAS_MINIMAS = 20
+# 🔧 Ejecuciones recientes del historial que se suman a las estadísticas de la actual
+HISTORIAL_EJECUCIONES = 5
+
+
+def cargar_historial(path, ejecuciones: int = HISTORIAL_EJECUCIONES) -> dict[str, dict]:
+    """
+    Suma por modelo los intentos, válidos y costo de las últimas `ejecuciones` del
+    historial que escribe EnrutadorModelos.guardar_estadisticas.
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        historial = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        print(f"⚠️ Historial del enrutador ilegible, se ignora: {path}")
+        return {}
+
+    previos: dict[str, dict] = defaultdict(lambda: {"intentos": 0, "validos": 0, "costo_usd": 0.0})
+    for ejecucion in historial[-ejecuciones:] if ejecuciones else []:
+        for modelo, datos in ejecucion.get("modelos", {}).items():
+            for campo in previos[modelo]:
+                previos[modelo][campo] += datos.get(campo, 0)
+    return dict(previos)
+
+
+def validar_encabezado(output) -> bool:
+    """
+    Verifica que la salida del OCR tenga el esquema del PROMPT: las cuatro llaves,
+    valores de texto o null, un tipo conocido y fecha/hora interpretables si vienen.
+    """
+    if not isinstance(output, dict) or any(llave not in output for llave in LLAVES_ENCABEZADO):
+        return False
+    if any(
+        output[llave] is not None and not isinstance(output[llave], str)
+        for llave in LLAVES_ENCABEZADO
+    ):
+        return False
+    if output["tipo"] is not None and output["tipo"].strip().upper() not in TIPOS_VALIDOS:
+        return False
+    if output["fecha"] and normalizar_fecha(output["fecha"]) is None:
+        return False
+    if output["hora"] and normalizar_hora(output["hora"]) is None:
+        return False
+    return True
+
+
+class EnrutadorModelos:
+    def __init__(
+        self,
+        niveles: list[tuple[str, int]],
+        prompt: str,
+        resize_percent: int = 100,
+        validar=validar_encabezado,
+        tasa_minima_exito: float = TASA_MINIMA_EXITO,
+        muestras_minimas: int = MUESTRAS_MINIMAS,
+        historial_path=None,
+    ):
+        desconocidos = [modelo for modelo, _ in niveles if modelo not in VISION_MODELS]
+        if desconocidos:
+            raise ValueError(f"Modelos sin precio en VISION_MODELS: {desconocidos}")
+
+        self.niveles = niveles
+        self.prompt = prompt
+        self.resize_percent = resize_percent
+        self.validar = validar
+        self.tasa_minima_exito = tasa_minima_exito
+        self.muestras_minimas = muestras_minimas
+
+        self._lock = threading.Lock()
+        self._intentos: dict[str, int] = defaultdict(int)
+        self._validos: dict[str, int] = defaultdict(int)
+        self._errores: dict[str, int] = defaultdict(int)
+        self._costo: dict[str, float] = defaultdict(float)
+        self._latencias: dict[str, list[float]] = defaultdict(list)
+        # {modelo: {"intentos", "validos", "costo_usd"}} de las ejecuciones anteriores
+        self._previos = cargar_historial(historial_path) if historial_path else {}
+
+    def registrar(
+        self, modelo: str, segundos: float, valido: bool, error: bool = False, costo: float = 0.0
+    ) -> None:
+        """Registra un intento (también los hechos fuera del enrutador, p. ej. en lotes)."""
+        with self._lock:
+            self._intentos[modelo] += 1
+            self._validos[modelo] += int(valido)
+            self._errores[modelo] += int(error)
+            self._costo[modelo] += costo
+            self._latencias[modelo].append(segundos)
+
+    def _conteos(self, modelo: str) -> tuple[int, int, float]:
+        """Intentos, válidos y costo del modelo: historial más esta ejecución."""
+        previos = self._previos.get(modelo, {})
+        with self._lock:
+            return (
+                previos.get("intentos", 0) + self._intentos.get(modelo, 0),
+                previos.get("validos", 0) + self._validos.get(modelo, 0),
+                previos.get("costo_usd", 0.0) + self._costo.get(modelo, 0.0),
+            )
+
+    def tasa_exito(self, modelo: str) -> float | None:
+        intentos, validos, _ = self._conteos(modelo)
+        return validos / intentos if intentos else None
+
+    def tasa_minima(self, posicion: int) -> float:
+        """
+        Tasa de éxito a partir de la cual conviene intentar el nivel antes que el
+        siguiente. Con costos medios por intento c (nivel) y c' (siguiente), intentar
+        primero cuesta c + (1 - p)·c', menos que ir directo al siguiente si p > c / c'.
+        Sin costos conocidos de ambos se usa tasa_minima_exito.
+        """
+        costos = []
+        for modelo, _ in self.niveles[posicion : posicion + 2]:
+            intentos, _, costo = self._conteos(modelo)
+            costos.append(costo / intentos if intentos else 0.0)
+        if len(costos) < 2 or not (costos[0] and costos[1]):
+            return self.tasa_minima_exito
+        return min(costos[0] / costos[1], 1.0)
+
+    def _nivel_activo(self, posicion: int) -> bool:
+        intentos, validos, _ = self._conteos(self.niveles[posicion][0])
+        if intentos < self.muestras_minimas:
+            return True
+        return validos / intentos >= self.tasa_minima(posicion)
+
+    def primer_nivel_activo(self) -> int:
+        """
+        Posición en `niveles` del primer nivel que no se omite (el último nunca se
+        omite). Para llamadas hechas fuera del enrutador, p. ej. los lotes.
+        """
+        for posicion in range(len(self.niveles) - 1):
+            if self._nivel_activo(posicion):
+                return posicion
+        return len(self.niveles) - 1
+
+    def procesar(self, image_path, output_path=None, bbox=None, desde: int = 0) -> dict:
+        """
+        Recorre los niveles desde `desde` hasta obtener una salida válida.
+
+        Retorna {"output": ..., "meta": ...} como process_image_ocr; meta["router"]
+        lista los intentos y el costo total. Si ningún nivel da una salida válida se
+        guarda la última respuesta obtenida (router.valid = False); si todos fallan
+        con excepción, se propaga el último error.
+        """
+        intentos = []
+        resultado = None
+        ultimo_error = None
+        niveles = self.niveles[desde:]
+
+        for posicion, (modelo, max_tokens) in enumerate(niveles):
+            es_ultimo = posicion == len(niveles) - 1
+            if not es_ultimo and not self._nivel_activo(desde + posicion):
+                continue
+
+            inicio = time.perf_counter()
+            try:
+                resultado = process_image_ocr(
+                    image_path,
+                    resize_percent=self.resize_percent,
+                    model=modelo,
+                    max_tokens=max_tokens,
+                    prompt=self.prompt,
+                    bbox=bbox,
+                )
+            except Exception as e:
+                ultimo_error = e
+                self.registrar(modelo, time.perf_counter() - inicio, valido=False, error=True)
+                intentos.append({"model": modelo, "valid": False, "error": str(e)[:200]})
+                continue
+
+            valido = self.validar(resultado["output"])
+            costo = resultado["meta"]["cost_usd"]
+            self.registrar(modelo, time.perf_counter() - inicio, valido, costo=costo)
+            intentos.append({"model": modelo, "valid": valido, "cost_usd": costo})
+            if valido:
+                break
+
+        if resultado is None:
+            raise ultimo_error or RuntimeError("No hay niveles de modelo disponibles")
+
+        resultado["meta"]["router"] = {
+            "valid": intentos[-1]["valid"],
+            "attempts": intentos,
+            "cost_usd_total": round(sum(i.get("cost_usd", 0.0) for i in intentos), 6),
+        }
+        if output_path:
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, indent=2, ensure_ascii=False)
+        return resultado
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                modelo: {
+                    "intentos": self._intentos[modelo],
+                    "validos": self._validos[modelo],
+                    "errores": self._errores[modelo],
+                    "tasa_exito": round(self._validos[modelo] / self._intentos[modelo], 3),
+                    "costo_usd": round(self._costo[modelo], 5),
+                    "latencia_p50": round(percentil(self._latencias[modelo], 50), 3),
+                    "latencia_p95": round(percentil(self._latencias[modelo], 95), 3),
+                }
+                for modelo in self._intentos
+            }
+
+    def imprimir_estadisticas(self) -> None:
+        print("🧭 Enrutador de modelos:")
+        for modelo, datos in self.estadisticas().items():
+            print(
+                f"   {modelo:12} {datos['intentos']:5} intentos | éxito {datos['tasa_exito']:.0%} | "
+                f"${datos['costo_usd']:.4f} | p50={datos['latencia_p50']}s "
+                f"p95={datos['latencia_p95']}s"
+            )
+
+    def guardar_estadisticas(self, path) -> None:
+        """Agrega las estadísticas de esta ejecución al historial JSON de `path`."""
+        path = Path(path)
+        historial = json.loads(path.read_text(encoding="utf-8")) if path.exists() else []
+        historial.append(
+            {
+                "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "niveles": self.niveles,
+                "modelos": self.estadisticas(),
+            }
+        )
+        path.write_text(
+            json.dumps(historial, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
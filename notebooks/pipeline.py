@@ -0,0 +1,506 @@
+"""
+Orquestador del pipeline completo (scraping → deduplicación → clasificación → zonas → OCR →
+JSON único).
+
+Cada etapa es uno de los scripts existentes, declarado con sus entradas, salidas
+y dependencias. El orquestador:
+
+- Ejecuta las etapas en orden de dependencias, una a la vez (el grafo es una
+  cadena: cada etapa consume la salida de la anterior). Cada script corre en su
+  carpeta, con sus rutas relativas.
+- Omite las etapas cuyas entradas (y el propio script) no cambiaron desde la
+  última ejecución exitosa, siempre que sus salidas sigan existiendo. La huella
+  se toma antes de ejecutar la etapa, de modo que una entrada modificada mientras
+  corría invalida el resultado en la siguiente ejecución.
+- Con --streaming, las etapas descarga → imágenes → clasificación → zonas se
+  encadenan por documento: cada PDF se rasteriza apenas termina de descargarse y
+  sus páginas se clasifican y recortan en cuanto están disponibles, de modo que
+  los primeros encabezados aparecen antes de terminar de descargar el último PDF.
+
+Uso:
+    python pipeline.py                 # ejecuta lo que haga falta
+    python pipeline.py --listar        # muestra el DAG y qué etapas están al día
+    python pipeline.py --hasta zonas   # ejecuta solo hasta una etapa
+    python pipeline.py --forzar        # ignora la caché de huellas
+    python pipeline.py --streaming     # encadena por documento las etapas de scraping
+
+Todas las etapas de una ejecución comparten PIPELINE_RUN_ID, de modo que sus
+métricas (ver utils_metricas.py) quedan en un único metricas/<run_id>.jsonl.
+
+Los scripts importan los módulos compartidos de notebooks/ (utils_metricas,
+utils_recursos): el orquestador los ejecuta con notebooks/ en PYTHONPATH. Para
+correr un script suelto desde su carpeta:
+    PYTHONPATH=.. python f_zones.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import utils_recursos as recursos
+from utils_metricas import run_id
+
+BASE_DIR = Path(__file__).resolve().parent
+ESTADO_PATH = BASE_DIR / ".pipeline_estado.json"
+
+
+@dataclass
+class Etapa:
+    nombre: str
+    script: str  # Ruta relativa a BASE_DIR; el script se ejecuta desde su carpeta
+    entradas: list[str] = field(default_factory=list)
+    salidas: list[str] = field(default_factory=list)
+    depende_de: list[str] = field(default_factory=list)
+
+
+ETAPAS = [
+    Etapa(
+        "nuevos_documentos",
+        "scraping/a_nuevos_documentos.py",
+        entradas=["scraping/data/Table.html"],
+        salidas=["scraping/data/documentos_historico.csv"],
+    ),
+    Etapa(
+        "base_scraper",
+        "scraping/b_construir_base_scraper.py",
+        entradas=[
+            "scraping/data/documentos_historico.csv",
+            "scraping/data/documentos_excluidos.csv",
+            "encabezados/jsons",
+        ],
+        salidas=["scraping/data/documentos_scraper.csv"],
+        depende_de=["nuevos_documentos"],
+    ),
+    Etapa(
+        "descarga",
+        "scraping/c_scraper_parallel.py",
+        entradas=["scraping/data/documentos_scraper.csv"],
+        salidas=["scraping/data/pdfs"],
+        depende_de=["base_scraper"],
+    ),
+    Etapa(
+        "imagenes",
+        "scraping/d_extract_images.py",
+        entradas=["scraping/data/documentos_scraper.csv", "scraping/data/pdfs"],
+        salidas=["scraping/data/images"],
+        depende_de=["descarga"],
+    ),
+    Etapa(
+        "deduplicacion",
+        "scraping/d_deduplicar_paginas.py",
+        entradas=["scraping/data/images"],
+        salidas=["scraping/data/paginas_phash.jsonl"],
+        depende_de=["imagenes"],
+    ),
+    Etapa(
+        "clasificacion",
+        "scraping/e_classifier_images.py",
+        entradas=["scraping/data/images", "scraping/data/weights_efficientnet_b0.pth"],
+        salidas=["scraping/data/classification"],
+        depende_de=["deduplicacion"],
+    ),
+    Etapa(
+        "zonas",
+        "scraping/f_zones.py",
+        entradas=["scraping/data/classification", "scraping/data/weights_yolo_zones_best.pt"],
+        salidas=["scraping/data/zones"],
+        depende_de=["clasificacion"],
+    ),
+    Etapa(
+        "listar_encabezados",
+        "encabezados/a_listar.py",
+        entradas=["scraping/data/zones"],
+        salidas=["encabezados/encabezados.csv"],
+        depende_de=["zonas"],
+    ),
+    Etapa(
+        "ocr",
+        "encabezados/b_openai_api.py",
+        entradas=["encabezados/encabezados.csv"],
+        salidas=["encabezados/api_outputs"],
+        depende_de=["listar_encabezados"],
+    ),
+    Etapa(
+        "normalizar",
+        "encabezados/c_normalizar_jsons.py",
+        entradas=[
+            "encabezados/api_outputs",
+            "scraping/data/paginas_duplicadas.jsonl",
+            "scraping/data/pdfs/indice_contenido.jsonl",
+        ],
+        salidas=["encabezados/jsons"],
+        depende_de=["ocr"],
+    ),
+    Etapa(
+        "json_unico",
+        "encabezados/d_generar_json_unico.py",
+        entradas=["encabezados/jsons", "scraping/data/documentos_historico.csv"],
+        salidas=["../public/db/encabezados_unificados.json"],
+        depende_de=["normalizar", "nuevos_documentos"],
+    ),
+]
+
+# Etapas que --streaming reemplaza por el pipeline por documento
+ETAPAS_STREAMING = ["descarga", "imagenes", "deduplicacion", "clasificacion", "zonas"]
+
+
+# ========== HUELLAS DE ENTRADAS ==========
+
+
+def _huella_ruta(ruta: Path, hasher) -> None:
+    """Agrega al hash el nombre, tamaño y mtime de un archivo o de todo un directorio."""
+    if ruta.is_file():
+        stat = ruta.stat()
+        hasher.update(f"{ruta}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    elif ruta.is_dir():
+        for raiz, dirs, files in os.walk(ruta):
+            dirs.sort()
+            for nombre in sorted(files):
+                _huella_ruta(Path(raiz) / nombre, hasher)
+    else:
+        hasher.update(f"{ruta}|ausente\n".encode())
+
+
+def huella_etapa(etapa: Etapa) -> str:
+    hasher = hashlib.sha256()
+    hasher.update((BASE_DIR / etapa.script).read_bytes())
+    for entrada in etapa.entradas:
+        _huella_ruta(BASE_DIR / entrada, hasher)
+    return hasher.hexdigest()
+
+
+def etapa_al_dia(etapa: Etapa, estado: dict[str, str], huella: str | None = None) -> bool:
+    if not all((BASE_DIR / salida).exists() for salida in etapa.salidas):
+        return False
+    return estado.get(etapa.nombre) == (huella or huella_etapa(etapa))
+
+
+def cargar_estado() -> dict[str, str]:
+    if not ESTADO_PATH.exists():
+        return {}
+    with ESTADO_PATH.open(encoding="utf-8") as file:
+        return json.load(file)
+
+
+def guardar_estado(estado: dict[str, str]) -> None:
+    with ESTADO_PATH.open("w", encoding="utf-8") as file:
+        json.dump(estado, file, indent=2)
+        file.write("\n")
+
+
+# ========== EJECUCIÓN DEL DAG ==========
+
+
+def seleccionar_etapas(hasta: str | None) -> list[Etapa]:
+    """Devuelve las etapas necesarias para llegar a `hasta` (todas si es None)."""
+    por_nombre = {etapa.nombre: etapa for etapa in ETAPAS}
+    if hasta is None:
+        return list(ETAPAS)
+    if hasta not in por_nombre:
+        raise ValueError(f"Etapa desconocida: {hasta}")
+
+    necesarias = set()
+    pendientes = [hasta]
+    while pendientes:
+        nombre = pendientes.pop()
+        if nombre not in necesarias:
+            necesarias.add(nombre)
+            pendientes.extend(por_nombre[nombre].depende_de)
+
+    return [etapa for etapa in ETAPAS if etapa.nombre in necesarias]
+
+
+def ejecutar_script(etapa: Etapa) -> bool:
+    script = BASE_DIR / etapa.script
+    print(f"▶️  [{etapa.nombre}] python {etapa.script}")
+    inicio = time.time()
+    entorno = dict(os.environ)
+    entorno["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(BASE_DIR), os.environ.get("PYTHONPATH")])
+    )
+    proceso = subprocess.run([sys.executable, script.name], cwd=script.parent, env=entorno)
+    duracion = time.time() - inicio
+
+    if proceso.returncode != 0:
+        print(f"❌ [{etapa.nombre}] terminó con código {proceso.returncode} ({duracion:.1f}s)")
+        return False
+
+    print(f"✅ [{etapa.nombre}] completada en {duracion:.1f}s")
+    return True
+
+
+def ejecutar_dag(etapas: list[Etapa], forzar: bool = False, ejecutores: dict | None = None):
+    """
+    Ejecuta las etapas en orden (ETAPAS ya está ordenada por dependencias) y omite
+    las que dependan de una etapa fallida. `ejecutores` permite reemplazar la
+    ejecución de una etapa (por defecto se corre su script).
+    """
+    ejecutores = ejecutores or {}
+    estado = cargar_estado()
+    nombres = {etapa.nombre for etapa in etapas}
+    fallidas: set[str] = set()
+
+    for etapa in etapas:
+        if any(d in fallidas for d in etapa.depende_de if d in nombres):
+            print(f"⏭️  [{etapa.nombre}] omitida: falló una dependencia")
+            fallidas.add(etapa.nombre)
+            continue
+
+        # Huella de las entradas tal como las va a leer la etapa
+        huella = huella_etapa(etapa)
+        if not forzar and etapa_al_dia(etapa, estado, huella):
+            print(f"💤 [{etapa.nombre}] sin cambios en sus entradas, se omite")
+            continue
+
+        if ejecutores.get(etapa.nombre, ejecutar_script)(etapa):
+            estado[etapa.nombre] = huella
+            guardar_estado(estado)
+        else:
+            fallidas.add(etapa.nombre)
+
+    return not fallidas
+
+
+# ========== PIPELINE POR DOCUMENTO (STREAMING) ==========
+
+
+def etapas_con_streaming(etapas: list[Etapa]) -> list[Etapa]:
+    """Reemplaza las etapas de ETAPAS_STREAMING por una sola etapa "scraping_streaming"."""
+    agrupadas = [etapa for etapa in etapas if etapa.nombre in ETAPAS_STREAMING]
+    if not agrupadas:
+        return etapas
+
+    # Entradas externas al grupo (las salidas intermedias se generan dentro del streaming)
+    salidas_grupo = [salida for etapa in agrupadas for salida in etapa.salidas]
+    entradas = []
+    for etapa in agrupadas:
+        for entrada in etapa.entradas:
+            if entrada not in entradas and not any(entrada.startswith(s) for s in salidas_grupo):
+                entradas.append(entrada)
+
+    combinada = Etapa(
+        "scraping_streaming",
+        "pipeline.py",
+        entradas=entradas,
+        salidas=agrupadas[-1].salidas,
+        depende_de=list(agrupadas[0].depende_de),
+    )
+
+    resultado = []
+    for etapa in etapas:
+        if etapa.nombre in ETAPAS_STREAMING:
+            if etapa is agrupadas[0]:
+                resultado.append(combinada)
+            continue
+        depende_de = [combinada.nombre if d in ETAPAS_STREAMING else d for d in etapa.depende_de]
+        resultado.append(
+            Etapa(etapa.nombre, etapa.script, etapa.entradas, etapa.salidas, depende_de)
+        )
+    return resultado
+
+
+def ejecutar_streaming(_etapa: Etapa | None = None) -> bool:
+    """
+    Encadena descarga → imágenes → clasificación → zonas documento a documento,
+    reutilizando las funciones de los scripts de scraping.
+    """
+    scraping_dir = BASE_DIR / "scraping"
+    cwd_original = os.getcwd()
+    os.chdir(scraping_dir)
+    sys.path.insert(0, str(scraping_dir))
+    try:
+        return _ejecutar_streaming()
+    finally:
+        os.chdir(cwd_original)
+
+
+def _ejecutar_streaming() -> bool:
+    import multiprocessing
+    import shutil
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    import c_scraper_parallel as descarga
+    import d_deduplicar_paginas as deduplicacion
+    import d_extract_images as imagenes
+    import e_classifier_images as clasificacion
+    import f_zones as zonas
+    import utils_paquetes as paquetes
+
+    # Mismo punto de partida que los scripts: carpetas de salida limpias
+    os.makedirs(descarga.DOWNLOAD_DIR, exist_ok=True)
+    imagenes.limpiar_carpeta_imagenes()
+    if os.path.exists(clasificacion.OUTPUT_PATH):
+        shutil.rmtree(clasificacion.OUTPUT_PATH)
+    os.makedirs(clasificacion.OUTPUT_PATH, exist_ok=True)
+    zonas.limpiar_carpeta_zonas(zonas.output_dir)
+
+    df = descarga.cargar_documentos()
+    permitidos = imagenes._load_allowed_pdfs()
+
+    # Núcleos repartidos entre los procesos de rasterizado y el proceso principal, que
+    # clasifica y detecta zonas con los hilos de torch/OpenCV asignados a "zonas"
+    fijos = {"zonas": 1}
+    if imagenes.NUM_WORKERS:
+        fijos["imagenes"] = imagenes.NUM_WORKERS
+    plan = recursos.planificar(["imagenes", "zonas"], procesos=fijos)
+    recursos.imprimir_plan(plan)
+    zonas.metricas.evento("recursos", **recursos.describir(plan))
+    recursos.configurar_hilos(plan["zonas"].hilos)
+
+    # Con servidor_inferencia.py corriendo ambos son clientes del servidor
+    modelo_clasificador, transform, device = clasificacion.obtener_clasificador()
+    modelo_zonas = zonas.cargar_modelo(zonas.model_path)
+    indice_paginas = deduplicacion.IndicePaginas()
+    # Las páginas clasificadas de cada PDF se escriben en sus paquetes de una sola vez
+    escritores = paquetes.EscritoresPaquetes()
+
+    inicio = time.time()
+    contadores = {"paginas": 0, "duplicadas": 0, "encabezados": 0, "errores": 0}
+
+    def clasificar_y_recortar(future, file_name):
+        """Clasifica las páginas de un PDF ya rasterizado y recorta los encabezados de votación."""
+        try:
+            future.result()
+        except Exception as e:
+            print(f"❌ Error procesando {file_name}: {e}")
+            contadores["errores"] += 1
+            return
+
+        base_name = file_name.rsplit(".", 1)[0]
+        # JPEG sueltos o páginas del paquete del PDF (imagenes.EMPAQUETAR_PAGINAS)
+        for image_path in paquetes.listar_paginas(imagenes.IMAGES_FOLDER, base_name):
+            contadores["paginas"] += 1
+            # Las páginas repetidas reutilizan el resultado de su página canónica
+            if indice_paginas.deduplicar(image_path) is not None:
+                contadores["duplicadas"] += 1
+                continue
+
+            clase = clasificacion.classify_and_save(
+                image_path=image_path,
+                model=modelo_clasificador,
+                transform=transform,
+                class_names=clasificacion.CLASS_NAMES,
+                output_base_path=clasificacion.OUTPUT_PATH,
+                device=device,
+                escritores=escritores,
+            )
+            if clase != "votacion":
+                continue
+
+            # En modo multirresolución se rasteriza aquí la página a alta resolución
+            image_bgr, pagina_path = zonas.cargar_pagina(image_path, zonas.output_dir)
+            if image_bgr is None:
+                continue
+            recortes = zonas.recortar_encabezados(
+                modelo_zonas,
+                image_bgr,
+                os.path.basename(image_path),
+                zonas.output_dir,
+                pagina_path,
+            )
+            zonas.anexar_manifiesto(recortes, zonas.output_dir)
+            contadores["encabezados"] += len(recortes)
+        escritores.cerrar()
+
+        print(
+            f"⏱️  {time.time() - inicio:.1f}s | {file_name} listo | "
+            f"{contadores['paginas']} páginas | {contadores['encabezados']} encabezados"
+        )
+
+    # spawn: el proceso padre ya tiene hilos y modelos de torch cargados
+    contexto = multiprocessing.get_context("spawn")
+    with (
+        ThreadPoolExecutor(max_workers=descarga.MAX_WORKERS) as descargas,
+        ProcessPoolExecutor(
+            max_workers=plan["imagenes"].procesos,
+            mp_context=contexto,
+            initializer=recursos.configurar_hilos,
+            initargs=(plan["imagenes"].hilos,),
+        ) as rasterizado,
+    ):
+        futuros_descarga = [
+            descargas.submit(descarga.download_file, index, row) for index, row in df.iterrows()
+        ]
+        futuros_pdf = {}
+
+        # Cada PDF descargado pasa de inmediato al rasterizado
+        for future in as_completed(futuros_descarga):
+            index, success, error = future.result()
+            if not success:
+                print(f"⚠️ Error en índice {index}: {error}")
+                contadores["errores"] += 1
+            elif df.loc[index, "file_name"] in permitidos:
+                file_name = df.loc[index, "file_name"]
+                # Un alias del mismo contenido recibe los resultados del PDF canónico
+                if descarga.obtener_almacen().es_canonico(file_name):
+                    futuros_pdf[rasterizado.submit(imagenes.process_pdf, file_name)] = file_name
+
+            # Mientras siguen las descargas, clasificar los PDFs ya rasterizados
+            for listo in [f for f in futuros_pdf if f.done()]:
+                clasificar_y_recortar(listo, futuros_pdf.pop(listo))
+
+        for listo in as_completed(list(futuros_pdf)):
+            clasificar_y_recortar(listo, futuros_pdf.pop(listo))
+
+    escritores.cerrar()
+    indice_paginas.cerrar()
+    for modulo in (descarga, imagenes, deduplicacion, clasificacion, zonas):
+        modulo.metricas.cerrar()
+
+    print(
+        f"\n✅ Streaming completado: {len(df)} documentos, {contadores['paginas']} páginas "
+        f"({contadores['duplicadas']} duplicadas), {contadores['encabezados']} encabezados, "
+        f"{contadores['errores']} errores "
+        f"({time.time() - inicio:.1f}s)"
+    )
+    return True
+
+
+# ========== CLI ==========
+
+
+def listar(etapas: list[Etapa]) -> None:
+    estado = cargar_estado()
+    for etapa in etapas:
+        marca = "✅ al día" if etapa_al_dia(etapa, estado) else "🔄 pendiente"
+        dependencias = ", ".join(etapa.depende_de) or "-"
+        print(f"  {etapa.nombre:20} {marca:14} ← {dependencias}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Orquestador del pipeline de votaciones")
+    parser.add_argument("--hasta", help="Última etapa a ejecutar (incluye sus dependencias)")
+    parser.add_argument("--forzar", action="store_true", help="Ejecutar aunque nada haya cambiado")
+    parser.add_argument("--listar", action="store_true", help="Mostrar el DAG y su estado")
+    parser.add_argument(
+        "--streaming", action="store_true", help="Encadenar por documento descarga → zonas"
+    )
+    args = parser.parse_args()
+
+    etapas = seleccionar_etapas(args.hasta)
+    if args.streaming:
+        etapas = etapas_con_streaming(etapas)
+
+    if args.listar:
+        listar(etapas)
+        return
+
+    print(f"📈 Métricas de la ejecución en metricas/{run_id()}.jsonl")
+
+    ejecutores = {}
+    if args.streaming:
+        ejecutores = {"scraping_streaming": ejecutar_streaming}
+
+    ok = ejecutar_dag(etapas, forzar=args.forzar, ejecutores=ejecutores)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
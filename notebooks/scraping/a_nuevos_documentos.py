@@ -1,28 +1,23 @@
+import re
+import unicodedata
+import uuid
+from collections import Counter
 from pathlib import Path
 
-TABLE_HTML_PATH = Path("./data/Table.html")
-DOCUMENTOS_HISTORICO_PATH = Path("./data/documentos_historico.csv")
-
-########################################
-# 1. Leer los datos de table
-########################################
-from bs4 import BeautifulSoup
-
-with open(TABLE_HTML_PATH, "r", encoding="utf-8") as file:
-    html = file.read()
-
-# Crear un objeto BeautifulSoup
-soup = BeautifulSoup(html, "html.parser")
+import pandas as pd
+from utils_historico import COLUMNAS_DOCUMENTOS, DOCUMENTOS_HISTORICO_PATH, anexar_documentos
 
-import re
+TABLE_HTML_PATH = Path("./data/Table.html")
 
-# Lista para guardar resultados
-result = []
+# 🔧 Motor de parseo de Table.html: "lxml" (streaming, una sola pasada) o "bs4" (BeautifulSoup)
+MOTOR_PARSER = "lxml"
 
-# Variables para rastrear la jerarquía actual
-current_periodo_parlamentario = None
-current_periodo_anual = None
-current_legislatura = None
+# Textos que identifican cada nivel de la jerarquía dentro de las etiquetas <font>
+MARCADORES_JERARQUIA = {
+    "periodo_parlamentario": "Congreso de la República",
+    "periodo_anual": "Período Anual de Sesiones",
+    "legislatura": "Legislatura",
+}
 
 
 # Función para limpiar espacios adicionales
@@ -31,89 +26,183 @@ def clean_text(text):
     return re.sub(r"\s+", " ", text).strip()
 
 
-# Recorrer todas las filas de la tabla
-for tr in soup.find_all("tr", valign="top"):
-    # Verificar si contiene un Periodo Parlamentario
-    font_periodo_parlamentario = tr.find(
-        "font", string=lambda text: text and "Congreso de la República" in text
-    )
-    if font_periodo_parlamentario:
-        current_periodo_parlamentario = clean_text(font_periodo_parlamentario.text)
-
-    # Verificar si contiene un Periodo Anual de Sesiones
-    font_periodo_anual = tr.find(
-        "font", string=lambda text: text and "Período Anual de Sesiones" in text
-    )
-    if font_periodo_anual:
-        current_periodo_anual = clean_text(font_periodo_anual.text)
-
-    # Verificar si contiene una Legislatura
-    font_legislatura = tr.find("font", string=lambda text: text and "Legislatura" in text)
-    if font_legislatura:
-        current_legislatura = clean_text(font_legislatura.text)
-
-    # Buscar todos los enlaces en la fila
-    a_tags = tr.find_all("a", href=True)
-
-    # Procesar solo si hay enlaces
-    if a_tags:
-        # Buscar el enlace que tenga texto (no vacío)
-        link_text = None
-        link = None
-
-        # Si el enlace tiene texto
-        for a_tag in a_tags:
-            text = clean_text(a_tag.get_text())
-            if text:
-                link = a_tag["href"]
-                link_text = text
-                break
-
-        # Si encontramos un enlace con texto, guardarlo
-        if link and link_text:
-            result.append(
-                {
-                    "periodo_parlamentario": current_periodo_parlamentario,
-                    "periodo_anual": current_periodo_anual,
-                    "legislatura": current_legislatura,
-                    "descripcion": link_text,
-                    "link": link,
-                }
-            )
-
-# Mostrar los resultados
-for item in result[13:15]:
-    print(f"Periodo Parlamentario: {item['periodo_parlamentario']}")
-    print(f"Periodo Anual de Sesiones: {item['periodo_anual']}")
-    print(f"Legislatura: {item['legislatura']}")
-    print(f"Descripción: {item['descripcion']}")
-    print(f"Link: {item['link']}")
-    print("-" * 40)
-
-print("Total de resultados:", len(result))
-
-# Debug de los datos de los links
-from collections import Counter
+########################################
+# 1. Leer los datos de table
+########################################
 
-link_types = Counter()
-for item in result:
-    if "javascript:openWindow(" in item["link"]:
-        link_types["javascript"] += 1
-    else:
-        link_types["otros"] += 1
 
-print(link_types)
+def parsear_tabla_bs4(table_html_path: Path) -> list[dict]:
+    """Parsea Table.html con BeautifulSoup recorriendo cada <tr valign="top">."""
+    from bs4 import BeautifulSoup
+
+    with open(table_html_path, "r", encoding="utf-8") as file:
+        html = file.read()
+
+    # Crear un objeto BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Lista para guardar resultados
+    result = []
+
+    # Variables para rastrear la jerarquía actual
+    current_periodo_parlamentario = None
+    current_periodo_anual = None
+    current_legislatura = None
+
+    # Recorrer todas las filas de la tabla
+    for tr in soup.find_all("tr", valign="top"):
+        # Verificar si contiene un Periodo Parlamentario
+        font_periodo_parlamentario = tr.find(
+            "font", string=lambda text: text and "Congreso de la República" in text
+        )
+        if font_periodo_parlamentario:
+            current_periodo_parlamentario = clean_text(font_periodo_parlamentario.text)
+
+        # Verificar si contiene un Periodo Anual de Sesiones
+        font_periodo_anual = tr.find(
+            "font", string=lambda text: text and "Período Anual de Sesiones" in text
+        )
+        if font_periodo_anual:
+            current_periodo_anual = clean_text(font_periodo_anual.text)
+
+        # Verificar si contiene una Legislatura
+        font_legislatura = tr.find("font", string=lambda text: text and "Legislatura" in text)
+        if font_legislatura:
+            current_legislatura = clean_text(font_legislatura.text)
+
+        # Buscar todos los enlaces en la fila
+        a_tags = tr.find_all("a", href=True)
+
+        # Procesar solo si hay enlaces
+        if a_tags:
+            # Buscar el enlace que tenga texto (no vacío)
+            link_text = None
+            link = None
+
+            # Si el enlace tiene texto
+            for a_tag in a_tags:
+                text = clean_text(a_tag.get_text())
+                if text:
+                    link = a_tag["href"]
+                    link_text = text
+                    break
+
+            # Si encontramos un enlace con texto, guardarlo
+            if link and link_text:
+                result.append(
+                    {
+                        "periodo_parlamentario": current_periodo_parlamentario,
+                        "periodo_anual": current_periodo_anual,
+                        "legislatura": current_legislatura,
+                        "descripcion": link_text,
+                        "link": link,
+                    }
+                )
+
+    return result
+
+
+def _texto_unico(elemento):
+    """Equivalente a `Tag.string` de BeautifulSoup: texto solo si hay un único hijo."""
+    while True:
+        hijos = list(elemento)
+        if not hijos:
+            return elemento.text
+        if len(hijos) > 1 or elemento.text or hijos[0].tail:
+            return None
+        elemento = hijos[0]
+
+
+def parsear_tabla_lxml(table_html_path) -> list[dict]:
+    """
+    Parsea Table.html en streaming con lxml.etree.iterparse.
+
+    Recorre el documento una sola vez manteniendo una pila de las filas
+    <tr valign="top"> abiertas (las filas se anidan). Cada <font> y <a> se evalúa
+    una vez al cerrarse y se asigna a todas las filas abiertas que lo contienen,
+    reproduciendo los `tr.find(...)` de la versión BeautifulSoup. Al terminar se
+    aplica la jerarquía periodo/legislatura en el orden original de las filas.
+
+    `table_html_path` puede ser una ruta o un objeto binario tipo archivo.
+    """
+    from lxml import etree
+
+    filas = []  # En orden de apertura, igual que soup.find_all("tr", valign="top")
+    pila = []
+
+    for evento, elemento in etree.iterparse(
+        str(table_html_path) if isinstance(table_html_path, Path) else table_html_path,
+        events=("start", "end"),
+        html=True,
+        encoding="utf-8",
+    ):
+        tag = elemento.tag
+
+        if tag == "tr" and elemento.get("valign") == "top":
+            if evento == "start":
+                fila = {"link": None, "descripcion": None}
+                filas.append(fila)
+                pila.append(fila)
+            else:
+                pila.pop()
+                # Fuera de toda fila ya no se necesita el subárbol procesado
+                if not pila:
+                    elemento.clear(keep_tail=True)
+                    while elemento.getprevious() is not None:
+                        del elemento.getparent()[0]
+            continue
+
+        if evento != "end" or not pila:
+            continue
+
+        if tag == "font":
+            texto = _texto_unico(elemento)
+            if not texto:
+                continue
+            for clave, marcador in MARCADORES_JERARQUIA.items():
+                if marcador in texto:
+                    for fila in pila:
+                        fila.setdefault(clave, clean_text("".join(elemento.itertext())))
+
+        elif tag == "a" and elemento.get("href") is not None:
+            texto = clean_text("".join(elemento.itertext()))
+            if not texto:
+                continue
+            for fila in pila:
+                if fila["link"] is None:
+                    fila["link"] = elemento.get("href")
+                    fila["descripcion"] = texto
+
+    # Aplicar la jerarquía en el orden de las filas
+    result = []
+    actual = {clave: None for clave in MARCADORES_JERARQUIA}
+    for fila in filas:
+        for clave in MARCADORES_JERARQUIA:
+            if clave in fila:
+                actual[clave] = fila[clave]
+
+        if fila["link"] and fila["descripcion"]:
+            result.append({**actual, "descripcion": fila["descripcion"], "link": fila["link"]})
+
+    return result
+
+
+def parsear_tabla(table_html_path: Path, motor: str = MOTOR_PARSER) -> list[dict]:
+    if motor == "lxml":
+        try:
+            return parsear_tabla_lxml(table_html_path)
+        except ImportError:
+            print("⚠️ lxml no está instalado, usando BeautifulSoup")
+    elif motor != "bs4":
+        raise ValueError(f"Motor de parseo no soportado: {motor}")
+
+    return parsear_tabla_bs4(table_html_path)
+
 
 ###################################################################
 # 2. Generar los links de descarga y nombre de cada archivo
 ###################################################################
 
-import re
-import unicodedata
-import uuid
-
-import pandas as pd
-
 
 def clean_filename(text):
     text = unicodedata.normalize("NFKD", text)
@@ -129,63 +218,75 @@ def generate_uuid_filename(url):
     return f"{str(full_uuid)}.pdf"
 
 
-# Filtrar los links válidos
-clean_results = [item for item in result if "javascript:openWindow(" in item["link"]]
+def construir_documentos(result: list[dict]) -> pd.DataFrame:
+    # Filtrar los links válidos
+    clean_results = [item for item in result if "javascript:openWindow(" in item["link"]]
+
+    # Crear DataFrame
+    df_result = pd.DataFrame(clean_results)
+    if df_result.empty:
+        return pd.DataFrame(columns=COLUMNAS_DOCUMENTOS)
 
-# Crear DataFrame
-df_result = pd.DataFrame(clean_results)
+    # Extraer el link limpio
+    base_link = "https://www2.congreso.gob.pe/Sicr/RelatAgenda/PlenoComiPerm20112016.nsf/"
+    df_result["clean_link"] = df_result["link"].str.extract(r"javascript:openWindow\('([^']+)'\)")
+    df_result["clean_link"] = base_link + df_result["clean_link"]
+    df_result.drop("link", axis=1, inplace=True)
 
-# Extraer el link limpio
-base_link = "https://www2.congreso.gob.pe/Sicr/RelatAgenda/PlenoComiPerm20112016.nsf/"
-df_result["clean_link"] = df_result["link"].str.extract(r"javascript:openWindow\('([^']+)'\)")
-df_result["clean_link"] = base_link + df_result["clean_link"]
-df_result.drop("link", axis=1, inplace=True)
+    # Generar nombre de archivo único basado en clean_link
+    df_result["file_name"] = df_result["clean_link"].apply(generate_uuid_filename)
 
-# Generar nombre de archivo único basado en clean_link
-df_result["file_name"] = df_result["clean_link"].apply(generate_uuid_filename)
+    # Seleccionar columnas finales (AGREGADA 'file_name')
+    return df_result[COLUMNAS_DOCUMENTOS]
 
-# Seleccionar columnas finales (AGREGADA 'file_name')
-df_result = df_result[
-    [
-        "periodo_parlamentario",
-        "periodo_anual",
-        "legislatura",
-        "descripcion",
-        "clean_link",
-        "file_name",
-    ]
-]
 
 # ------------------------------------------------------------------
 # 3. Unificar con histórico y generar salidas
 # ------------------------------------------------------------------
 
-if DOCUMENTOS_HISTORICO_PATH.exists():
-    df_historico = pd.read_csv(DOCUMENTOS_HISTORICO_PATH)
 
-    # Asegurar que el histórico tenga las columnas necesarias
-    columnas_faltantes = set(df_result.columns) - set(df_historico.columns)
-    if columnas_faltantes:
-        for columna in columnas_faltantes:
-            df_historico[columna] = pd.NA
-else:
-    df_historico = pd.DataFrame(columns=df_result.columns)
+def unificar_historico(df_result: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+    """
+    Registra los documentos nuevos en el log de solo anexado del histórico
+    (ver utils_historico) y los anexa a documentos_historico.csv.
+    """
+    return anexar_documentos(df_result, csv_path=DOCUMENTOS_HISTORICO_PATH)
+
+
+def main() -> None:
+    result = parsear_tabla(TABLE_HTML_PATH)
 
-documentos_existentes = set(df_historico.get("file_name", []))
-df_nuevos = df_result[~df_result["file_name"].isin(documentos_existentes)].copy()
+    # Mostrar los resultados
+    for item in result[13:15]:
+        print(f"Periodo Parlamentario: {item['periodo_parlamentario']}")
+        print(f"Periodo Anual de Sesiones: {item['periodo_anual']}")
+        print(f"Legislatura: {item['legislatura']}")
+        print(f"Descripción: {item['descripcion']}")
+        print(f"Link: {item['link']}")
+        print("-" * 40)
 
-if not df_nuevos.empty:
-    df_historico = pd.concat([df_nuevos, df_historico], ignore_index=True)
+    print("Total de resultados:", len(result))
 
-# Limpiar duplicados por file_name para mantener datos consistentes
-df_historico = df_historico.drop_duplicates(subset="file_name", keep="first")
+    # Debug de los datos de los links
+    link_types = Counter()
+    for item in result:
+        if "javascript:openWindow(" in item["link"]:
+            link_types["javascript"] += 1
+        else:
+            link_types["otros"] += 1
+
+    print(link_types)
+
+    df_result = construir_documentos(result)
+    df_nuevos, total_historico = unificar_historico(df_result)
+
+    print("Total histórico:", total_historico)
+    print("Documentos nuevos:", len(df_nuevos))
+    if not df_nuevos.empty:
+        print(df_nuevos[["descripcion", "clean_link", "file_name"]])
+    else:
+        print("No se encontraron documentos nuevos.")
 
-# Guardar salidas
-df_historico.to_csv(DOCUMENTOS_HISTORICO_PATH, sep=",", header=True, index=False, encoding="utf-8")
 
-print("Total histórico:", len(df_historico))
-print("Documentos nuevos:", len(df_nuevos))
-if not df_nuevos.empty:
-    print(df_nuevos[["descripcion", "clean_link", "file_name"]])
-else:
-    print("No se encontraron documentos nuevos.")
+if __name__ == "__main__":
+    main()
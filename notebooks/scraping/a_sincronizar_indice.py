@@ -0,0 +1,202 @@
+"""
+Sincroniza documentos_historico.csv directamente con el índice del Congreso.
+
+En lugar de partir de un Table.html guardado a mano, descarga las páginas del
+índice con una sesión HTTP con pool de conexiones, las divide en secciones (una
+por encabezado de periodo/legislatura, aunque abarque varias páginas), calcula un
+hash por sección a partir de los enlaces a documentos que contiene y solo vuelve a
+parsear las secciones cuyo hash cambió desde la última ejecución. Ni la clave ni
+el hash dependen de la paginación: si el índice crece y las filas se corren de
+página, las secciones sin documentos nuevos siguen sin cambios. Los documentos
+nuevos se anexan al log del histórico (utils_historico) sin reescribirlo.
+
+El estado de las secciones y el log pertenecen a cada histórico: junto a
+<historico>.csv se guardan <historico>_secciones.json y <historico>_log/.
+
+Uso:
+    python a_sincronizar_indice.py
+    python a_sincronizar_indice.py --url http://localhost:8000/Table.html  # servidor local de prueba
+    python a_sincronizar_indice.py --historico /tmp/prueba.csv  # otro histórico, con su propio estado
+"""
+
+import argparse
+import hashlib
+import html as html_lib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from a_nuevos_documentos import (
+    MARCADORES_JERARQUIA,
+    clean_text,
+    construir_documentos,
+    parsear_tabla_lxml,
+)
+from utils_historico import DOCUMENTOS_HISTORICO_PATH, anexar_documentos, ruta_log
+from utils_http import crear_sesion
+
+# 🌐 Índice de asistencias y votaciones (vista Domino expandida y paginada con Start/Count)
+INDICE_URL = "https://www2.congreso.gob.pe/Sicr/RelatAgenda/PlenoComiPerm20112016.nsf/new_asistenciavotacion?OpenForm&ExpandView"
+FILAS_POR_PAGINA = 1000  # Parámetro Count de la vista
+MAX_PAGINAS = 20  # Límite de seguridad de páginas a recorrer
+
+# 🔧 Parámetros HTTP
+POOL_SIZE = 4  # Conexiones keep-alive y páginas descargadas en paralelo
+REQUEST_TIMEOUT = 60  # segundos
+
+# <font> cuyo texto es un encabezado de la jerarquía (periodo, periodo anual o legislatura)
+FONT_PATTERN = re.compile(r"<font\b[^>]*>([^<]*)</font\s*>", re.IGNORECASE)
+# Destino de cada enlace a un documento: identifica el contenido de una sección
+ENLACE_PATTERN = re.compile(r"openWindow\(\s*'([^']*)'")
+
+
+def _url_pagina(url: str, pagina: int) -> str:
+    """Agrega Start/Count a la URL del índice si es una vista Domino."""
+    if "?OpenForm" not in url:
+        return url
+    inicio = 1 + pagina * FILAS_POR_PAGINA
+    return f"{url}&Start={inicio}&Count={FILAS_POR_PAGINA}"
+
+
+def descargar_paginas(sesion, url: str) -> list[str]:
+    """
+    Descarga las páginas del índice en lotes de POOL_SIZE peticiones simultáneas.
+    Se detiene en la primera página sin enlaces a documentos.
+    """
+    total = MAX_PAGINAS if "?OpenForm" in url else 1
+    paginas: list[str] = []
+
+    def descargar(numero: int) -> str:
+        response = sesion.get(_url_pagina(url, numero), timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        if "charset" not in response.headers.get("Content-Type", ""):
+            response.encoding = "utf-8"
+        return response.text
+
+    with ThreadPoolExecutor(max_workers=POOL_SIZE) as executor:
+        for lote in range(0, total, POOL_SIZE):
+            numeros = range(lote, min(lote + POOL_SIZE, total))
+            for contenido in executor.map(descargar, numeros):
+                if "openWindow(" not in contenido:
+                    return paginas
+                paginas.append(contenido)
+
+    return paginas
+
+
+def dividir_secciones(paginas: list[str]) -> list[dict]:
+    """
+    Divide las páginas del índice en secciones delimitadas por los encabezados
+    de la jerarquía. La jerarquía vigente se arrastra entre páginas, y los
+    fragmentos de una misma jerarquía en páginas distintas forman una sola sección.
+    """
+    secciones: dict[str, dict] = {}
+    jerarquia = {clave: None for clave in MARCADORES_JERARQUIA}
+
+    for contenido in paginas:
+        cortes = [(0, dict(jerarquia))]
+        for match in FONT_PATTERN.finditer(contenido):
+            texto = clean_text(html_lib.unescape(match.group(1)))
+            niveles = [
+                clave for clave, marcador in MARCADORES_JERARQUIA.items() if marcador in texto
+            ]
+            if not niveles:
+                continue
+            for clave in niveles:
+                jerarquia[clave] = texto
+            cortes.append((match.start(), dict(jerarquia)))
+
+        for i, (inicio, jerarquia_seccion) in enumerate(cortes):
+            fin = cortes[i + 1][0] if i + 1 < len(cortes) else len(contenido)
+            fragmento = contenido[inicio:fin]
+            if "openWindow(" not in fragmento:
+                continue
+
+            clave = " | ".join(str(v) for v in jerarquia_seccion.values())
+            seccion = secciones.setdefault(
+                clave, {"clave": clave, "jerarquia": jerarquia_seccion, "html": [], "enlaces": []}
+            )
+            seccion["html"].append(fragmento)
+            seccion["enlaces"].extend(ENLACE_PATTERN.findall(fragmento))
+
+    for seccion in secciones.values():
+        seccion["html"] = "".join(seccion["html"])
+        contenido = "\n".join(seccion.pop("enlaces"))
+        seccion["hash"] = hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+    return list(secciones.values())
+
+
+def parsear_seccion(seccion: dict) -> list[dict]:
+    """Parsea solo los enlaces de una sección y les asigna su jerarquía."""
+    fragmento = f"<table><tbody>{seccion['html']}</tbody></table>".encode("utf-8")
+    return [
+        {**seccion["jerarquia"], "descripcion": item["descripcion"], "link": item["link"]}
+        for item in parsear_tabla_lxml(BytesIO(fragmento))
+    ]
+
+
+def ruta_estado_secciones(historico_path: Path) -> Path:
+    """Estado de la última sincronización (hash por sección) de `historico_path`."""
+    return historico_path.with_name(f"{historico_path.stem}_secciones.json")
+
+
+def cargar_estado(estado_path: Path) -> dict[str, str]:
+    if not estado_path.exists():
+        return {}
+    with estado_path.open(encoding="utf-8") as file:
+        return json.load(file)
+
+
+def guardar_estado(secciones: list[dict], estado_path: Path) -> None:
+    estado_path.parent.mkdir(parents=True, exist_ok=True)
+    with estado_path.open("w", encoding="utf-8") as file:
+        json.dump({s["clave"]: s["hash"] for s in secciones}, file, ensure_ascii=False, indent=2)
+        file.write("\n")
+
+
+def sincronizar(url: str = INDICE_URL, historico_path: Path = DOCUMENTOS_HISTORICO_PATH):
+    sesion = crear_sesion(pool_size=POOL_SIZE)
+    paginas = descargar_paginas(sesion, url)
+    print(f"🌐 Páginas del índice descargadas: {len(paginas)}")
+
+    secciones = dividir_secciones(paginas)
+    estado_path = ruta_estado_secciones(historico_path)
+    estado = cargar_estado(estado_path)
+    cambiadas = [s for s in secciones if estado.get(s["clave"]) != s["hash"]]
+    print(f"🧩 Secciones: {len(secciones)} | con cambios: {len(cambiadas)}")
+
+    result = [item for seccion in cambiadas for item in parsear_seccion(seccion)]
+    df_result = construir_documentos(result)
+
+    # Solo se consulta el índice en memoria del log del histórico (O(filas nuevas))
+    df_nuevos, total_historico = anexar_documentos(
+        df_result, csv_path=historico_path, log_dir=ruta_log(historico_path)
+    )
+
+    # El estado solo se guarda si el histórico quedó actualizado
+    guardar_estado(secciones, estado_path)
+
+    print("Total histórico:", total_historico)
+    print("Documentos nuevos:", len(df_nuevos))
+    if not df_nuevos.empty:
+        print(df_nuevos[["descripcion", "clean_link", "file_name"]])
+    else:
+        print("No se encontraron documentos nuevos.")
+
+    return df_nuevos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=INDICE_URL, help="URL del índice (o de un Table.html)")
+    parser.add_argument(
+        "--historico", type=Path, default=DOCUMENTOS_HISTORICO_PATH, help="CSV del histórico"
+    )
+    args = parser.parse_args()
+    sincronizar(args.url, args.historico)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import hashlib
+import os
 from pathlib import Path
 
 import pandas as pd
@@ -7,36 +9,99 @@ DOCUMENTOS_HISTORICO_PATH = Path("./data/documentos_historico.csv")
 DOCUMENTOS_EXCLUIDOS_PATH = Path("./data/documentos_excluidos.csv")
 DOCUMENTOS_SCRAPER_PATH = Path("./data/documentos_scraper.csv")
 
+# 🗂️ Caché del listado de ids ya procesados, un archivo por directorio de encabezados
+# (ver ruta_cache_encabezados). Se invalida cuando cambia el mtime del directorio
+# (altas, bajas o renombres de archivos).
+ENCABEZADOS_CACHE_DIR = Path("./data")
+USAR_CACHE_ENCABEZADOS = True
 
-def construir_documentos_scraper() -> None:
-    if not DOCUMENTOS_HISTORICO_PATH.exists():
-        raise FileNotFoundError(
-            f"No se encontró el archivo histórico en {DOCUMENTOS_HISTORICO_PATH}"
-        )
 
-    encabezados = {path.stem for path in ENCABEZADOS_PATH.glob("*.json") if path.is_file()}
+def _listar_encabezados(encabezados_path: Path) -> set[str]:
+    """Lista los ids (nombre sin extensión) de los JSON de encabezados ya generados."""
+    if not encabezados_path.is_dir():
+        return set()
 
-    excluidos = set()
-    if DOCUMENTOS_EXCLUIDOS_PATH.exists():
-        df_excluidos = pd.read_csv(DOCUMENTOS_EXCLUIDOS_PATH)
+    with os.scandir(encabezados_path) as entradas:
+        return {
+            entrada.name[: -len(".json")]
+            for entrada in entradas
+            if entrada.name.endswith(".json") and entrada.is_file()
+        }
+
+
+def ruta_cache_encabezados(encabezados_path: Path) -> Path:
+    """Archivo de caché propio de encabezados_path, derivado de su ruta absoluta."""
+    ruta = str(encabezados_path.resolve())
+    sufijo = hashlib.sha1(ruta.encode("utf-8")).hexdigest()[:12]
+    return ENCABEZADOS_CACHE_DIR / f"encabezados_procesados_{sufijo}.cache"
+
+
+def cargar_encabezados_procesados(
+    encabezados_path: Path = ENCABEZADOS_PATH, usar_cache: bool = USAR_CACHE_ENCABEZADOS
+) -> set[str]:
+    """
+    Devuelve los ids ya procesados, reutilizando el listado cacheado si el directorio
+    no ha cambiado desde la última ejecución.
+    """
+    if not usar_cache or not encabezados_path.is_dir():
+        return _listar_encabezados(encabezados_path)
+
+    cache_path = ruta_cache_encabezados(encabezados_path)
+    firma = str(encabezados_path.stat().st_mtime_ns)
+
+    if cache_path.exists():
+        with cache_path.open(encoding="utf-8") as file:
+            if file.readline().strip() == firma:
+                return {linea.strip() for linea in file if linea.strip()}
+
+    encabezados = _listar_encabezados(encabezados_path)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with cache_path.open("w", encoding="utf-8") as file:
+        file.write(f"{firma}\n")
+        file.writelines(f"{doc_id}\n" for doc_id in sorted(encabezados))
+
+    return encabezados
+
+
+def _ids_sin_extension(serie: pd.Series) -> pd.Series:
+    """Equivalente vectorizado de Path(nombre).stem para nombres de archivo PDF."""
+    return serie.astype(str).str.strip().str.removesuffix(".pdf")
+
+
+def construir_documentos_scraper(
+    historico_path: Path = DOCUMENTOS_HISTORICO_PATH,
+    excluidos_path: Path = DOCUMENTOS_EXCLUIDOS_PATH,
+    scraper_path: Path = DOCUMENTOS_SCRAPER_PATH,
+    encabezados_path: Path = ENCABEZADOS_PATH,
+    usar_cache: bool = USAR_CACHE_ENCABEZADOS,
+) -> None:
+    if not historico_path.exists():
+        raise FileNotFoundError(f"No se encontró el archivo histórico en {historico_path}")
+
+    encabezados = cargar_encabezados_procesados(encabezados_path, usar_cache)
+
+    excluidos = pd.Series(dtype=str)
+    if excluidos_path.exists():
+        df_excluidos = pd.read_csv(excluidos_path, dtype=str)
         columna_excluidos = "file_name" if "file_name" in df_excluidos.columns else "nombre"
         if columna_excluidos not in df_excluidos.columns:
             raise KeyError(
                 "El archivo de excluidos debe contener la columna 'nombre' o 'file_name'."
             )
-        excluidos = {Path(str(valor)).stem for valor in df_excluidos[columna_excluidos].dropna()}
+        excluidos = _ids_sin_extension(df_excluidos[columna_excluidos].dropna())
 
-    exclusiones = encabezados | excluidos
+    exclusiones = excluidos.drop_duplicates().tolist() + list(encabezados)
 
-    df = pd.read_csv(DOCUMENTOS_HISTORICO_PATH)
+    df = pd.read_csv(historico_path, dtype=str)
     if "file_name" not in df.columns:
         raise KeyError("El archivo histórico debe contener la columna 'file_name'.")
 
-    mask = df["file_name"].map(lambda nombre: Path(str(nombre)).stem not in exclusiones)
-    df_filtrado = df[mask].copy()
+    mask = ~_ids_sin_extension(df["file_name"]).isin(exclusiones)
+    df_filtrado = df[mask]
 
-    DOCUMENTOS_SCRAPER_PATH.parent.mkdir(parents=True, exist_ok=True)
-    df_filtrado.to_csv(DOCUMENTOS_SCRAPER_PATH, index=False)
+    scraper_path.parent.mkdir(parents=True, exist_ok=True)
+    df_filtrado.to_csv(scraper_path, index=False)
 
 
 if __name__ == "__main__":
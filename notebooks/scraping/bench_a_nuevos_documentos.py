@@ -0,0 +1,63 @@
+"""
+Benchmark del parseo de Table.html: BeautifulSoup frente a lxml en streaming.
+
+Construye un Table.html sintético de varios megabytes replicando las filas del
+índice real (con enlaces distintos en cada copia), verifica que ambos motores
+producen los mismos registros y compara sus tiempos.
+"""
+
+import re
+import tempfile
+import time
+from pathlib import Path
+
+from a_nuevos_documentos import TABLE_HTML_PATH, parsear_tabla_bs4, parsear_tabla_lxml
+
+REPETICIONES_TABLA = 150  # Copias de las filas del Table.html real (~6 MB)
+REPETICIONES = 3
+
+
+def generar_table_html(destino: Path, repeticiones: int, origen: Path = TABLE_HTML_PATH) -> Path:
+    """Replica las filas de `origen` `repeticiones` veces cambiando los enlaces de cada copia."""
+    html = origen.read_text(encoding="utf-8")
+
+    inicio = html.index('<tr valign="top">')
+    fin = html.rindex("</tbody>")
+    cabecera, filas, pie = html[:inicio], html[inicio:fin], html[fin:]
+
+    copias = [
+        re.sub(r"\$FILE/", f"$FILE/copia{i}_", filas) if i else filas for i in range(repeticiones)
+    ]
+
+    destino.write_text(cabecera + "".join(copias) + pie, encoding="utf-8")
+    return destino
+
+
+def medir(nombre: str, funcion) -> tuple[float, list]:
+    tiempos = []
+    resultado = None
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"  {nombre:20} : {mejor:7.3f} s (mejor de {REPETICIONES}, {len(resultado)} registros)")
+    return mejor, resultado
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        table_html = generar_table_html(Path(tmp) / "Table.html", REPETICIONES_TABLA)
+        tamano_mb = table_html.stat().st_size / 1024 / 1024
+        print(f"🧪 Table.html sintético: {tamano_mb:.1f} MB")
+
+        print("⏱️  Resultados:")
+        t_bs4, registros_bs4 = medir("bs4 (html.parser)", lambda: parsear_tabla_bs4(table_html))
+        t_lxml, registros_lxml = medir("lxml (iterparse)", lambda: parsear_tabla_lxml(table_html))
+
+        print(f"  {'speedup':20} : {t_bs4 / t_lxml:7.2f}x")
+        print(f"  {'registros idénticos':20} : {'✅' if registros_bs4 == registros_lxml else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark de b_construir_base_scraper sobre un histórico sintético.
+
+Genera en un directorio temporal un documentos_historico.csv de NUM_FILAS filas,
+un listado de excluidos y NUM_ENCABEZADOS JSON de encabezados, y compara el
+filtro original (Path(...).stem fila por fila + glob) con la versión vectorizada.
+"""
+
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+from b_construir_base_scraper import construir_documentos_scraper
+
+NUM_FILAS = 1_000_000
+NUM_EXCLUIDOS = 5_000
+NUM_ENCABEZADOS = 20_000
+REPETICIONES = 3
+
+
+def construir_documentos_scraper_original(
+    historico_path: Path, excluidos_path: Path, scraper_path: Path, encabezados_path: Path
+) -> None:
+    """Implementación previa, conservada solo como referencia para el benchmark."""
+    encabezados = {path.stem for path in encabezados_path.glob("*.json") if path.is_file()}
+
+    df_excluidos = pd.read_csv(excluidos_path)
+    excluidos = {Path(str(valor)).stem for valor in df_excluidos["nombre"].dropna()}
+
+    exclusiones = encabezados | excluidos
+
+    df = pd.read_csv(historico_path)
+    mask = df["file_name"].map(lambda nombre: Path(str(nombre)).stem not in exclusiones)
+    df[mask].copy().to_csv(scraper_path, index=False)
+
+
+def generar_fixtures(base_dir: Path) -> tuple[Path, Path, Path]:
+    ids = [
+        str(uuid.uuid5(uuid.NAMESPACE_URL, f"https://example.org/{i}.pdf"))
+        for i in range(NUM_FILAS)
+    ]
+
+    historico_path = base_dir / "documentos_historico.csv"
+    pd.DataFrame(
+        {
+            "periodo_parlamentario": "Congreso de la República - Periodo Parlamentario 2021 - 2026",
+            "periodo_anual": "Período Anual de Sesiones 2025 - 2026",
+            "legislatura": "Primera Legislatura Ordinaria",
+            "descripcion": "Asistencias y votaciones de la sesión",
+            "clean_link": [f"https://example.org/{i}.pdf" for i in range(NUM_FILAS)],
+            "file_name": [f"{doc_id}.pdf" for doc_id in ids],
+        }
+    ).to_csv(historico_path, index=False)
+
+    excluidos_path = base_dir / "documentos_excluidos.csv"
+    pd.DataFrame({"nombre": ids[:NUM_EXCLUIDOS]}).to_csv(excluidos_path, index=False)
+
+    encabezados_path = base_dir / "jsons"
+    encabezados_path.mkdir()
+    for doc_id in ids[NUM_EXCLUIDOS : NUM_EXCLUIDOS + NUM_ENCABEZADOS]:
+        (encabezados_path / f"{doc_id}.json").write_text("{}", encoding="utf-8")
+
+    return historico_path, excluidos_path, encabezados_path
+
+
+def medir(nombre: str, funcion) -> float:
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"  {nombre:30} : {mejor:7.3f} s (mejor de {REPETICIONES})")
+    return mejor
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp)
+        print(f"🧪 Generando histórico sintético de {NUM_FILAS:,} filas...")
+        historico_path, excluidos_path, encabezados_path = generar_fixtures(base_dir)
+
+        salida_original = base_dir / "scraper_original.csv"
+        salida_vectorizada = base_dir / "scraper_vectorizado.csv"
+
+        print("⏱️  Resultados:")
+        t_original = medir(
+            "original (map + Path.stem)",
+            lambda: construir_documentos_scraper_original(
+                historico_path, excluidos_path, salida_original, encabezados_path
+            ),
+        )
+        t_vectorizado = medir(
+            "vectorizado",
+            lambda: construir_documentos_scraper(
+                historico_path=historico_path,
+                excluidos_path=excluidos_path,
+                scraper_path=salida_vectorizada,
+                encabezados_path=encabezados_path,
+                usar_cache=False,
+            ),
+        )
+
+        iguales = salida_original.read_bytes() == salida_vectorizada.read_bytes()
+        print(f"  {'speedup':30} : {t_original / t_vectorizado:7.2f}x")
+        print(f"  {'salidas idénticas':30} : {'✅' if iguales else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
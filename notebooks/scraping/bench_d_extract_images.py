@@ -0,0 +1,119 @@
+"""
+Benchmark de los motores de rasterizado de d_extract_images (utils_rasterizado.py).
+
+Rasteriza los mismos PDFs con cada motor instalado (pdfium en el mismo proceso,
+poppler vía pdftoppm) a DPI_CLASIFICACION y a DPI, y reporta:
+
+1. Tiempo de pared, tiempo de CPU (del proceso y de los hijos, que es donde corre
+   pdftoppm) y páginas/s.
+2. Diferencias entre motores: tamaño de cada página y diferencia media por píxel.
+
+Usa los primeros NUM_PDFS de data/pdfs; si no hay, genera PDFs sintéticos.
+"""
+
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import d_extract_images as imagenes
+import utils_rasterizado as rasterizado
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+NUM_PDFS = 10
+PAGINAS_SINTETICAS = 8
+TAMANO_PAGINA = (827, 1169)  # A4 a 100 DPI
+REPETICIONES = 3
+SEMILLA = 42
+
+
+def generar_pdfs(destino: Path, rng: random.Random) -> list[Path]:
+    """PDFs de páginas con líneas de "texto" y una tabla, similares a un acta escaneada."""
+    rutas = []
+    ancho, alto = TAMANO_PAGINA
+    for i in range(NUM_PDFS):
+        paginas = []
+        for _ in range(PAGINAS_SINTETICAS):
+            pagina = Image.new("L", TAMANO_PAGINA, 255)
+            dibujo = ImageDraw.Draw(pagina)
+            for y in range(alto // 20, alto - alto // 20, alto // 45):
+                x = ancho // 12
+                while x < ancho * 0.9:
+                    largo = rng.randint(ancho // 40, ancho // 8)
+                    dibujo.rectangle([x, y, x + largo, y + 6], fill=rng.randint(0, 60))
+                    x += largo + ancho // 60
+            paginas.append(pagina)
+        ruta = destino / f"sintetico_{i:02d}.pdf"
+        paginas[0].save(ruta, "PDF", resolution=100, save_all=True, append_images=paginas[1:])
+        rutas.append(ruta)
+    return rutas
+
+
+def medir(motor: str, pdfs: list[Path], dpi: int) -> tuple[dict, list[Image.Image]]:
+    mejor = None
+    for _ in range(REPETICIONES):
+        paginas = []
+        antes = os.times()
+        inicio = time.perf_counter()
+        for pdf in pdfs:
+            paginas.extend(
+                imagen for _, imagen in rasterizado.rasterizar(str(pdf), dpi, motor=motor)
+            )
+        pared = time.perf_counter() - inicio
+        despues = os.times()
+        cpu = sum(despues[:4]) - sum(antes[:4])  # user + system, propios y de los hijos
+        if mejor is None or pared < mejor["pared"]:
+            mejor = {"pared": pared, "cpu": cpu, "paginas": len(paginas)}
+            resultado = paginas
+    return mejor, resultado
+
+
+def comparar(referencia: list[Image.Image], otras: list[Image.Image]) -> tuple[int, float]:
+    """Páginas con distinto tamaño y diferencia media por píxel (0-255) en el resto."""
+    distinto_tamano = 0
+    diferencias = []
+    for a, b in zip(referencia, otras):
+        if a.size != b.size:
+            distinto_tamano += 1
+            b = b.resize(a.size)
+        diferencias.append(ImageStat.Stat(ImageChops.difference(a, b.convert(a.mode))).mean[0])
+    return distinto_tamano, sum(diferencias) / max(len(diferencias), 1)
+
+
+def main() -> None:
+    motores = rasterizado.motores_disponibles()
+    if not motores:
+        print("❌ No hay motores de rasterizado instalados (pypdfium2 o pdf2image)")
+        return
+    print(f"🖨️  Motores disponibles: {', '.join(motores)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdfs = sorted(Path(imagenes.PDFS_FOLDER).glob("*.pdf"))[:NUM_PDFS]
+        if not pdfs:
+            print(f"ℹ️  Sin PDFs en {imagenes.PDFS_FOLDER}: se generan {NUM_PDFS} sintéticos")
+            pdfs = generar_pdfs(Path(tmp), random.Random(SEMILLA))
+
+        for dpi in (imagenes.DPI_CLASIFICACION, imagenes.DPI):
+            print(f"\n⏱️  {len(pdfs)} PDFs a {dpi} DPI (mejor de {REPETICIONES}):")
+            paginas_por_motor = {}
+            for motor in motores:
+                datos, paginas_por_motor[motor] = medir(motor, pdfs, dpi)
+                print(
+                    f"  {motor:8} : {datos['pared']:7.3f} s pared | {datos['cpu']:7.3f} s CPU | "
+                    f"{datos['paginas'] / datos['pared']:7.1f} páginas/s "
+                    f"({datos['paginas']} páginas)"
+                )
+
+            if len(motores) > 1:
+                referencia = paginas_por_motor[motores[0]]
+                for motor in motores[1:]:
+                    distinto, media = comparar(referencia, paginas_por_motor[motor])
+                    print(
+                        f"  {motores[0]} vs {motor}: {distinto} páginas de distinto tamaño, "
+                        f"diferencia media {media:.2f}/255 por píxel"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,69 +9,85 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import requests
 from tqdm import tqdm
+from utils_almacen_pdfs import AlmacenPdfs
+from utils_http import HEADERS
+from utils_metricas import Metricas, perfilar
 
 # 🔧 Parámetros de descarga
 MAX_WORKERS = 5  # número de descargas simultáneas
 REQUEST_TIMEOUT = 200  # segundos máximos esperando respuesta del servidor por petición
 MAX_RETRIES = 5  # número de reintentos por archivo
 RETRY_DELAY = 60  # segundos de espera entre reintentos
+CHUNK_SIZE = 1024 * 1024  # bytes leídos por iteración al transmitir cada PDF
 
-# Cabeceras que simulan un navegador para evitar bloqueos
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
-    "Referer": "https://www2.congreso.gob.pe/",
-}
 
 # 📂 Archivos de entrada
 DATA_FILE = "./data/documentos_scraper.csv"
 DOWNLOAD_DIR = "./data/pdfs"
 
-# Crear carpeta de destino si no existe
-os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+metricas = Metricas("descarga")
 
-# Leer el DataFrame desde el TXT
-try:
-    df_result = pd.read_csv(
-        DATA_FILE, sep=",", encoding="utf-8"
-    )  # usa utf-8 para evitar errores de caracteres
-except Exception as e:
-    print(f"❌ Error al leer '{DATA_FILE}': {e}")
-    exit(1)
+# Almacén direccionado por contenido de DOWNLOAD_DIR (ver utils_almacen_pdfs.py), uno por carpeta
+_almacenes = {}
 
-# Verificar que existan columnas necesarias
-required_cols = {"file_name", "clean_link"}
-if not required_cols.issubset(df_result.columns):
-    print(f"❌ El archivo debe contener las columnas: {required_cols}")
-    exit(1)
 
-# Subconjunto pendiente por descargar
-total_archivos = len(df_result)
-df_to_download = df_result
+def obtener_almacen():
+    if DOWNLOAD_DIR not in _almacenes:
+        _almacenes[DOWNLOAD_DIR] = AlmacenPdfs(DOWNLOAD_DIR)
+    return _almacenes[DOWNLOAD_DIR]
+
+
+def cargar_documentos():
+    """Lee documentos_scraper.csv y valida que tenga las columnas necesarias."""
+    # Leer el DataFrame desde el TXT
+    try:
+        df_result = pd.read_csv(
+            DATA_FILE, sep=",", encoding="utf-8"
+        )  # usa utf-8 para evitar errores de caracteres
+    except Exception as e:
+        print(f"❌ Error al leer '{DATA_FILE}': {e}")
+        exit(1)
+
+    # Verificar que existan columnas necesarias
+    required_cols = {"file_name", "clean_link"}
+    if not required_cols.issubset(df_result.columns):
+        print(f"❌ El archivo debe contener las columnas: {required_cols}")
+        exit(1)
+
+    return df_result
 
 
 # Función de descarga con reintentos
 def download_file(index, row):
+    with metricas.medir("descarga", documentos=1) as datos:
+        return _download_file(index, row, datos)
+
+
+def _download_file(index, row, datos):
     file_name = row["file_name"]
-    file_path = os.path.join(DOWNLOAD_DIR, file_name)
     url = row["clean_link"]
+    almacen = obtener_almacen()
 
     last_error = None
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            response = requests.get(
+            with requests.get(
                 url,
                 verify=False,
                 timeout=REQUEST_TIMEOUT,
                 headers=HEADERS,
-            )
-            if response.status_code == 200:
-                with open(file_path, "wb") as f:
-                    f.write(response.content)
-                return index, True, None
-            else:
-                last_error = f"HTTP {response.status_code}"
+                stream=True,
+            ) as response:
+                if response.status_code == 200:
+                    # El sha256 se calcula mientras se escribe; si el contenido ya estaba
+                    # (otra URL), file_name queda como alias del mismo objeto
+                    _, nuevo = almacen.guardar(file_name, response.iter_content(CHUNK_SIZE))
+                    datos["bytes"] = os.path.getsize(os.path.join(DOWNLOAD_DIR, file_name))
+                    datos["duplicados"] = int(not nuevo)
+                    datos["intentos"] = attempt
+                    return index, True, None
+                else:
+                    last_error = f"HTTP {response.status_code}"
         except requests.exceptions.RequestException as e:
             last_error = str(e)
 
@@ -80,19 +96,38 @@ def download_file(index, row):
             time.sleep(RETRY_DELAY)
 
     # Si llegamos aquí, todos los intentos fallaron
+    datos["fallidos"] = 1
     return index, False, f"Falló después de {MAX_RETRIES} intentos. Último error: {last_error}"
 
 
-# Descarga paralela con barra de progreso
-with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-    futures = {
-        executor.submit(download_file, index, row): index
-        for index, row in df_to_download.iterrows()
-    }
+def main():
+    # Crear carpeta de destino si no existe
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+
+    # Subconjunto pendiente por descargar
+    df_to_download = cargar_documentos()
+
+    # Descarga paralela con barra de progreso
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(download_file, index, row): index
+            for index, row in df_to_download.iterrows()
+        }
+
+        for completados, future in enumerate(
+            tqdm(as_completed(futures), total=len(futures), desc="📥 Descargando archivos"),
+            start=1,
+        ):
+            metricas.cola(len(futures) - completados)
+            index, success, error = future.result()
+            if success:
+                continue
+            else:
+                print(f"⚠️ Error en índice {index}: {error}")
+
+    metricas.cerrar()
+
 
-    for future in tqdm(as_completed(futures), total=len(futures), desc="📥 Descargando archivos"):
-        index, success, error = future.result()
-        if success:
-            continue
-        else:
-            print(f"⚠️ Error en índice {index}: {error}")
+if __name__ == "__main__":
+    with perfilar("descarga"):
+        main()
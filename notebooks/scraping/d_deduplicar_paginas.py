@@ -0,0 +1,159 @@
+"""
+Deduplicación de páginas entre d_extract_images y e_classifier_images.
+
+Los PDF del Congreso repiten páginas (carátulas, tablas de votación reeditadas en
+otro documento). Cada página de INPUT_PATH se busca por la huella de su encabezado
+entre todas las páginas canónicas vistas (en esta ejecución y en las anteriores;
+ver utils_phash.IndiceHuellas). Si una candidata con la misma huella tiene además
+el hash perceptual a DISTANCIA_MAXIMA o menos, la página es un duplicado: se borra
+de INPUT_PATH (o de su paquete, que se compacta una sola vez al cerrar el índice),
+de modo que no se clasifica, no se recorta ni se envía al OCR, y se registra en
+DUPLICADOS_PATH. c_normalizar_jsons copia después a cada duplicado el resultado del
+OCR de su página canónica.
+
+Archivos (JSONL de solo anexado):
+    data/paginas_phash.jsonl       {"pagina": "<doc>_page001_", "phash": "…", "huella": "…"}
+    data/paginas_duplicadas.jsonl  {"pagina": "<doc>_page004_", "canonica": "…", "distancia": 2}
+"""
+
+import json
+import os
+from pathlib import Path
+
+import utils_paquetes as paquetes
+import utils_phash
+from utils_metricas import Metricas, perfilar
+
+INPUT_PATH = "./data/images"
+INDICE_PATH = "./data/paginas_phash.jsonl"
+DUPLICADOS_PATH = "./data/paginas_duplicadas.jsonl"
+
+# 🔧 Distancia de Hamming máxima entre phash (de 64 bits) para considerar candidata a una página
+DISTANCIA_MAXIMA = 6
+# 🔧 Bits distintos tolerados en la huella del encabezado. Con 0 solo se deduplican páginas
+# cuyo encabezado se ve igual; subirlo arriesga unir votaciones distintas con la misma plantilla
+MAX_BITS_DISTINTOS = 0
+
+metricas = Metricas("deduplicacion")
+
+
+def _leer_jsonl(path):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as file:
+        for linea in file:
+            try:
+                yield json.loads(linea)
+            except ValueError:
+                continue  # línea truncada por una interrupción
+
+
+class IndicePaginas:
+    def __init__(self, indice_path=None, duplicados_path=None):
+        self.indice_path = indice_path or INDICE_PATH
+        self.duplicados_path = duplicados_path or DUPLICADOS_PATH
+        self.canonicas = utils_phash.IndiceHuellas(MAX_BITS_DISTINTOS)
+        self.paginas_canonicas: set[str] = set()
+        self.duplicados: dict[str, str] = {}
+        self.bajas = paquetes.BajasPaquetes()
+        self._archivos = {}
+
+        for registro in _leer_jsonl(self.indice_path):
+            self._agregar_canonica(
+                registro["pagina"], int(registro["phash"], 16), registro["huella"]
+            )
+        for registro in _leer_jsonl(self.duplicados_path):
+            self.duplicados[registro["pagina"]] = registro["canonica"]
+
+    def _agregar_canonica(self, pagina, hash_, huella):
+        self.canonicas.agregar(huella, hash_, pagina)
+        self.paginas_canonicas.add(pagina)
+
+    def _anexar(self, path, registro):
+        if path not in self._archivos:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._archivos[path] = open(path, "a", encoding="utf-8")
+        self._archivos[path].write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._archivos[path].flush()
+
+    def buscar_canonica(self, hash_, huella):
+        """(página canónica, distancia) más cercana con la misma huella de encabezado, o None."""
+        encontrada = self.canonicas.buscar(huella, hash_, DISTANCIA_MAXIMA)
+        if encontrada is None:
+            return None
+        d, canonica = encontrada
+        return canonica, d
+
+    def deduplicar(self, image_path):
+        """
+        Registra la página; si es duplicado de una canónica borra su imagen.
+
+        Returns:
+            str | None: Nombre de la página canónica si es un duplicado
+        """
+        pagina = Path(image_path).stem
+        if pagina in self.paginas_canonicas:
+            return None  # ya es canónica: su PDF se volvió a rasterizar
+        if pagina in self.duplicados:
+            paquetes.eliminar_pagina(image_path, self.bajas)
+            return self.duplicados[pagina]
+
+        with metricas.medir("pagina", paginas=1) as datos:
+            imagen = paquetes.abrir_pagina(image_path)
+            hash_ = utils_phash.phash(imagen)
+            huella = utils_phash.huella_encabezado(imagen)
+
+            encontrada = self.buscar_canonica(hash_, huella)
+            datos["duplicado"] = encontrada is not None
+            if encontrada is None:
+                self._agregar_canonica(pagina, hash_, huella)
+                self._anexar(
+                    self.indice_path, {"pagina": pagina, "phash": f"{hash_:016x}", "huella": huella}
+                )
+                return None
+
+            canonica, d = encontrada
+            self.duplicados[pagina] = canonica
+            self._anexar(
+                self.duplicados_path, {"pagina": pagina, "canonica": canonica, "distancia": d}
+            )
+            paquetes.eliminar_pagina(image_path, self.bajas)
+            return canonica
+
+    def cerrar(self):
+        self.bajas.aplicar()
+        for archivo in self._archivos.values():
+            archivo.close()
+        self._archivos = {}
+
+
+def main():
+    # JPEG sueltos o páginas de paquetes (d_extract_images con EMPAQUETAR_PAGINAS)
+    imagenes = paquetes.listar_paginas(INPUT_PATH)
+    total = len(imagenes)
+    indice = IndicePaginas()
+    print(f"🔎 {total} páginas a revisar contra {len(indice.canonicas)} páginas canónicas\n")
+
+    duplicados = 0
+    for idx, image_path in enumerate(imagenes, start=1):
+        metricas.cola(total - idx)
+        try:
+            canonica = indice.deduplicar(image_path)
+        except Exception as e:
+            print(f"❌ Error procesando {image_path}: {e}")
+            continue
+        if canonica is not None:
+            duplicados += 1
+            print(f"♻️  [{idx}/{total}] {os.path.basename(image_path)} = {canonica}")
+
+    indice.cerrar()
+    print(
+        f"\n✅ {duplicados} duplicados omitidos de {total} páginas "
+        f"({len(indice.canonicas)} páginas canónicas en el índice)"
+    )
+    metricas.cerrar()
+
+
+if __name__ == "__main__":
+    with perfilar("deduplicacion"):
+        main()
@@ -1,23 +1,52 @@
+import contextlib
+import io
+import json
 import os
+import re
 import shutil
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import pandas as pd
-from pdf2image import convert_from_path
+import utils_paquetes as paquetes
+import utils_rasterizado as rasterizado
+import utils_texto_pdf as texto_pdf
+from utils_almacen_pdfs import AlmacenPdfs
+import utils_recursos as recursos
+from utils_metricas import Metricas, perfilar
 
 SCRAPER_PDF_FILES = "./data/documentos_scraper.csv"
 PDFS_FOLDER = "./data/pdfs"
 IMAGES_FOLDER = "./data/images"
 
 # Número de procesos paralelos
-NUM_WORKERS = 5  # 🔧 Ajusta según tus núcleos disponibles
+NUM_WORKERS = None  # 🔧 None = según CPU y memoria disponibles (utils_recursos.py)
 DPI = 300  # 🔧 Resolución de extracción del PDF (200=básico, 300=estándar, 400+=alta calidad)
+# 🔧 Multirresolución: todas las páginas se rasterizan a DPI_CLASIFICACION (el clasificador
+# las reduce a 224×224) y f_zones vuelve a rasterizar a DPI solo las páginas de votación
+MULTIRESOLUCION = True
+DPI_CLASIFICACION = 75  # A4 ≈ 620×877 px, holgado para la entrada de 224×224
 JPEG_QUALITY = 90  # 🔧 Calidad de compresión JPEG (1-100, donde 100 es máxima calidad)
 CONVERT_TO_GRAYSCALE = True  # 🔧 True para convertir a escala de grises, False para mantener color
+# 🔧 Motor de rasterizado (ver utils_rasterizado.py): "pdfium" (en el mismo proceso, directo a
+# escala de grises), "poppler" (pdf2image/pdftoppm) o None para pdfium si está instalado
+RASTERIZADOR = None
+# 🔧 True = un paquete indexado por PDF (<nombre_del_pdf>.pag, ver utils_paquetes.py) en lugar
+# de un JPEG suelto por página; clasificación y zonas leen las páginas desde los paquetes
+EMPAQUETAR_PAGINAS = False
+# 🔧 Capa de texto: las páginas con texto utilizable no se rasterizan. Si traen un encabezado
+# de votación se escribe directamente su JSON en TEXTO_OUTPUT_DIR (mismo formato que el OCR de
+# encabezados/b_openai_api.py); las demás se descartan como lo haría el clasificador (cada una
+# queda como evento "pagina_descartada" en las métricas).
+# Solo las páginas escaneadas (o con encabezado ilegible) pasan a imágenes. Requiere pypdfium2.
+USAR_CAPA_TEXTO = True
+TEXTO_OUTPUT_DIR = "../encabezados/api_outputs"
+TEXTO_MODELO = "capa_texto"  # valor de meta.model en los JSON generados desde el texto
 
-if os.path.isdir(IMAGES_FOLDER):
-    shutil.rmtree(IMAGES_FOLDER)
-os.makedirs(IMAGES_FOLDER, exist_ok=True)
+# Nombre de las páginas: <nombre_del_pdf>_page001_.jpg
+PAGINA_PATTERN = re.compile(r"^(?P<base>.+)_page(?P<pagina>\d+)_$")
+
+metricas = Metricas("imagenes")
+_aviso_capa_texto = False  # la advertencia de capa de texto no disponible, una vez por proceso
 
 
 def _load_allowed_pdfs():
@@ -36,48 +65,215 @@ def _load_allowed_pdfs():
     return {name for name in file_names if name}
 
 
+def codificar_jpeg(image, dpi):
+    """JPEG de la página (en escala de grises si está configurado)."""
+    if CONVERT_TO_GRAYSCALE and image.mode != "L":
+        image = image.convert("L")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+
+def guardar_jpeg(image, image_path, dpi):
+    """Guarda la página como JPEG suelto y retorna los bytes escritos."""
+    datos = codificar_jpeg(image, dpi)
+    with open(image_path, "wb") as f:
+        f.write(datos)
+    return len(datos)
+
+
+def guardar_encabezado_texto(output, json_name):
+    """Escribe el encabezado leído de la capa de texto con la estructura del OCR."""
+    os.makedirs(TEXTO_OUTPUT_DIR, exist_ok=True)
+    resultado = {
+        "output": output,
+        "meta": {
+            "model": TEXTO_MODELO,
+            "tokens": {"prompt": 0, "completion": 0, "total": 0},
+            "cost_usd": 0.0,
+        },
+    }
+    with open(os.path.join(TEXTO_OUTPUT_DIR, json_name), "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+
+def procesar_capa_texto(pdf, base_name):
+    """
+    Resuelve desde la capa de texto las páginas que la tienen. `pdf` es una ruta o
+    un documento ya abierto con pdfium.
+
+    Las páginas con texto que no se escriben ni se rasterizan se registran como
+    eventos "pagina_descartada" (con su motivo) para poder revisar las descartadas.
+
+    Returns:
+        tuple[list[int] | None, int, int]: Páginas (desde 1) que deben rasterizarse
+        (None = todas), número de encabezados escritos y de páginas descartadas
+    """
+    textos = texto_pdf.extraer_textos(pdf) if USAR_CAPA_TEXTO else None
+    if textos is None:
+        return None, 0, 0
+
+    escaneadas = []
+    encabezados = 0
+    descartadas = 0
+    for numero, texto in enumerate(textos, start=1):
+        if not texto_pdf.texto_utilizable(texto):
+            escaneadas.append(numero)
+            continue
+
+        output = texto_pdf.parsear_encabezado(texto)
+        pagina = f"{base_name}_page{str(numero).zfill(3)}_"
+        if texto_pdf.es_votacion(output):
+            guardar_encabezado_texto(output, f"{pagina}.json")
+            encabezados += 1
+        elif texto_pdf.TIPO_PATTERN.search(texto) and output is None:
+            # Menciona una votación/asistencia pero el encabezado no se pudo leer: va al OCR
+            escaneadas.append(numero)
+        else:
+            motivo = "sin_encabezado" if output is None else "asistencia"
+            metricas.evento("pagina_descartada", pagina=pagina, motivo=motivo)
+            descartadas += 1
+
+    return escaneadas, encabezados, descartadas
+
+
 def process_pdf(file: str):
     """Convierte un PDF en imágenes y devuelve un resumen del progreso."""
     pdf_path = os.path.join(PDFS_FOLDER, file)
-    images = convert_from_path(pdf_path, dpi=DPI)
-    total_pages = len(images)
+    dpi = DPI_CLASIFICACION if MULTIRESOLUCION else DPI
     base_name = file.rsplit(".", 1)[0]
+    motor = RASTERIZADOR or rasterizado.motor_por_defecto()
+
+    global _aviso_capa_texto
+    if USAR_CAPA_TEXTO and texto_pdf.pdfium is None and not _aviso_capa_texto:
+        print("⚠️ USAR_CAPA_TEXTO activo pero pypdfium2 no está instalado: todo va por imágenes")
+        _aviso_capa_texto = True
+
+    # Con pdfium el documento se abre una sola vez para la capa de texto y el rasterizado
+    pdf = rasterizado.abrir_documento(pdf_path) if motor == "pdfium" else pdf_path
+    try:
+        with metricas.medir("pdf", documentos=1, dpi=dpi, motor=motor) as datos:
+            with metricas.medir("capa_texto", documentos=1):
+                paginas, encabezados_texto, descartadas_texto = procesar_capa_texto(pdf, base_name)
+
+            total_pages = 0
+            bytes_escritos = 0
+            with metricas.medir("rasterizado", documentos=1):
+                imagenes = rasterizado.rasterizar(
+                    pdf, dpi, paginas=paginas, grayscale=CONVERT_TO_GRAYSCALE, motor=motor
+                )
+                destino = (
+                    paquetes.EscritorPaquete(paquetes.ruta_paquete(IMAGES_FOLDER, base_name))
+                    if EMPAQUETAR_PAGINAS
+                    else contextlib.nullcontext()
+                )
+                with destino as paquete:
+                    for i, image in imagenes:
+                        # Nombre de archivo con formato nombre_del_pdf_page001_.jpg
+                        image_filename = f"{base_name}_page{str(i).zfill(3)}_.jpg"
+                        if paquete is None:
+                            image_path = os.path.join(IMAGES_FOLDER, image_filename)
+                            bytes_escritos += guardar_jpeg(image, image_path, dpi)
+                        else:
+                            datos_jpeg = codificar_jpeg(image, dpi)
+                            paquete.agregar(image_filename, datos_jpeg)
+                            bytes_escritos += len(datos_jpeg)
+                        total_pages += 1
+
+            datos["paginas"] = total_pages
+            datos["encabezados_texto"] = encabezados_texto
+            datos["descartadas_texto"] = descartadas_texto
+            datos["bytes"] = bytes_escritos
+    finally:
+        if pdf is not pdf_path:
+            pdf.close()
+
+    resumen = f"{file} completado ({total_pages} páginas"
+    if encabezados_texto:
+        resumen += f", {encabezados_texto} encabezados desde la capa de texto"
+    if descartadas_texto:
+        resumen += f", {descartadas_texto} páginas con texto descartadas"
+    return resumen + ")"
+
+
+def renderizar_alta_resolucion(image_path, destino_dir):
+    """
+    Vuelve a rasterizar a DPI, desde su PDF en PDFS_FOLDER, la página de una imagen
+    de baja resolución (<nombre_del_pdf>_pageNNN_.jpg) y la guarda en destino_dir
+    con el mismo nombre.
+
+    Returns:
+        tuple[str, PIL.Image.Image]: Ruta de la página guardada e imagen renderizada
+    """
+    nombre = os.path.basename(image_path)
+    coincidencia = PAGINA_PATTERN.match(os.path.splitext(nombre)[0])
+    if coincidencia is None:
+        raise ValueError(f"Nombre de página no reconocido: {nombre}")
+
+    pdf_path = os.path.join(PDFS_FOLDER, f"{coincidencia['base']}.pdf")
+    pagina = int(coincidencia["pagina"])
+
+    _, image = next(
+        rasterizado.rasterizar(
+            pdf_path, DPI, paginas=[pagina], grayscale=CONVERT_TO_GRAYSCALE, motor=RASTERIZADOR
+        )
+    )
+    os.makedirs(destino_dir, exist_ok=True)
+    destino = os.path.join(destino_dir, nombre)
+    guardar_jpeg(image, destino, DPI)
+
+    return destino, image
+
 
-    for i, image in enumerate(images, start=1):
-        # Convertir a escala de grises si está configurado
-        if CONVERT_TO_GRAYSCALE:
-            image = image.convert("L")
+def limpiar_carpeta_imagenes():
+    if os.path.isdir(IMAGES_FOLDER):
+        shutil.rmtree(IMAGES_FOLDER)
+    os.makedirs(IMAGES_FOLDER, exist_ok=True)
 
-        # Nombre de archivo con formato nombre_del_pdf_page001_.jpg
-        image_filename = f"{base_name}_page{str(i).zfill(3)}_.jpg"
-        image_path = os.path.join(IMAGES_FOLDER, image_filename)
 
-        # Guardar con compresión JPEG
-        image.save(image_path, "JPEG", quality=JPEG_QUALITY, optimize=True)
+def main():
+    limpiar_carpeta_imagenes()
 
-        progress = (i / total_pages) * 100
-        print(f"   🖼️ {file}: Página {i}/{total_pages} ({progress:.1f}%)")
+    # Lista de PDFs
+    allowed_pdfs = _load_allowed_pdfs()
+    pdf_files = [f for f in os.listdir(PDFS_FOLDER) if f.endswith(".pdf") and f in allowed_pdfs]
 
-    return f"{file} completado ({total_pages} páginas)"
+    # Los alias (mismo contenido que otro file_name) no se procesan: c_normalizar_jsons
+    # les replica los resultados del PDF canónico
+    almacen = AlmacenPdfs(PDFS_FOLDER)
+    alias = [f for f in pdf_files if not almacen.es_canonico(f)]
+    pdf_files = [f for f in pdf_files if almacen.es_canonico(f)]
+    total_pdfs = len(pdf_files)
 
+    print(f"📄 Se encontraron {total_pdfs} archivos PDF en datos y disponibles para procesar.")
+    if alias:
+        print(
+            f"♻️  {len(alias)} PDFs omitidos por tener el mismo contenido que otro ya descargado."
+        )
+    plan = recursos.asignacion("imagenes", procesos=NUM_WORKERS)
+    metricas.evento("recursos", **recursos.describir({"imagenes": plan}))
+    print(f"🚀 Procesando en paralelo con {plan.procesos} workers...\n")
 
-# Lista de PDFs
-allowed_pdfs = _load_allowed_pdfs()
-pdf_files = [f for f in os.listdir(PDFS_FOLDER) if f.endswith(".pdf") and f in allowed_pdfs]
-total_pdfs = len(pdf_files)
+    # Ejecutar en paralelo
+    with ProcessPoolExecutor(
+        max_workers=plan.procesos,
+        initializer=recursos.configurar_hilos,
+        initargs=(plan.hilos,),
+    ) as executor:
+        futures = {executor.submit(process_pdf, file): file for file in pdf_files}
+        for idx, future in enumerate(as_completed(futures), start=1):
+            metricas.cola(total_pdfs - idx)
+            file = futures[future]
+            try:
+                result = future.result()
+                print(f"✅ [{idx}/{total_pdfs}] {result}")
+            except Exception as e:
+                print(f"❌ Error procesando {file}: {e}")
 
-print(f"📄 Se encontraron {total_pdfs} archivos PDF en datos y disponibles para procesar.")
-print(f"🚀 Procesando en paralelo con {NUM_WORKERS} workers...\n")
+    print("\n🎉 Todos los PDFs han sido procesados correctamente.")
+    metricas.cerrar()
 
-# Ejecutar en paralelo
-with ProcessPoolExecutor(max_workers=NUM_WORKERS) as executor:
-    futures = {executor.submit(process_pdf, file): file for file in pdf_files}
-    for idx, future in enumerate(as_completed(futures), start=1):
-        file = futures[future]
-        try:
-            result = future.result()
-            print(f"✅ [{idx}/{total_pdfs}] {result}")
-        except Exception as e:
-            print(f"❌ Error procesando {file}: {e}")
 
-print("\n🎉 Todos los PDFs han sido procesados correctamente.")
+if __name__ == "__main__":
+    with perfilar("imagenes"):
+        main()
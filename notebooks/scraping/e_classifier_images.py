@@ -1,10 +1,10 @@
 import os
 import shutil
 
-import torch
-from PIL import Image
-from torch import nn
-from torchvision import models, transforms
+import utils_inferencia as inferencia
+import utils_paquetes as paquetes
+import utils_recursos as recursos
+from utils_metricas import Metricas, perfilar
 
 # ========== VARIABLES GLOBALES ==========
 INPUT_PATH = "./data/images"
@@ -13,20 +13,28 @@ OUTPUT_PATH = "./data/classification"
 MODEL_NAME = "efficientnet_b0"
 CLASS_NAMES = ["asistencia", "otros", "votacion"]
 MODEL_PATH = "./data/weights_efficientnet_b0.pth"
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+DEVICE = None  # 🔧 None = "cuda" si hay GPU disponible, si no "cpu"
+# 🔧 Con servidor_inferencia.py corriendo se clasifica ahí (modelo ya cargado y lotes
+# compartidos con otros procesos); torch solo se importa si hay que cargar el modelo aquí
+USAR_SERVIDOR_INFERENCIA = True
+
+metricas = Metricas("clasificacion")
 
 
 def list_images_in_path(
     path, recursive=True, extensions=(".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp", ".tiff")
 ):
     """
-    Lista todas las imágenes en una carpeta dada.
+    Lista todas las imágenes en una carpeta dada, incluidas las páginas de los
+    paquetes .pag (referencias <paquete>.pag/<página>.jpg, ver utils_paquetes.py).
     """
     image_paths = []
     for root, _, files in os.walk(path):
         for file in files:
             if file.lower().endswith(extensions):
                 image_paths.append(os.path.join(root, file))
+            elif file.endswith(paquetes.EXTENSION):
+                image_paths.extend(paquetes.listar_paginas(root, file[: -len(paquetes.EXTENSION)]))
         if not recursive:
             break
     return image_paths
@@ -36,7 +44,16 @@ def get_input_size(model_name: str):
     return (299, 299) if model_name.lower() == "inception_v3" else (224, 224)
 
 
+def obtener_device():
+    import torch
+
+    return DEVICE or ("cuda" if torch.cuda.is_available() else "cpu")
+
+
 def get_model(model_name: str, num_classes: int):
+    from torch import nn
+    from torchvision import models
+
     name = model_name.lower()
     if name == "resnet50":
         model = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)
@@ -58,27 +75,99 @@ def get_model(model_name: str, num_classes: int):
     return model
 
 
-def classify_and_save(image_path, model, transform, class_names, output_base_path, device):
+def crear_transform(model_name=MODEL_NAME):
+    """Transformación de entrada (resize, crop y normalización ImageNet) del modelo."""
+    from torchvision import transforms
+
+    input_size = get_input_size(model_name)
+    return transforms.Compose(
+        [
+            transforms.Resize(input_size),
+            transforms.CenterCrop(input_size),
+            transforms.ToTensor(),
+            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
+        ]
+    )
+
+
+def cargar_clasificador(
+    model_name=MODEL_NAME, class_names=CLASS_NAMES, model_path=MODEL_PATH, device=None
+):
     """
-    Clasifica una imagen y la guarda en la carpeta correspondiente según su clase.
+    Construye el modelo con sus pesos entrenados y la transformación de entrada.
 
     Retorna:
-    - predicted_class: nombre de la clase predicha
+    - (model, transform)
+    """
+    import torch
+
+    device = device or obtener_device()
+    num_classes = len(class_names)
+    transform = crear_transform(model_name)
+
+    model = get_model(model_name, num_classes)
+    model.load_state_dict(torch.load(model_path, map_location=device))
+    model.to(device)
+    model.eval()
+
+    return model, transform
+
+
+def obtener_clasificador():
+    """
+    Modelo para classify_and_save: el cliente del servidor de inferencia si está
+    corriendo (y USAR_SERVIDOR_INFERENCIA), o el clasificador cargado en este proceso.
+
+    Retorna:
+    - (model, transform, device); transform y device son None con el servidor
     """
-    # Preparar imagen
-    image = Image.open(image_path).convert("RGB")
-    input_tensor = transform(image).unsqueeze(0).to(device)
+    cliente = inferencia.conectar() if USAR_SERVIDOR_INFERENCIA else None
+    if cliente is not None:
+        return cliente, None, None
+    device = obtener_device()
+    model, transform = cargar_clasificador(device=device)
+    return model, transform, device
+
+
+def predecir_lote(imagenes, model, transform, class_names, device):
+    """Clases predichas para una lista de imágenes PIL en una sola pasada del modelo."""
+    import torch
 
-    # Predicción
+    lote = torch.stack([transform(imagen.convert("RGB")) for imagen in imagenes]).to(device)
     with torch.no_grad():
-        output = model(input_tensor)
-        _, pred = torch.max(output, 1)
-        predicted_class = class_names[pred.item()]
+        _, preds = torch.max(model(lote), 1)
+    return [class_names[pred] for pred in preds.tolist()]
+
+
+def classify_and_save(
+    image_path, model, transform, class_names, output_base_path, device, escritores=None
+):
+    """
+    Clasifica una imagen y la guarda en la carpeta correspondiente según su clase.
+    Las páginas de un paquete se agregan a `escritores` (paquetes.EscritoresPaquetes),
+    que el llamador confirma una vez por documento.
+
+    Retorna:
+    - predicted_class: nombre de la clase predicha
+    """
+    with metricas.medir("imagen", paginas=1):
+        if isinstance(model, inferencia.ClienteInferencia):
+            # El servidor decodifica la página y la agrupa en lotes con otras peticiones
+            predicted_class = model.clasificar(paquetes.leer_pagina(image_path))
+        else:
+            image = paquetes.abrir_pagina(image_path)
+            predicted_class = predecir_lote([image], model, transform, class_names, device)[0]
 
     # Crear carpeta de destino si no existe
     output_class_path = os.path.join(output_base_path, predicted_class)
     os.makedirs(output_class_path, exist_ok=True)
 
+    # Las páginas de un paquete se anexan al paquete del documento dentro de la clase
+    if paquetes.es_referencia_paquete(image_path):
+        paquete = os.path.basename(os.path.dirname(image_path))
+        paquetes.guardar_pagina(image_path, os.path.join(output_class_path, paquete), escritores)
+        return predicted_class
+
     # Obtener nombre del archivo y guardar en la nueva ubicación
     filename = os.path.basename(image_path)
     output_file_path = os.path.join(output_class_path, filename)
@@ -98,8 +187,7 @@ def main():
     print(f"📂 Input: {INPUT_PATH}")
     print(f"📁 Output: {OUTPUT_PATH}")
     print(f"🤖 Modelo: {MODEL_NAME}")
-    print(f"🏷️  Clases: {CLASS_NAMES}")
-    print(f"💻 Device: {DEVICE}\n")
+    print(f"🏷️  Clases: {CLASS_NAMES}\n")
 
     # Limpiar carpeta de salida
     if os.path.exists(OUTPUT_PATH):
@@ -118,31 +206,32 @@ def main():
         print("⚠️  No se encontraron imágenes en el INPUT_PATH")
         return
 
-    # Preparar modelo
-    num_classes = len(CLASS_NAMES)
-    input_size = get_input_size(MODEL_NAME)
-
-    transform = transforms.Compose(
-        [
-            transforms.Resize(input_size),
-            transforms.CenterCrop(input_size),
-            transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
-        ]
-    )
-
-    model = get_model(MODEL_NAME, num_classes)
-    model.load_state_dict(torch.load(MODEL_PATH, map_location=DEVICE))
-    model.to(DEVICE)
-    model.eval()
-
-    print("✅ Modelo cargado correctamente\n")
+    # Preparar modelo: el del servidor de inferencia o uno cargado en este proceso
+    model, transform, device = obtener_clasificador()
+    if device is None:
+        print(f"🛰️  Usando el servidor de inferencia ({inferencia.SOCKET_PATH})\n")
+    else:
+        print(f"💻 Device: {device}")
+        # En CPU, hilos de torch según los núcleos disponibles (por defecto usaría todos)
+        plan = recursos.asignacion("clasificacion")
+        metricas.evento("recursos", **recursos.describir({"clasificacion": plan}))
+        if device == "cpu":
+            recursos.configurar_hilos(plan.hilos)
+            print(f"🧵 Hilos de torch: {plan.hilos}")
+        print("✅ Modelo cargado correctamente\n")
     print("=" * 60)
 
     # Clasificar y guardar cada imagen
     class_counts = {class_name: 0 for class_name in CLASS_NAMES}
+    # Un escritor por paquete de destino, confirmado al pasar al siguiente documento
+    escritores = paquetes.EscritoresPaquetes()
+    documento_anterior = None
 
     for idx, image_path in enumerate(images, 1):
+        documento = os.path.dirname(image_path)
+        if documento != documento_anterior:
+            escritores.cerrar()
+            documento_anterior = documento
         try:
             predicted_class = classify_and_save(
                 image_path=image_path,
@@ -150,7 +239,8 @@ def main():
                 transform=transform,
                 class_names=CLASS_NAMES,
                 output_base_path=OUTPUT_PATH,
-                device=DEVICE,
+                device=device,
+                escritores=escritores,
             )
 
             class_counts[predicted_class] += 1
@@ -159,6 +249,7 @@ def main():
 
         except Exception as e:
             print(f"❌ Error procesando {image_path}: {str(e)}")
+    escritores.cerrar()
 
     # Resumen final
     print("=" * 60)
@@ -170,7 +261,9 @@ def main():
     print("-" * 40)
     print(f"  {'TOTAL':15} : {total_images:4} imágenes")
     print("\n✅ Clasificación completada!")
+    metricas.cerrar()
 
 
 if __name__ == "__main__":
-    main()
+    with perfilar("clasificacion"):
+        main()
@@ -1,11 +1,15 @@
-import multiprocessing
+import json
 import os
 import shutil
 from concurrent.futures import ProcessPoolExecutor
-from pathlib import Path
 
 import cv2
-from ultralytics import YOLO
+import d_extract_images as imagenes
+import numpy as np
+import utils_inferencia as inferencia
+import utils_paquetes as paquetes
+import utils_recursos as recursos
+from utils_metricas import Metricas, perfilar
 
 # ⚙️ Configuraciones para votación
 input_dir = "./data/classification/votacion"
@@ -13,13 +17,31 @@ output_dir = "./data/zones"
 model_path = "./data/weights_yolo_zones_best.pt"
 
 # 🔧 Configuración de paralelización
+# Si es None, procesos × hilos de torch/OpenCV según CPU y memoria (utils_recursos.py).
 # Si es 0, procesa secuencialmente. Si > 0, usa ese número de workers
-NUM_WORKERS = 8  # Puedes cambiar este valor según necesites
+NUM_WORKERS = None
+# 🔧 Con servidor_inferencia.py corriendo, la detección se hace ahí (YOLO ya cargado y las
+# páginas de todos los workers agrupadas en lotes); si no, cada worker carga YOLO
+USAR_SERVIDOR_INFERENCIA = True
+PARAMETROS_PREDICCION = {"conf": 0.01, "max_det": 3, "agnostic_nms": True, "verbose": False}
 
 # 🎯 Configuraciones de márgenes verticales (% del alto de la zona)
 # Porcentaje de expansión en el eje Y para la zona de encabezado
 MARGEN_ENCABEZADO_ABAJO = 0.04  # 5% hacia abajo (0.05 = 5%)
 
+# 🗂️ Salida de zonas
+# Las cajas de cada encabezado se registran en un manifiesto (una línea JSON por
+# recorte, con la imagen de la página y su bbox) y el OCR recorta en memoria desde
+# la página. Con GUARDAR_RECORTES = True además se escriben los JPEG de cada recorte.
+GUARDAR_RECORTES = False
+MANIFIESTO_NOMBRE = "manifiesto.jsonl"
+# Con imagenes.MULTIRESOLUCION las páginas clasificadas son de baja resolución; las de
+# votación se vuelven a rasterizar a imagenes.DPI en esta subcarpeta de output_dir y
+# son las que referencia el manifiesto
+CARPETA_PAGINAS = "paginas"
+
+metricas = Metricas("zonas")
+
 
 def aplicar_margenes_verticales(x_min, y_min, x_max, y_max, label, img_height):
     """
@@ -47,6 +69,112 @@ def aplicar_margenes_verticales(x_min, y_min, x_max, y_max, label, img_height):
     return x_min, y_min, x_max, y_max
 
 
+# Modelo YOLO cargado una sola vez por proceso
+_modelos = {}
+
+
+def cargar_yolo(model_path):
+    if model_path not in _modelos:
+        from ultralytics import YOLO
+
+        _modelos[model_path] = YOLO(model_path)
+    return _modelos[model_path]
+
+
+def cargar_modelo(model_path):
+    """Cliente del servidor de inferencia si está corriendo; si no, YOLO en este proceso."""
+    if USAR_SERVIDOR_INFERENCIA:
+        cliente = inferencia.conectar()
+        if cliente is not None:
+            return cliente
+    return cargar_yolo(model_path)
+
+
+def cajas_resultado(result):
+    """Cajas (x_min, y_min, x_max, y_max, label) de un resultado de YOLO."""
+    return [(*map(int, box.xyxy[0]), result.names[int(box.cls[0])]) for box in result.boxes]
+
+
+def detectar_zonas(model, image_bgr):
+    """Cajas de la página con el modelo local o con el servidor de inferencia."""
+    if isinstance(model, inferencia.ClienteInferencia):
+        return model.detectar(image_bgr)
+    return cajas_resultado(model.predict(source=image_bgr, **PARAMETROS_PREDICCION)[0])
+
+
+def recortar_encabezados(model, image_bgr, img_file, output_dir, image_path):
+    """
+    Detecta zonas en una imagen ya cargada y registra los recortes de encabezado.
+
+    Returns:
+        list[dict]: Entradas del manifiesto (file_name del recorte, image_path de la
+        página y bbox [x_min, y_min, x_max, y_max])
+    """
+    recortes = []
+
+    # 📍 Predecir zonas
+    base_name = os.path.splitext(img_file)[0]
+    img_height = image_bgr.shape[0]
+
+    for i, (x_min, y_min, x_max, y_max, label) in enumerate(detectar_zonas(model, image_bgr)):
+        label_lower = label.lower()
+
+        # Solo guardar zonas de encabezado
+        if "encabezado" not in label_lower:
+            continue
+
+        # Aplicar márgenes verticales según el tipo de zona
+        x_min, y_min, x_max, y_max = aplicar_margenes_verticales(
+            x_min, y_min, x_max, y_max, label, img_height
+        )
+
+        zona_filename = f"{base_name}{label_lower}{i+1}_.jpg"
+        recortes.append(
+            {
+                "file_name": zona_filename,
+                "image_path": os.path.abspath(image_path),
+                "bbox": [x_min, y_min, x_max, y_max],
+            }
+        )
+
+        # Guardar recorte (opcional)
+        if GUARDAR_RECORTES:
+            zona = image_bgr[y_min:y_max, x_min:x_max]
+            cv2.imwrite(os.path.join(output_dir, zona_filename), zona)
+
+    return recortes
+
+
+def cargar_pagina(image_path, output_dir):
+    """
+    Lee la página en BGR para la detección. En modo multirresolución la rasteriza
+    antes a alta resolución desde su PDF (ver imagenes.renderizar_alta_resolucion).
+
+    Returns:
+        tuple: (imagen BGR o None si no se pudo obtener, ruta de la página usada)
+    """
+    if not imagenes.MULTIRESOLUCION:
+        if not paquetes.es_referencia_paquete(image_path):
+            return cv2.imread(image_path), image_path
+        # Página dentro de un paquete: se decodifica desde el mmap y se deja en
+        # CARPETA_PAGINAS para que el OCR la recorte
+        datos = np.frombuffer(paquetes.leer_pagina(image_path), dtype=np.uint8)
+        destino = paquetes.guardar_pagina(image_path, os.path.join(output_dir, CARPETA_PAGINAS))
+        return cv2.imdecode(datos, cv2.IMREAD_COLOR), destino
+
+    try:
+        with metricas.medir("alta_resolucion", paginas=1, dpi=imagenes.DPI):
+            destino, pagina = imagenes.renderizar_alta_resolucion(
+                image_path, os.path.join(output_dir, CARPETA_PAGINAS)
+            )
+    except Exception as e:
+        print(f"[⚠️] No se pudo rasterizar en alta resolución {image_path}: {e}")
+        return None, image_path
+
+    conversion = cv2.COLOR_GRAY2BGR if pagina.mode == "L" else cv2.COLOR_RGB2BGR
+    return cv2.cvtColor(np.asarray(pagina), conversion), destino
+
+
 def procesar_imagen(args):
     """
     Procesa una imagen individual: detecta zonas, aplica márgenes y guarda recortes.
@@ -55,111 +183,112 @@ def procesar_imagen(args):
         args: Tupla con (idx, img_file, input_dir, output_dir, model_path, total_imgs)
 
     Returns:
-        str: Mensaje de estado del procesamiento
+        tuple[str, list[dict]]: Mensaje de estado y entradas del manifiesto
     """
     idx, img_file, input_dir, output_dir, model_path, total_imgs = args
 
-    # Cargar modelo YOLO en cada proceso
-    model = YOLO(model_path)
+    # Cargar modelo YOLO (una vez por proceso)
+    model = cargar_modelo(model_path)
 
     if idx % 100 == 0 or idx == 1:
         print(f"\n📊 Progreso: {idx}/{total_imgs} imágenes procesadas")
 
-    image_path = os.path.join(input_dir, img_file)
-    image_bgr = cv2.imread(image_path)
-
-    if image_bgr is None:
-        return f"[⚠️] No se pudo leer la imagen: {image_path}"
-
-    # 📍 Predecir zonas
-    results = model.predict(
-        source=image_bgr, conf=0.01, max_det=3, agnostic_nms=True, verbose=False
-    )
-    for result in results:
-        detecciones = result.boxes
-        labels = result.names
-
-        base_name = os.path.splitext(img_file)[0]
-
-        # Obtener dimensiones de la imagen
-        img_height, img_width = image_bgr.shape[:2]
-
-        for i, box in enumerate(detecciones):
-            x_min, y_min, x_max, y_max = map(int, box.xyxy[0])
-            label = labels[int(box.cls[0])]
-            label_lower = label.lower()
-
-            # Solo guardar zonas de encabezado
-            if "encabezado" not in label_lower:
-                continue
-
-            # Aplicar márgenes verticales según el tipo de zona
-            x_min, y_min, x_max, y_max = aplicar_margenes_verticales(
-                x_min, y_min, x_max, y_max, label, img_height
-            )
-
-            # Recortar zona
-            zona = image_bgr[y_min:y_max, x_min:x_max]
-
-            # Guardar recorte
-            zona_filename = f"{base_name}{label_lower}{i+1}_.jpg"
-            zona_path = os.path.join(output_dir, zona_filename)
-
-            cv2.imwrite(zona_path, zona)
-
-    return f"✅ Procesada: {img_file}"
-
-
-# 🧹 Limpiar carpeta destino antes de iniciar
-if os.path.exists(output_dir):
-    for elemento in os.listdir(output_dir):
-        ruta_elemento = os.path.join(output_dir, elemento)
-        if os.path.isdir(ruta_elemento):
-            shutil.rmtree(ruta_elemento)
-        else:
-            os.remove(ruta_elemento)
-
-# 📂 Crear carpeta destino si no existe
-os.makedirs(output_dir, exist_ok=True)
-
-# 📋 Listar imágenes válidas
-img_files = [f for f in os.listdir(input_dir) if f.lower().endswith((".png", ".jpg", ".jpeg"))]
-total_imgs = len(img_files)
-print(f"📦 Total de imágenes detectadas: {total_imgs}")
-
-# 🔧 Calcular número de workers óptimo
-max_workers = None
-if NUM_WORKERS > 0:
-    cpu_count = multiprocessing.cpu_count()
-    max_available = max(1, cpu_count - 2)  # Dejar 2 CPUs libres
-    max_workers = min(NUM_WORKERS, max_available)
-    print(
-        f"🚀 Modo paralelo activado: usando {max_workers} workers (CPUs disponibles: {cpu_count})"
-    )
-else:
-    print(f"🐌 Modo secuencial activado")
-
-# 🔁 Procesar imágenes
-# Preparar argumentos para cada imagen
-args_list = [
-    (idx, img_file, input_dir, output_dir, model_path, total_imgs)
-    for idx, img_file in enumerate(img_files, start=1)
-]
-
-if NUM_WORKERS == 0:
-    # Modo secuencial: procesar una por una
-    for args in args_list:
-        resultado = procesar_imagen(args)
-        if "⚠️" in resultado:
-            print(resultado)
-else:
-    # Modo paralelo: usar ProcessPoolExecutor
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        resultados = executor.map(procesar_imagen, args_list)
-
-        # Mostrar resultados (opcional, para ver errores)
-        for resultado in resultados:
+    with metricas.medir("imagen", paginas=1) as datos:
+        image_path = os.path.join(input_dir, img_file)
+        image_bgr, image_path = cargar_pagina(image_path, output_dir)
+
+        if image_bgr is None:
+            datos["ilegibles"] = 1
+            return f"[⚠️] No se pudo leer la imagen: {image_path}", []
+
+        recortes = recortar_encabezados(
+            model, image_bgr, os.path.basename(img_file), output_dir, image_path
+        )
+        datos["encabezados"] = len(recortes)
+
+    return f"✅ Procesada: {img_file}", recortes
+
+
+def anexar_manifiesto(recortes, output_dir):
+    """Agrega las entradas de recortes al manifiesto de zonas (solo desde el proceso principal)."""
+    if not recortes:
+        return
+    with open(os.path.join(output_dir, MANIFIESTO_NOMBRE), "a", encoding="utf-8") as f:
+        for recorte in recortes:
+            f.write(json.dumps(recorte, ensure_ascii=False) + "\n")
+
+
+def limpiar_carpeta_zonas(output_dir):
+    # 🧹 Limpiar carpeta destino antes de iniciar
+    if os.path.exists(output_dir):
+        for elemento in os.listdir(output_dir):
+            ruta_elemento = os.path.join(output_dir, elemento)
+            if os.path.isdir(ruta_elemento):
+                shutil.rmtree(ruta_elemento)
+            else:
+                os.remove(ruta_elemento)
+
+    # 📂 Crear carpeta destino si no existe
+    os.makedirs(output_dir, exist_ok=True)
+
+
+def main():
+    limpiar_carpeta_zonas(output_dir)
+
+    # 📋 Listar imágenes válidas
+    # JPEG sueltos o páginas de paquetes (<doc>.pag/<página>.jpg, relativas a input_dir)
+    img_files = [os.path.relpath(ref, input_dir) for ref in paquetes.listar_paginas(input_dir)]
+    total_imgs = len(img_files)
+    print(f"📦 Total de imágenes detectadas: {total_imgs}")
+    if USAR_SERVIDOR_INFERENCIA and inferencia.conectar() is not None:
+        print(f"🛰️  Detección en el servidor de inferencia ({inferencia.SOCKET_PATH})")
+
+    # 🔧 Procesos y hilos por proceso según los núcleos y la memoria disponibles
+    plan = recursos.asignacion("zonas", procesos=1 if NUM_WORKERS == 0 else NUM_WORKERS)
+    metricas.evento("recursos", **recursos.describir({"zonas": plan}))
+    if NUM_WORKERS == 0:
+        recursos.configurar_hilos(plan.hilos)
+        print(f"🐌 Modo secuencial activado ({plan.hilos} hilos)")
+    else:
+        print(
+            f"🚀 Modo paralelo activado: usando {plan.procesos} workers × {plan.hilos} hilos "
+            f"(CPUs disponibles: {recursos.cpus_disponibles()})"
+        )
+
+    # 🔁 Procesar imágenes
+    # Preparar argumentos para cada imagen
+    args_list = [
+        (idx, img_file, input_dir, output_dir, model_path, total_imgs)
+        for idx, img_file in enumerate(img_files, start=1)
+    ]
+
+    if NUM_WORKERS == 0:
+        # Modo secuencial: procesar una por una
+        for args in args_list:
+            resultado, recortes = procesar_imagen(args)
+            anexar_manifiesto(recortes, output_dir)
             if "⚠️" in resultado:
                 print(resultado)
-
-print(f"\n✅ Procesamiento completado: {total_imgs} imágenes")
+    else:
+        # Modo paralelo: usar ProcessPoolExecutor
+        with ProcessPoolExecutor(
+            max_workers=plan.procesos,
+            initializer=recursos.configurar_hilos,
+            initargs=(plan.hilos,),
+        ) as executor:
+            resultados = executor.map(procesar_imagen, args_list)
+
+            # Mostrar resultados (opcional, para ver errores)
+            for completadas, (resultado, recortes) in enumerate(resultados, start=1):
+                metricas.cola(total_imgs - completadas)
+                anexar_manifiesto(recortes, output_dir)
+                if "⚠️" in resultado:
+                    print(resultado)
+
+    print(f"\n✅ Procesamiento completado: {total_imgs} imágenes")
+    metricas.cerrar()
+
+
+if __name__ == "__main__":
+    with perfilar("zonas"):
+        main()
@@ -0,0 +1,190 @@
+"""
+Servidor de inferencia local para e_classifier_images.py y f_zones.py.
+
+Cada ejecución de esos scripts importaba torch/torchvision/ultralytics y construía
+los modelos antes de procesar la primera página. Este servidor los carga una sola
+vez y queda escuchando en un socket Unix (utils_inferencia.SOCKET_PATH); mientras
+corre, ambos scripts (y pipeline.py --streaming) le envían las páginas en lugar de
+cargar los modelos, así que las ejecuciones sueltas o incrementales arrancan al
+instante.
+
+Las peticiones de todos los clientes (p. ej. los workers de f_zones) se juntan en
+lotes por modelo: el primer pedido espera a lo sumo ESPERA_MAXIMA_MS a que lleguen
+otros, hasta LOTE_MAXIMO, y el lote pasa por el modelo en una sola llamada.
+
+Uso:
+    PYTHONPATH=.. python servidor_inferencia.py      # Ctrl+C para detenerlo
+    PYTHONPATH=.. python e_classifier_images.py      # en otra terminal: usa el servidor
+"""
+
+import io
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+import e_classifier_images as clasificacion
+import f_zones as zonas
+import numpy as np
+import utils_inferencia as inferencia
+from PIL import Image
+import utils_recursos as recursos
+from utils_metricas import Metricas
+
+# 🔧 Páginas por lote como máximo y espera máxima del primer pedido de un lote
+LOTE_MAXIMO = 16
+ESPERA_MAXIMA_MS = 10
+
+metricas = Metricas("inferencia")
+
+
+class Lotes:
+    """Cola de un modelo: un hilo junta pedidos en lotes y resuelve el Future de cada uno."""
+
+    def __init__(self, nombre, procesar_lote):
+        self.nombre = nombre
+        self.procesar_lote = procesar_lote
+        self.lotes = 0
+        self.elementos = 0
+        self._cola = queue.Queue()
+        threading.Thread(target=self._bucle, name=f"lotes-{nombre}", daemon=True).start()
+
+    def enviar(self, entrada):
+        future = Future()
+        self._cola.put((entrada, future))
+        return future
+
+    def _juntar(self):
+        lote = [self._cola.get()]
+        limite = time.monotonic() + ESPERA_MAXIMA_MS / 1000
+        while len(lote) < LOTE_MAXIMO:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _bucle(self):
+        while True:
+            lote = self._juntar()
+            entradas = [entrada for entrada, _ in lote]
+            try:
+                with metricas.medir(f"lote_{self.nombre}", paginas=len(lote)):
+                    resultados = self.procesar_lote(entradas)
+            except Exception as e:
+                for _, future in lote:
+                    future.set_exception(e)
+                continue
+            self.lotes += 1
+            self.elementos += len(lote)
+            for (_, future), resultado in zip(lote, resultados):
+                future.set_result(resultado)
+
+
+class Servidor(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, modelos):
+        self.modelos = modelos
+        self.inicio = time.time()
+        super().__init__(path, ManejadorConexion)
+
+
+class ManejadorConexion(socketserver.BaseRequestHandler):
+    """Atiende los pedidos de una conexión (un proceso cliente) hasta que se cierra."""
+
+    def handle(self):
+        while True:
+            mensaje = inferencia.recibir_mensaje(self.request)
+            if mensaje is None:
+                return
+            cabecera, datos = mensaje
+            try:
+                respuesta = self.responder(cabecera, datos)
+            except Exception as e:
+                respuesta = {"error": f"{type(e).__name__}: {e}"}
+            inferencia.enviar_mensaje(self.request, respuesta)
+
+    def responder(self, cabecera, datos):
+        modelos = self.server.modelos
+        op = cabecera.get("op")
+        if op == "clasificar":
+            # La decodificación corre en el hilo de la conexión, fuera del lote
+            imagen = Image.open(io.BytesIO(datos))
+            imagen.load()
+            return {"clase": modelos["clasificacion"].enviar(imagen).result()}
+        if op == "zonas":
+            imagen = np.frombuffer(datos, dtype=np.uint8).reshape(cabecera["forma"])
+            return {"cajas": modelos["zonas"].enviar(imagen).result()}
+        if op == "estado":
+            return {
+                "pid": os.getpid(),
+                "segundos": round(time.time() - self.server.inicio, 1),
+                "modelos": {
+                    nombre: {"lotes": lotes.lotes, "paginas": lotes.elementos}
+                    for nombre, lotes in modelos.items()
+                },
+            }
+        raise ValueError(f"Operación desconocida: {op}")
+
+
+def cargar_modelos():
+    """Lotes del clasificador y del detector de zonas con sus modelos ya cargados."""
+    device = clasificacion.obtener_device()
+    modelo, transform = clasificacion.cargar_clasificador(device=device)
+    print(f"✅ Clasificador {clasificacion.MODEL_NAME} cargado ({device})")
+
+    yolo = zonas.cargar_yolo(zonas.model_path)
+    print(f"✅ Detector de zonas cargado ({zonas.model_path})")
+
+    def clasificar(imagenes):
+        return clasificacion.predecir_lote(
+            imagenes, modelo, transform, clasificacion.CLASS_NAMES, device
+        )
+
+    def detectar(imagenes):
+        resultados = yolo.predict(source=imagenes, **zonas.PARAMETROS_PREDICCION)
+        return [zonas.cajas_resultado(resultado) for resultado in resultados]
+
+    return {"clasificacion": Lotes("clasificacion", clasificar), "zonas": Lotes("zonas", detectar)}
+
+
+def main():
+    path = inferencia.SOCKET_PATH
+    if os.path.exists(path):
+        if inferencia.conectar(path) is not None:
+            print(f"⚠️ Ya hay un servidor de inferencia escuchando en {path}")
+            return
+        os.remove(path)  # socket huérfano de un servidor anterior
+
+    # Un solo proceso atiende a todos los clientes: todos los núcleos planificados
+    plan = recursos.asignacion("zonas", procesos=1)
+    recursos.configurar_hilos(plan.hilos)
+    metricas.evento("recursos", **recursos.describir({"inferencia": plan}))
+
+    inicio = time.time()
+    modelos = cargar_modelos()
+    print(f"⏱️  Modelos listos en {time.time() - inicio:.1f}s ({plan.hilos} hilos)")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with Servidor(path, modelos) as servidor:
+        print(
+            f"🛰️  Escuchando en {path} (lotes de hasta {LOTE_MAXIMO}, "
+            f"espera máxima {ESPERA_MAXIMA_MS} ms)"
+        )
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Deteniendo el servidor de inferencia")
+        finally:
+            os.remove(path)
+    metricas.cerrar()
+
+
+if __name__ == "__main__":
+    main()
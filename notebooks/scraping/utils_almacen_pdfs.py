@@ -0,0 +1,142 @@
+"""
+Almacén de PDFs direccionado por contenido.
+
+El mismo PDF publicado bajo dos URLs recibe dos file_name (uuid5 de cada URL).
+Al descargar se calcula el sha256 mientras llegan los bytes; el contenido se
+guarda una sola vez en objetos/<sha[:2]>/<sha>.pdf y cada file_name de
+DOWNLOAD_DIR es un enlace duro a ese objeto, así que el resto del pipeline sigue
+leyendo data/pdfs/<file_name> sin cambios.
+
+El índice (JSONL de solo anexado, una línea por file_name) permite saber qué
+file_name son alias del mismo contenido. El primero registrado de cada sha256 es
+el canónico: solo ese se rasteriza, clasifica y envía al OCR, y
+c_normalizar_jsons replica sus resultados a los demás alias.
+
+    {"file_name": "<uuid>.pdf", "sha256": "…", "bytes": 123456}
+
+Uso:
+    almacen = AlmacenPdfs("./data/pdfs")
+    sha256, nuevo = almacen.guardar("<uuid>.pdf", response.iter_content(CHUNK_SIZE))
+    almacen.es_canonico("<uuid>.pdf")
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import defaultdict
+
+CARPETA_OBJETOS = "objetos"
+INDICE_NOMBRE = "indice_contenido.jsonl"
+
+
+def leer_indice(path):
+    """Registros del índice en orden de escritura (ignora una línea final truncada)."""
+    if not os.path.exists(path):
+        return []
+    registros = []
+    with open(path, encoding="utf-8") as file:
+        for linea in file:
+            try:
+                registros.append(json.loads(linea))
+            except ValueError:
+                continue
+    return registros
+
+
+class AlmacenPdfs:
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.objetos_dir = os.path.join(directorio, CARPETA_OBJETOS)
+        self.indice_path = os.path.join(directorio, INDICE_NOMBRE)
+        self._lock = threading.Lock()
+        self.sha_por_archivo: dict[str, str] = {}
+        self.alias: dict[str, list[str]] = defaultdict(list)
+
+        for registro in leer_indice(self.indice_path):
+            self._registrar(registro["file_name"], registro["sha256"])
+
+    def _registrar(self, file_name, sha256):
+        anterior = self.sha_por_archivo.get(file_name)
+        if anterior == sha256:
+            return
+        if anterior is not None:
+            self.alias[anterior].remove(file_name)  # la URL cambió de contenido
+        self.sha_por_archivo[file_name] = sha256
+        self.alias[sha256].append(file_name)
+
+    def ruta_objeto(self, sha256):
+        return os.path.join(self.objetos_dir, sha256[:2], f"{sha256}.pdf")
+
+    def guardar(self, file_name, chunks):
+        """
+        Escribe el contenido de `chunks` calculando su sha256 y deja file_name en
+        DOWNLOAD_DIR enlazado al objeto.
+
+        Returns:
+            tuple[str, bool]: sha256 y si el contenido no estaba en el almacén
+        """
+        os.makedirs(self.objetos_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        total = 0
+        with tempfile.NamedTemporaryFile(dir=self.objetos_dir, suffix=".tmp", delete=False) as tmp:
+            try:
+                for chunk in chunks:
+                    if chunk:
+                        hasher.update(chunk)
+                        tmp.write(chunk)
+                        total += len(chunk)
+            except BaseException:
+                tmp.close()
+                os.remove(tmp.name)
+                raise
+
+        sha256 = hasher.hexdigest()
+        objeto = self.ruta_objeto(sha256)
+        with self._lock:
+            nuevo = not os.path.exists(objeto)
+            if nuevo:
+                os.makedirs(os.path.dirname(objeto), exist_ok=True)
+                os.replace(tmp.name, objeto)
+            else:
+                os.remove(tmp.name)
+
+            self._enlazar(objeto, os.path.join(self.directorio, file_name))
+            if self.sha_por_archivo.get(file_name) != sha256:
+                self._registrar(file_name, sha256)
+                with open(self.indice_path, "a", encoding="utf-8") as file:
+                    registro = {"file_name": file_name, "sha256": sha256, "bytes": total}
+                    file.write(json.dumps(registro) + "\n")
+
+        return sha256, nuevo
+
+    @staticmethod
+    def _enlazar(objeto, destino):
+        """Enlace duro del objeto en destino (copia si el sistema de archivos no lo permite)."""
+        # rename() no hace nada si origen y destino ya son enlaces al mismo archivo
+        if os.path.exists(destino) and os.path.samefile(objeto, destino):
+            return
+        temporal = f"{destino}.tmp"
+        if os.path.lexists(temporal):
+            os.remove(temporal)
+        try:
+            os.link(objeto, temporal)
+        except OSError:
+            shutil.copyfile(objeto, temporal)
+        os.replace(temporal, destino)
+
+    def canonico(self, file_name):
+        """Primer file_name registrado con el mismo contenido (él mismo si no es alias)."""
+        sha256 = self.sha_por_archivo.get(file_name)
+        if sha256 is None:
+            return file_name
+        return self.alias[sha256][0]
+
+    def es_canonico(self, file_name):
+        return self.canonico(file_name) == file_name
+
+    def grupos_alias(self):
+        """Listas de file_name con el mismo contenido (solo contenidos con más de uno)."""
+        return [nombres for nombres in self.alias.values() if len(nombres) > 1]
@@ -0,0 +1,219 @@
+"""
+Histórico de documentos como log de solo anexado con índice en disco.
+
+Cada ejecución que encuentra documentos nuevos escribe una parte JSONL en
+HISTORICO_LOG_DIR (en orden cronológico de descubrimiento) y anexa al índice
+los 16 bytes del uuid5 de cada file_name. Detectar documentos nuevos solo
+requiere cargar ese índice compacto en un set en memoria, sin leer ni reescribir
+documentos_historico.csv.
+
+documentos_historico.csv se mantiene como vista materializada para el resto del
+pipeline, siempre con los documentos más recientes primero: las filas nuevas se
+escriben al inicio (el resto del archivo se copia sin parsearlo) y la compactación
+periódica lo regenera completo en ese mismo orden a partir del log.
+
+Uso:
+    python utils_historico.py  # compacta el log y regenera documentos_historico.csv
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+DOCUMENTOS_HISTORICO_PATH = Path("./data/documentos_historico.csv")
+INDICE_NOMBRE = "indice.bin"
+
+# 🔧 Número de partes JSONL a partir del cual se compacta automáticamente
+MAX_PARTES_LOG = 50
+
+COLUMNAS_DOCUMENTOS = [
+    "periodo_parlamentario",
+    "periodo_anual",
+    "legislatura",
+    "descripcion",
+    "clean_link",
+    "file_name",
+]
+
+TAMANO_CLAVE = 16
+
+
+def ruta_log(csv_path: Path) -> Path:
+    """Carpeta del log de `csv_path`: <nombre del CSV>_log/ junto a él."""
+    return csv_path.with_name(f"{csv_path.stem}_log")
+
+
+HISTORICO_LOG_DIR = ruta_log(DOCUMENTOS_HISTORICO_PATH)
+
+
+def clave_documento(file_name: str) -> bytes:
+    """Clave de 16 bytes del documento: el uuid5 de su nombre (o un hash si no es uuid)."""
+    stem = str(file_name).strip().removesuffix(".pdf")
+    try:
+        return uuid.UUID(stem).bytes
+    except ValueError:
+        return hashlib.blake2b(stem.encode("utf-8"), digest_size=TAMANO_CLAVE).digest()
+
+
+def _partes(log_dir: Path) -> list[Path]:
+    return sorted(log_dir.glob("part-*.jsonl"))
+
+
+def _leer_partes(partes: list[Path]):
+    for parte in partes:
+        with parte.open(encoding="utf-8") as file:
+            for linea in file:
+                if linea.strip():
+                    yield json.loads(linea)
+
+
+def _escribir_parte(registros: list[dict], destino: Path) -> None:
+    tmp = destino.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as file:
+        for registro in registros:
+            file.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    os.replace(tmp, destino)
+
+
+def _a_registros(df: pd.DataFrame) -> list[dict]:
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def cargar_indice(log_dir: Path = HISTORICO_LOG_DIR) -> set[bytes]:
+    indice_path = log_dir / INDICE_NOMBRE
+    if not indice_path.exists():
+        return set()
+
+    datos = indice_path.read_bytes()
+    return {datos[i : i + TAMANO_CLAVE] for i in range(0, len(datos), TAMANO_CLAVE)}
+
+
+def inicializar_log(
+    csv_path: Path = DOCUMENTOS_HISTORICO_PATH, log_dir: Path | None = None
+) -> None:
+    """Crea el log a partir del CSV existente la primera vez que se usa."""
+    log_dir = log_dir or ruta_log(csv_path)
+    if _partes(log_dir):
+        return
+
+    log_dir.mkdir(parents=True, exist_ok=True)
+    registros = []
+    if csv_path.exists():
+        df = pd.read_csv(csv_path, dtype=str).drop_duplicates(subset="file_name", keep="first")
+        # El CSV lista primero los más recientes; el log va en orden cronológico
+        registros = _a_registros(df.iloc[::-1])
+
+    _escribir_parte(registros, log_dir / "part-00000.jsonl")
+    (log_dir / INDICE_NOMBRE).write_bytes(
+        b"".join(clave_documento(r["file_name"]) for r in registros)
+    )
+
+
+def anteponer_csv(df_nuevos: pd.DataFrame, csv_path: Path = DOCUMENTOS_HISTORICO_PATH) -> None:
+    """
+    Escribe las filas al inicio del CSV (tras el encabezado), respetando el orden de
+    columnas del archivo existente. Las filas anteriores se copian byte a byte.
+    """
+    if not csv_path.exists():
+        csv_path.parent.mkdir(parents=True, exist_ok=True)
+        df_nuevos.to_csv(csv_path, index=False, encoding="utf-8")
+        return
+
+    columnas = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    tmp = csv_path.with_suffix(".tmp")
+    with csv_path.open("rb") as origen, tmp.open("wb") as destino:
+        destino.write(origen.readline())
+        df_nuevos.reindex(columns=columnas).to_csv(
+            destino, header=False, index=False, encoding="utf-8"
+        )
+        shutil.copyfileobj(origen, destino)
+    os.replace(tmp, csv_path)
+
+
+def anexar_documentos(
+    df_result: pd.DataFrame,
+    csv_path: Path = DOCUMENTOS_HISTORICO_PATH,
+    log_dir: Path | None = None,
+) -> tuple[pd.DataFrame, int]:
+    """
+    Registra en el log los documentos de `df_result` que aún no están en el índice.
+    Sin `log_dir` se usa el log propio de `csv_path` (ver ruta_log).
+
+    Retorna:
+    - df_nuevos: filas nuevas (en el mismo orden que `df_result`, que se espera con
+      los más recientes primero; así quedan también al inicio del CSV)
+    - total: número de documentos en el histórico tras anexar
+    """
+    log_dir = log_dir or ruta_log(csv_path)
+    inicializar_log(csv_path, log_dir)
+    indice = cargar_indice(log_dir)
+
+    claves = df_result["file_name"].map(clave_documento)
+    mask = ~claves.isin(indice) & ~claves.duplicated()
+    df_nuevos = df_result[mask].copy()
+
+    if df_nuevos.empty:
+        return df_nuevos, len(indice)
+
+    partes = _partes(log_dir)
+    siguiente = int(partes[-1].stem.split("-")[1]) + 1 if partes else 0
+    _escribir_parte(_a_registros(df_nuevos.iloc[::-1]), log_dir / f"part-{siguiente:05d}.jsonl")
+
+    with (log_dir / INDICE_NOMBRE).open("ab") as file:
+        file.write(b"".join(claves[mask].iloc[::-1]))
+
+    anteponer_csv(df_nuevos, csv_path)
+
+    if len(partes) + 1 > MAX_PARTES_LOG:
+        compactar_historico(csv_path, log_dir)
+
+    return df_nuevos, len(indice) + len(df_nuevos)
+
+
+def compactar_historico(
+    csv_path: Path = DOCUMENTOS_HISTORICO_PATH, log_dir: Path | None = None
+) -> int:
+    """
+    Une todas las partes del log en una sola (sin duplicados), reconstruye el
+    índice y regenera el CSV con los documentos más recientes primero.
+    """
+    log_dir = log_dir or ruta_log(csv_path)
+    inicializar_log(csv_path, log_dir)
+    partes = _partes(log_dir)
+
+    vistos = set()
+    registros = []
+    for registro in _leer_partes(partes):
+        clave = clave_documento(registro["file_name"])
+        if clave in vistos:
+            continue
+        vistos.add(clave)
+        registros.append(registro)
+
+    compactada = log_dir / "part-00000.jsonl"
+    _escribir_parte(registros, compactada)
+    for parte in partes:
+        if parte != compactada:
+            parte.unlink()
+
+    (log_dir / INDICE_NOMBRE).write_bytes(
+        b"".join(clave_documento(r["file_name"]) for r in registros)
+    )
+
+    df = pd.DataFrame(registros[::-1])
+    columnas = COLUMNAS_DOCUMENTOS + [c for c in df.columns if c not in COLUMNAS_DOCUMENTOS]
+    tmp = csv_path.with_suffix(".tmp")
+    df.reindex(columns=columnas).to_csv(tmp, index=False, encoding="utf-8")
+    os.replace(tmp, csv_path)
+
+    return len(registros)
+
+
+if __name__ == "__main__":
+    total = compactar_historico()
+    print(f"🗜️ Histórico compactado: {total} documentos en {DOCUMENTOS_HISTORICO_PATH}")
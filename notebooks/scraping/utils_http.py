@@ -0,0 +1,38 @@
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# El portal del Congreso usa un certificado que requests no valida (verify=False)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Cabeceras que simulan un navegador para evitar bloqueos
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
+    "Referer": "https://www2.congreso.gob.pe/",
+}
+
+
+def crear_sesion(pool_size: int = 5, max_retries: int = 3, backoff: float = 2.0):
+    """
+    Crea una requests.Session con un pool de conexiones keep-alive de `pool_size`
+    conexiones por host y reintentos automáticos ante errores 429/5xx.
+    """
+    reintentos = Retry(
+        total=max_retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+    )
+    adaptador = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=reintentos
+    )
+
+    sesion = requests.Session()
+    sesion.headers.update(HEADERS)
+    sesion.verify = False
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    return sesion
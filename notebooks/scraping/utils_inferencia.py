@@ -0,0 +1,119 @@
+"""
+Cliente del servidor de inferencia local (servidor_inferencia.py).
+
+El servidor mantiene cargados el clasificador de páginas y el detector de zonas y
+escucha en un socket Unix. e_classifier_images.py y f_zones.py lo usan si está
+corriendo (sin importar torch ni ultralytics en su proceso); si no, cargan los
+modelos como siempre.
+
+Protocolo: cada mensaje es una cabecera fija (largo del JSON y largo de los datos
+binarios), un JSON y los datos. Una conexión por proceso cliente, reutilizada
+para todas sus peticiones.
+
+    {"op": "clasificar"}               + JPEG de la página  → {"clase": "votacion"}
+    {"op": "zonas", "forma": [h, w, 3]} + píxeles BGR uint8  → {"cajas": [[x1, y1, x2, y2, "encabezado"], …]}
+    {"op": "estado"}                                         → modelos cargados y lotes procesados
+
+Uso:
+    cliente = conectar()  # None si el servidor no está corriendo
+    if cliente is not None:
+        cliente.clasificar(paquetes.leer_pagina(ref))
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+
+SOCKET_PATH = os.environ.get(
+    "PIPELINE_INFERENCIA_SOCKET", str(Path(__file__).resolve().parent / "data" / "inferencia.sock")
+)
+CABECERA = struct.Struct("<II")  # largo del JSON y largo de los datos binarios
+
+
+def _recibir_exacto(sock, largo):
+    buffer = bytearray(largo)
+    vista = memoryview(buffer)
+    leidos = 0
+    while leidos < largo:
+        recibidos = sock.recv_into(vista[leidos:])
+        if recibidos == 0:
+            raise ConnectionError("Conexión cerrada por el otro extremo")
+        leidos += recibidos
+    return buffer
+
+
+def enviar_mensaje(sock, cabecera, datos=b""):
+    cuerpo = json.dumps(cabecera, ensure_ascii=False).encode("utf-8")
+    sock.sendall(CABECERA.pack(len(cuerpo), len(datos)) + cuerpo)
+    if len(datos):
+        sock.sendall(datos)
+
+
+def recibir_mensaje(sock):
+    """(cabecera, datos) del siguiente mensaje, o None si el otro extremo cerró la conexión."""
+    try:
+        largo_json, largo_datos = CABECERA.unpack(_recibir_exacto(sock, CABECERA.size))
+    except ConnectionError:
+        return None
+    cabecera = json.loads(_recibir_exacto(sock, largo_json))
+    return cabecera, _recibir_exacto(sock, largo_datos)
+
+
+class ClienteInferencia:
+    def __init__(self, path=None):
+        self.path = path or SOCKET_PATH
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(self.path)
+        self._lock = threading.Lock()
+
+    def _llamar(self, cabecera, datos=b""):
+        with self._lock:
+            enviar_mensaje(self._sock, cabecera, datos)
+            respuesta = recibir_mensaje(self._sock)
+        if respuesta is None:
+            raise ConnectionError(f"El servidor de inferencia cerró la conexión ({self.path})")
+        cabecera_respuesta, _ = respuesta
+        if "error" in cabecera_respuesta:
+            raise RuntimeError(f"Servidor de inferencia: {cabecera_respuesta['error']}")
+        return cabecera_respuesta
+
+    def estado(self):
+        return self._llamar({"op": "estado"})
+
+    def clasificar(self, imagen_codificada):
+        """Clase predicha para una página codificada (bytes o memoryview de un JPEG)."""
+        return self._llamar({"op": "clasificar"}, imagen_codificada)["clase"]
+
+    def detectar(self, image_bgr):
+        """Cajas (x_min, y_min, x_max, y_max, label) detectadas en una imagen BGR."""
+        imagen = np.ascontiguousarray(image_bgr, dtype=np.uint8)
+        respuesta = self._llamar(
+            {"op": "zonas", "forma": list(imagen.shape)}, memoryview(imagen).cast("B")
+        )
+        return [tuple(caja) for caja in respuesta["cajas"]]
+
+    def cerrar(self):
+        self._sock.close()
+
+
+# Un cliente por proceso (los workers de ProcessPoolExecutor abren su propia conexión)
+_clientes = {}
+
+
+def conectar(path=None):
+    """Cliente conectado al servidor de inferencia, o None si no está corriendo."""
+    path = path or SOCKET_PATH
+    clave = (os.getpid(), path)
+    if clave not in _clientes:
+        if not os.path.exists(path):
+            return None
+        try:
+            _clientes[clave] = ClienteInferencia(path)
+        except OSError:
+            return None  # socket huérfano de un servidor que ya terminó
+    return _clientes[clave]
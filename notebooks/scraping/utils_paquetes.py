@@ -0,0 +1,301 @@
+"""
+Paquetes de páginas: un archivo indexado por documento en lugar de un JPEG suelto por página.
+
+Formato de <documento>.pag:
+
+    MAGIA | JPEG página 1 | JPEG página 2 | … | índice JSON | offset índice (u64) | largo índice (u64) | MAGIA
+
+El índice es {"paginas": [[nombre, offset, largo], …]}. Los bytes de cada página
+se leen por mmap sin copiarlos (memoryview), listos para np.frombuffer/cv2.imdecode.
+
+Una página se referencia como si el paquete fuera una carpeta:
+"data/images/<documento>.pag/<documento>_page001_.jpg". Las funciones de este
+módulo aceptan tanto esas referencias como rutas de JPEG sueltos, así que
+d_deduplicar_paginas, e_classifier_images y f_zones funcionan igual con ambos formatos.
+
+Reescribir un paquete copia todas sus páginas, así que las copias y bajas página a
+página se agrupan: EscritoresPaquetes mantiene un escritor abierto por paquete de
+destino hasta que se confirma el documento, y BajasPaquetes acumula las páginas a
+quitar y compacta cada paquete una sola vez al final.
+
+Uso:
+    with EscritorPaquete("data/images/doc.pag") as paquete:
+        paquete.agregar("doc_page001_.jpg", jpeg_bytes)
+    for ref in listar_paginas("data/images"):
+        imagen = abrir_pagina(ref)
+"""
+
+import io
+import json
+import mmap
+import os
+import struct
+from collections import defaultdict
+
+from PIL import Image
+
+EXTENSION = ".pag"
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp", ".tiff")
+MAGIA = b"PAGS01\n"
+PIE = struct.Struct("<QQ")  # offset y largo del índice
+
+
+def _leer_indice(archivo, tamano):
+    """Índice {nombre: (offset, largo)} y offset donde empieza, a partir del pie del paquete."""
+    if tamano < len(MAGIA) * 2 + PIE.size:
+        raise ValueError("Paquete truncado")
+    archivo.seek(tamano - len(MAGIA) - PIE.size)
+    offset_indice, largo_indice = PIE.unpack(archivo.read(PIE.size))
+    if archivo.read(len(MAGIA)) != MAGIA:
+        raise ValueError("Paquete sin pie válido")
+    archivo.seek(offset_indice)
+    paginas = json.loads(archivo.read(largo_indice))["paginas"]
+    return {nombre: (offset, largo) for nombre, offset, largo in paginas}, offset_indice
+
+
+class EscritorPaquete:
+    """
+    Crea un paquete o, con `anexar=True`, agrega páginas a uno existente. Se escribe
+    en <paquete>.tmp, que reemplaza al paquete al cerrar: una interrupción a mitad de
+    escritura deja el paquete anterior intacto. Al anexar se copian solo las páginas
+    vigentes y que no estén en `omitir`, así que las eliminadas liberan su espacio.
+    """
+
+    def __init__(self, path, anexar=False, omitir=()):
+        self.path = path
+        self.temporal = f"{path}.tmp"
+        self.indice: dict[str, tuple[int, int]] = {}
+        self._archivo = open(self.temporal, "wb")
+        self._archivo.write(MAGIA)
+        if anexar and os.path.exists(path):
+            try:
+                with open(path, "rb") as anterior:
+                    indice, _ = _leer_indice(anterior, os.fstat(anterior.fileno()).st_size)
+                    for nombre, (offset, largo) in indice.items():
+                        if nombre in omitir:
+                            continue
+                        anterior.seek(offset)
+                        self.agregar(nombre, anterior.read(largo))
+            except BaseException:
+                self.descartar()
+                raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excepcion, *exc):
+        if tipo_excepcion is None:
+            self.cerrar()
+        else:
+            self.descartar()
+
+    def agregar(self, nombre, datos):
+        offset = self._archivo.tell()
+        self._archivo.write(datos)
+        self.indice[nombre] = (offset, len(datos))
+
+    def eliminar(self, nombre):
+        """Quita la página del índice (sus bytes quedan sin referencia hasta reescribir)."""
+        self.indice.pop(nombre, None)
+
+    def cerrar(self):
+        if self._archivo is None:
+            return
+        indice = json.dumps(
+            {
+                "paginas": [
+                    [nombre, offset, largo] for nombre, (offset, largo) in self.indice.items()
+                ]
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        offset_indice = self._archivo.tell()
+        self._archivo.write(indice)
+        self._archivo.write(PIE.pack(offset_indice, len(indice)))
+        self._archivo.write(MAGIA)
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._archivo.close()
+        self._archivo = None
+        os.replace(self.temporal, self.path)
+
+    def descartar(self):
+        """Cierra sin reemplazar el paquete (el anterior, si existe, queda como estaba)."""
+        if self._archivo is None:
+            return
+        self._archivo.close()
+        self._archivo = None
+        os.remove(self.temporal)
+
+
+class EscritoresPaquetes:
+    """
+    Un EscritorPaquete abierto (anexando) por paquete de destino. `cerrar` confirma
+    todos los paquetes abiertos; se llama una vez por documento en lugar de
+    reescribir el paquete de destino por cada página copiada.
+    """
+
+    def __init__(self):
+        self._abiertos: dict[str, EscritorPaquete] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # Las páginas ya agregadas están completas: se confirman aunque haya un error
+        self.cerrar()
+
+    def agregar(self, destino, nombre, datos):
+        escritor = self._abiertos.get(destino)
+        if escritor is None:
+            os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+            escritor = self._abiertos[destino] = EscritorPaquete(destino, anexar=True)
+        escritor.agregar(nombre, datos)
+
+    def cerrar(self):
+        abiertos, self._abiertos = self._abiertos, {}
+        for escritor in abiertos.values():
+            escritor.cerrar()
+
+
+class BajasPaquetes:
+    """
+    Páginas a quitar de sus paquetes. `marcar` solo las anota (los JPEG sueltos se
+    borran en el acto) y `aplicar` reescribe cada paquete afectado una sola vez.
+    """
+
+    def __init__(self):
+        self._pendientes: dict[str, set[str]] = defaultdict(set)
+
+    def marcar(self, ref):
+        if not es_referencia_paquete(ref):
+            os.remove(ref)
+            return
+        self._pendientes[os.path.dirname(ref)].add(os.path.basename(ref))
+
+    def aplicar(self):
+        pendientes, self._pendientes = self._pendientes, defaultdict(set)
+        for paquete, nombres in pendientes.items():
+            with EscritorPaquete(paquete, anexar=True, omitir=nombres):
+                pass
+
+
+class LectorPaquete:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as archivo:
+            tamano = os.fstat(archivo.fileno()).st_size
+            self.indice, _ = _leer_indice(archivo, tamano)
+            self._mmap = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(MAGIA)] != MAGIA:
+            raise ValueError(f"No es un paquete de páginas: {path}")
+
+    def nombres(self):
+        return sorted(self.indice)
+
+    def leer(self, nombre):
+        """Bytes de la página como memoryview sobre el mmap (sin copia)."""
+        offset, largo = self.indice[nombre]
+        return memoryview(self._mmap)[offset : offset + largo]
+
+
+# Lectores abiertos por proceso; se renuevan si el paquete cambió en disco
+_lectores = {}
+
+
+def obtener_lector(path):
+    stat = os.stat(path)
+    clave = (stat.st_mtime_ns, stat.st_size)
+    cacheado = _lectores.get(path)
+    if cacheado is None or cacheado[0] != clave:
+        cacheado = (clave, LectorPaquete(path))
+        _lectores[path] = cacheado
+    return cacheado[1]
+
+
+def es_referencia_paquete(ref):
+    return os.path.dirname(str(ref)).endswith(EXTENSION)
+
+
+def ruta_paquete(carpeta, base_name):
+    return os.path.join(carpeta, f"{base_name}{EXTENSION}")
+
+
+def listar_paginas(carpeta, base_name=None):
+    """
+    Referencias ordenadas de las páginas de `carpeta`: JPEG sueltos y páginas de
+    cada paquete. Con `base_name` solo las del documento <base_name>_page…
+    """
+    refs = []
+    if not os.path.isdir(carpeta):
+        return refs
+    for nombre in sorted(os.listdir(carpeta)):
+        ruta = os.path.join(carpeta, nombre)
+        if nombre.endswith(EXTENSION):
+            if base_name is not None and nombre != f"{base_name}{EXTENSION}":
+                continue
+            try:
+                paginas = obtener_lector(ruta).nombres()
+            except (OSError, ValueError) as e:
+                # Un paquete dañado no impide listar los demás
+                print(f"⚠️ Paquete ilegible, se omite: {ruta} ({e})")
+                continue
+            refs.extend(os.path.join(ruta, pagina) for pagina in paginas)
+        elif nombre.lower().endswith(EXTENSIONES_IMAGEN):
+            if base_name is None or nombre.startswith(f"{base_name}_page"):
+                refs.append(ruta)
+    return refs
+
+
+def leer_pagina(ref):
+    """Bytes codificados de la página (memoryview si está en un paquete)."""
+    if es_referencia_paquete(ref):
+        return obtener_lector(os.path.dirname(ref)).leer(os.path.basename(ref))
+    with open(ref, "rb") as archivo:
+        return archivo.read()
+
+
+def abrir_pagina(ref):
+    """Página como imagen PIL ya cargada."""
+    if not es_referencia_paquete(ref):
+        with Image.open(ref) as imagen:
+            imagen.load()
+            return imagen
+    imagen = Image.open(io.BytesIO(leer_pagina(ref)))
+    imagen.load()
+    return imagen
+
+
+def guardar_pagina(ref, destino, escritores=None):
+    """
+    Copia la página a `destino`: un paquete (<carpeta>/<doc>.pag, se le anexa) o
+    una carpeta (se escribe como archivo suelto). Con `escritores` (EscritoresPaquetes)
+    la página queda en el paquete cuando se confirme el documento.
+    """
+    nombre = os.path.basename(ref)
+    if str(destino).endswith(EXTENSION):
+        if escritores is not None:
+            escritores.agregar(destino, nombre, leer_pagina(ref))
+            return os.path.join(destino, nombre)
+        os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+        with EscritorPaquete(destino, anexar=True) as paquete:
+            paquete.agregar(nombre, leer_pagina(ref))
+        return os.path.join(destino, nombre)
+
+    os.makedirs(destino, exist_ok=True)
+    ruta = os.path.join(destino, nombre)
+    with open(ruta, "wb") as archivo:
+        archivo.write(leer_pagina(ref))
+    return ruta
+
+
+def eliminar_pagina(ref, bajas=None):
+    """Borra la página; con `bajas` (BajasPaquetes) se quita al aplicarlas."""
+    if bajas is not None:
+        bajas.marcar(ref)
+        return
+    if not es_referencia_paquete(ref):
+        os.remove(ref)
+        return
+    with EscritorPaquete(os.path.dirname(ref), anexar=True, omitir={os.path.basename(ref)}):
+        pass
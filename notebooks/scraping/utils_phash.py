@@ -0,0 +1,154 @@
+"""
+Hash perceptual de páginas y árbol BK para buscar casi-duplicados.
+
+- phash: 64 bits a partir de la DCT de la página reducida a 32×32 (estable ante
+  cambios de resolución, compresión JPEG y pequeñas diferencias de renderizado).
+- huella_encabezado: hash de diferencias de la franja superior de la página a
+  mayor resolución. Dos actas con la misma plantilla tienen el mismo phash; la
+  huella distingue si cambia la fecha, la hora o el asunto del encabezado.
+- IndiceHuellas: busca por la huella, no por el phash. Las páginas de una misma
+  plantilla tienen casi el mismo phash (todas serían candidatas), mientras que sus
+  huellas difieren. Con 0 bits tolerados la huella es una clave exacta de un dict;
+  con r bits se parte en r + 1 segmentos (multi-index hashing): una huella a r bits
+  o menos coincide exactamente en al menos un segmento. El phash solo descarta
+  candidatas antes de comparar huellas completas.
+
+Uso:
+    indice = IndiceHuellas(max_bits=0)
+    indice.agregar(huella_encabezado(imagen), phash(imagen), "doc_page001_")
+    indice.buscar(huella_encabezado(otra), phash(otra), distancia_maxima=6)
+    # (distancia de phash, "doc_page001_") o None
+"""
+
+import base64
+import zlib
+
+import numpy as np
+from PIL import Image
+
+LADO_DCT = 32
+LADO_HASH = 8
+# Franja del encabezado: fracción superior de la página y ancho al que se reduce
+FRACCION_ENCABEZADO = 0.35
+ANCHO_HUELLA = 192
+
+
+def _matriz_dct(n: int) -> np.ndarray:
+    """Matriz de la DCT-II ortonormal de n puntos."""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matriz = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matriz[0] /= np.sqrt(2)
+    return matriz
+
+
+_DCT = _matriz_dct(LADO_DCT)
+
+
+def phash(imagen: Image.Image) -> int:
+    """Hash perceptual de 64 bits (coeficientes DCT de baja frecuencia vs. su mediana)."""
+    pixeles = np.asarray(
+        imagen.convert("L").resize((LADO_DCT, LADO_DCT), Image.Resampling.LANCZOS),
+        dtype=np.float64,
+    )
+    coeficientes = (_DCT @ pixeles @ _DCT.T)[:LADO_HASH, :LADO_HASH].ravel()
+    # Sin el término DC (brillo medio) para la mediana
+    bits = coeficientes > np.median(coeficientes[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def huella_encabezado(imagen: Image.Image) -> str:
+    """Hash de diferencias horizontales de la franja superior, comprimido en base64."""
+    ancho, alto = imagen.size
+    franja = imagen.convert("L").crop((0, 0, ancho, max(1, int(alto * FRACCION_ENCABEZADO))))
+    alto_huella = max(1, round(franja.height * ANCHO_HUELLA / ancho))
+    pixeles = np.asarray(
+        franja.resize((ANCHO_HUELLA + 1, alto_huella), Image.Resampling.BILINEAR), dtype=np.int16
+    )
+    bits = pixeles[:, 1:] > pixeles[:, :-1]
+    return base64.b64encode(zlib.compress(np.packbits(bits).tobytes(), 9)).decode("ascii")
+
+
+def bits_distintos(huella_a: str, huella_b: str) -> int | None:
+    """Bits distintos entre dos huellas de encabezado (None si son de tamaños distintos)."""
+    a = np.frombuffer(zlib.decompress(base64.b64decode(huella_a)), dtype=np.uint8)
+    b = np.frombuffer(zlib.decompress(base64.b64decode(huella_b)), dtype=np.uint8)
+    if a.shape != b.shape:
+        return None
+    return int(np.unpackbits(a ^ b).sum())
+
+
+def distancia(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _segmentos(bits: bytes, n: int) -> list[bytes]:
+    """
+    Parte la huella descomprimida en n segmentos intercalados (byte k al segmento
+    k % n). Con segmentos contiguos, los que caen en zonas de plantilla sin texto
+    coincidirían en todas las páginas; intercalados, todos cubren el encabezado.
+    """
+    return [bits[i::n] for i in range(n)]
+
+
+class IndiceHuellas:
+    """
+    Páginas canónicas indexadas por su huella de encabezado. Con max_bits = 0 una
+    búsqueda es una lectura de dict; con max_bits > 0 solo se comparan las páginas
+    que comparten algún segmento exacto de la huella.
+    """
+
+    def __init__(self, max_bits: int = 0):
+        self.max_bits = max_bits
+        self._tamano = 0
+        # max_bits = 0: huella → [(phash, valor), ...]
+        self._exactas: dict[str, list[tuple[int, object]]] = {}
+        # max_bits > 0: (segmento, largo, bytes del segmento) → [(phash, bits, valor), ...]
+        self._segmentos: dict[tuple[int, int, bytes], list[tuple[int, int, object]]] = {}
+
+    def __len__(self) -> int:
+        return self._tamano
+
+    def _claves(self, huella: str) -> tuple[int, list[tuple[int, int, bytes]]]:
+        """Huella descomprimida como entero (para comparar con XOR) y sus claves."""
+        bits = zlib.decompress(base64.b64decode(huella))
+        claves = [
+            (i, len(bits), segmento)
+            for i, segmento in enumerate(_segmentos(bits, self.max_bits + 1))
+        ]
+        return int.from_bytes(bits, "big"), claves
+
+    def agregar(self, huella: str, hash_: int, valor) -> None:
+        self._tamano += 1
+        if self.max_bits == 0:
+            self._exactas.setdefault(huella, []).append((hash_, valor))
+            return
+        bits, claves = self._claves(huella)
+        for clave in claves:
+            self._segmentos.setdefault(clave, []).append((hash_, bits, valor))
+
+    def buscar(self, huella: str, hash_: int, distancia_maxima: int) -> tuple[int, object] | None:
+        """
+        (distancia de phash, valor) de la página más cercana con la huella a max_bits
+        o menos y el phash a distancia_maxima o menos, o None.
+        """
+        if self.max_bits == 0:
+            candidatas = self._exactas.get(huella, [])
+        else:
+            vistas = set()
+            candidatas = []
+            bits, claves = self._claves(huella)
+            for clave in claves:  # la clave incluye el largo: solo huellas del mismo tamaño
+                for candidata_hash, candidata_bits, valor in self._segmentos.get(clave, []):
+                    if valor in vistas or distancia(hash_, candidata_hash) > distancia_maxima:
+                        continue
+                    vistas.add(valor)
+                    if distancia(bits, candidata_bits) <= self.max_bits:
+                        candidatas.append((candidata_hash, valor))
+
+        cercanas = [
+            (distancia(hash_, candidata_hash), valor)
+            for candidata_hash, valor in candidatas
+            if distancia(hash_, candidata_hash) <= distancia_maxima
+        ]
+        return min(cercanas, key=lambda cercana: cercana[0], default=None)
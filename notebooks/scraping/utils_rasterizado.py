@@ -0,0 +1,108 @@
+"""
+Motores de rasterizado de PDF para d_extract_images.
+
+- "pdfium": renderiza dentro del proceso con pypdfium2, directamente en escala de
+  grises y reutilizando el documento abierto para todas sus páginas.
+- "poppler": pdf2image.convert_from_path, que lanza pdftoppm por cada llamada,
+  escribe los PPM en un directorio temporal y los decodifica con PIL.
+
+Ambos generan pares (número de página desde 1, imagen PIL) en orden.
+
+Uso:
+    for numero, imagen in rasterizar("documento.pdf", dpi=75, paginas=[1, 2, 5]):
+        ...
+    documento = abrir_documento("documento.pdf")   # pdfium: reutilizable entre llamadas
+"""
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+try:
+    from pdf2image import convert_from_path
+except ImportError:
+    convert_from_path = None
+
+PUNTOS_POR_PULGADA = 72  # Unidad de las páginas PDF: scale = dpi / 72
+
+
+def _rangos(paginas):
+    """Agrupa números de página consecutivos en rangos (primera, última)."""
+    rangos = []
+    for pagina in paginas:
+        if rangos and rangos[-1][1] == pagina - 1:
+            rangos[-1][1] = pagina
+        else:
+            rangos.append([pagina, pagina])
+    return rangos
+
+
+def abrir_documento(pdf_path):
+    """Abre el PDF con pdfium para compartirlo entre la capa de texto y el rasterizado."""
+    if pdfium is None:
+        raise ImportError("El motor pdfium requiere pypdfium2", name="pypdfium2")
+    return pdfium.PdfDocument(pdf_path)
+
+
+def rasterizar_pdfium(pdf, dpi, paginas=None, grayscale=True):
+    """`pdf` puede ser una ruta o un documento de abrir_documento (no se cierra aquí)."""
+    documento = pdf if pdfium is not None and isinstance(pdf, pdfium.PdfDocument) else None
+    if documento is None:
+        documento = abrir_documento(pdf)
+
+    try:
+        numeros = range(1, len(documento) + 1) if paginas is None else paginas
+        for numero in numeros:
+            pagina = documento[numero - 1]
+            try:
+                bitmap = pagina.render(scale=dpi / PUNTOS_POR_PULGADA, grayscale=grayscale)
+                yield numero, bitmap.to_pil()
+            finally:
+                pagina.close()
+    finally:
+        if documento is not pdf:
+            documento.close()
+
+
+def rasterizar_poppler(pdf_path, dpi, paginas=None, grayscale=True):
+    if convert_from_path is None:
+        raise ImportError("El motor poppler requiere pdf2image", name="pdf2image")
+
+    if paginas is None:
+        yield from enumerate(convert_from_path(pdf_path, dpi=dpi, grayscale=grayscale), start=1)
+        return
+
+    # Una llamada a pdftoppm por cada rango de páginas consecutivas
+    for primera, ultima in _rangos(paginas):
+        imagenes = convert_from_path(
+            pdf_path, dpi=dpi, grayscale=grayscale, first_page=primera, last_page=ultima
+        )
+        yield from enumerate(imagenes, start=primera)
+
+
+RASTERIZADORES = {"pdfium": rasterizar_pdfium, "poppler": rasterizar_poppler}
+
+
+def motores_disponibles():
+    instalados = {"pdfium": pdfium is not None, "poppler": convert_from_path is not None}
+    return [motor for motor in RASTERIZADORES if instalados[motor]]
+
+
+def motor_por_defecto():
+    """pdfium si está instalado; si no, poppler."""
+    disponibles = motores_disponibles()
+    return disponibles[0] if disponibles else "poppler"
+
+
+def rasterizar(pdf, dpi, paginas=None, grayscale=True, motor=None):
+    """
+    Rasteriza las `paginas` indicadas (todas si es None) con el motor elegido.
+
+    Returns:
+        Iterator[tuple[int, PIL.Image.Image]]: Número de página e imagen
+    """
+    motor = motor or motor_por_defecto()
+    if motor not in RASTERIZADORES:
+        raise ValueError(f"Motor de rasterizado desconocido: {motor}")
+    return RASTERIZADORES[motor](pdf, dpi, paginas=paginas, grayscale=grayscale)
@@ -0,0 +1,172 @@
+"""
+Vía rápida por la capa de texto de los PDF.
+
+Los PDF generados digitalmente traen el texto de cada página; en ellos el
+encabezado de votación (tipo, fecha, hora y asunto) se puede leer directamente,
+sin rasterizar la página ni enviarla al OCR. Las páginas escaneadas (sin texto
+utilizable) siguen el camino de imágenes.
+
+Uso:
+    textos = extraer_textos("documento.pdf")   # None si pypdfium2 no está instalado
+    for texto in textos:
+        if texto_utilizable(texto):
+            output = parsear_encabezado(texto)   # dict con tipo/fecha/hora/asunto o None
+"""
+
+import re
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # La capa de texto es opcional: sin pypdfium2 todo va por imágenes
+    pdfium = None
+
+# 🔧 Una página con menos caracteres alfanuméricos se considera escaneada
+MIN_CARACTERES_TEXTO = 200
+# 🔧 Proporción mínima de caracteres imprimibles (descarta capas de texto corruptas)
+MIN_PROPORCION_IMPRIMIBLE = 0.9
+# Líneas del inicio de la página en las que se busca el tipo de encabezado
+LINEAS_ENCABEZADO = 15
+# Líneas máximas del asunto (termina antes si aparece otra etiqueta o una línea vacía)
+MAX_LINEAS_ASUNTO = 8
+
+TIPO_PATTERN = re.compile(r"\b(ASISTENCIA|VOTACI[OÓ]N)\b", re.IGNORECASE)
+_FECHA = r"\b(\d{1,2})\s*[/.-]\s*(\d{1,2})\s*[/.-]\s*(\d{4}|\d{2})\b"
+_HORA = r"\b(\d{1,2})\s*:\s*(\d{2})(?:\s*:\s*(\d{2}))?(?:\s*([AP])\.?\s*M\b\.?)?"
+# Solo valores junto a su etiqueta ("Fecha: 12/12/2013"): una fecha u hora suelta en el
+# cuerpo de un diario de debates no identifica un encabezado de votación
+FECHA_PATTERN = re.compile(r"\bFECHA\s*:?\s*" + _FECHA, re.IGNORECASE)
+HORA_PATTERN = re.compile(r"\bHORA\s*:?\s*" + _HORA, re.IGNORECASE)
+ASUNTO_PATTERN = re.compile(r"\bASUNTO\s*:?\s*", re.IGNORECASE)
+# Etiquetas que cierran el asunto
+ETIQUETA_PATTERN = re.compile(
+    r"^\s*(PRESIDENTE|FECHA|HORA|RESULTADOS?|CONGRESISTAS?|GRUPO PARLAMENTARIO|SI\s*\+\+\+)\b",
+    re.IGNORECASE,
+)
+
+
+def extraer_textos(pdf):
+    """
+    Texto de cada página del PDF, en orden. `pdf` es una ruta o un documento ya
+    abierto con pypdfium2 (que no se cierra aquí).
+
+    Returns:
+        list[str] | None: Un texto por página, o None si pypdfium2 no está disponible
+    """
+    if pdfium is None:
+        return None
+
+    documento = pdf if isinstance(pdf, pdfium.PdfDocument) else pdfium.PdfDocument(pdf)
+    textos = []
+    try:
+        for indice in range(len(documento)):
+            pagina = documento[indice]
+            textpage = pagina.get_textpage()
+            try:
+                textos.append(textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n"))
+            finally:
+                textpage.close()
+                pagina.close()
+    finally:
+        if documento is not pdf:
+            documento.close()
+    return textos
+
+
+def texto_utilizable(texto):
+    """True si la página trae una capa de texto real (no es un escaneo sin texto)."""
+    if not texto:
+        return False
+    alfanumericos = sum(caracter.isalnum() for caracter in texto)
+    if alfanumericos < MIN_CARACTERES_TEXTO:
+        return False
+    imprimibles = sum(caracter.isprintable() or caracter.isspace() for caracter in texto)
+    return imprimibles / len(texto) >= MIN_PROPORCION_IMPRIMIBLE
+
+
+def _lineas(texto):
+    return [re.sub(r"\s+", " ", linea).strip() for linea in texto.split("\n")]
+
+
+def _tipo(lineas):
+    """Primer ASISTENCIA/VOTACIÓN que aparece en las líneas del encabezado."""
+    for linea in lineas[:LINEAS_ENCABEZADO]:
+        coincidencia = TIPO_PATTERN.search(linea)
+        if coincidencia:
+            tipo = coincidencia.group(1).upper()
+            return "ASISTENCIA" if tipo == "ASISTENCIA" else "VOTACIÓN"
+    return None
+
+
+def _fecha(texto):
+    coincidencia = FECHA_PATTERN.search(texto)
+    if coincidencia is None:
+        return None
+    dia, mes, anio = coincidencia.groups()
+    if len(anio) == 2:
+        anio = f"20{anio}"
+    return f"{int(dia):02d}/{int(mes):02d}/{anio}"
+
+
+def _hora(texto):
+    coincidencia = HORA_PATTERN.search(texto)
+    if coincidencia is None:
+        return None
+    hora, minutos, segundos, meridiano = coincidencia.groups()
+    valor = f"{int(hora):02d}:{minutos}"
+    if segundos:
+        valor += f":{segundos}"
+    if meridiano:
+        valor += f" {meridiano.upper()}M"
+    return valor
+
+
+def _asunto(lineas):
+    """Texto desde la etiqueta "Asunto:" hasta la siguiente etiqueta o línea vacía."""
+    for posicion, linea in enumerate(lineas):
+        coincidencia = ASUNTO_PATTERN.search(linea)
+        if coincidencia is None:
+            continue
+
+        partes = [linea[coincidencia.end() :]]
+        for siguiente in lineas[posicion + 1 : posicion + MAX_LINEAS_ASUNTO]:
+            if not siguiente or ETIQUETA_PATTERN.match(siguiente):
+                break
+            partes.append(siguiente)
+        asunto = " ".join(parte for parte in partes if parte).strip()
+        return asunto.upper() or None
+    return None
+
+
+def parsear_encabezado(texto):
+    """
+    Lee tipo/fecha/hora/asunto del texto de una página, con el mismo formato que
+    devuelve el OCR (PROMPT de encabezados/b_openai_api.py).
+
+    Solo se acepta un encabezado completo: tipo, fecha y hora con sus etiquetas y un
+    asunto no vacío; cualquier otra página devuelve None. d_extract_images rasteriza
+    (y envía al clasificador y al OCR) las que devuelven None pero mencionan
+    ASISTENCIA o VOTACIÓN; las demás páginas con texto se descartan sin rasterizar y
+    quedan registradas como eventos "pagina_descartada" en las métricas.
+
+    Returns:
+        dict | None: {"tipo", "fecha", "hora", "asunto"}, o None si la página no tiene
+        un encabezado reconocible
+    """
+    lineas = _lineas(texto)
+    tipo = _tipo(lineas)
+    if tipo is None:
+        return None
+
+    # Fecha y hora se buscan en las primeras líneas, unidas en un solo bloque de texto
+    encabezado = " ".join(lineas[: LINEAS_ENCABEZADO + MAX_LINEAS_ASUNTO])
+    fecha = _fecha(encabezado)
+    hora = _hora(encabezado)
+    asunto = _asunto(lineas)
+    if fecha is None or hora is None or asunto is None:
+        return None
+
+    return {"tipo": tipo, "fecha": fecha, "hora": hora, "asunto": asunto}
+
+
+def es_votacion(output):
+    return output is not None and output["tipo"] == "VOTACIÓN"
@@ -0,0 +1,410 @@
+"""
+Instrumentación compartida por los scripts del pipeline.
+
+Cada etapa crea un `Metricas("<etapa>")` y registra eventos (un JSON por línea)
+en `metricas/<run_id>.jsonl`. Todos los procesos de una misma ejecución, incluidos
+los workers de ProcessPoolExecutor, escriben en el mismo archivo: el run_id se
+hereda por la variable de entorno PIPELINE_RUN_ID.
+
+Cada evento lleva marca de tiempo, etapa, pid y RSS del proceso. Los eventos
+medidos con `medir()` incluyen su duración en `segundos`. Al cerrar, el proceso
+principal agrega los eventos de su etapa y emite un evento "resumen" con totales,
+tasas por segundo (páginas/s, bytes/s, ...) y percentiles de latencia.
+
+Para workers con muchos hilos (OCR), `MetricasAsincronas` envuelve un `Metricas`:
+los workers solo encolan mensajes y eventos, y un hilo de fondo los escribe,
+agrega contadores (llamadas, tokens, costo) y muestra un resumen en vivo.
+
+Perfilado opcional con la variable de entorno PIPELINE_PROFILE:
+    PIPELINE_PROFILE=cprofile  → metricas/perfiles/<etapa>-<pid>.prof (cProfile)
+    PIPELINE_PROFILE=pyspy     → metricas/perfiles/<etapa>-<pid>.svg (py-spy record, incluye subprocesos)
+
+Los scripts de scraping/ y encabezados/ lo importan con notebooks/ en PYTHONPATH
+(pipeline.py lo configura; a mano: PYTHONPATH=.. python <script>.py).
+
+Uso:
+    python utils_metricas.py metricas/<run_id>.jsonl  # resumen por etapa de una ejecución
+"""
+
+import cProfile
+import json
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+METRICAS_DIR = Path(__file__).resolve().parent / "metricas"
+
+# Eventos que solo se registran (el plan de utils_recursos.py, el propio resumen)
+TIPOS_SIN_AGREGAR = {"resumen", "recursos"}
+
+_PAGINA_BYTES = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_mb() -> float:
+    """Memoria residente actual del proceso en MB."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as file:
+            return int(file.read().split()[1]) * _PAGINA_BYTES / 1024 / 1024
+    except OSError:
+        import resource
+
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        return maximo / 1024 / 1024 if sys.platform == "darwin" else maximo / 1024
+
+
+def run_id() -> str:
+    """Identificador de la ejecución actual, compartido con los procesos hijos."""
+    if "PIPELINE_RUN_ID" not in os.environ:
+        os.environ["PIPELINE_RUN_ID"] = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    return os.environ["PIPELINE_RUN_ID"]
+
+
+def percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+class Metricas:
+    def __init__(self, etapa: str, metricas_dir: Path = METRICAS_DIR):
+        self.etapa = etapa
+        self.path = metricas_dir / f"{run_id()}.jsonl"
+        self.inicio = time.time()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _revisar_fork(self) -> None:
+        """En un proceso hijo creado con fork no se reutilizan el lock ni el archivo del padre."""
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._file = None
+
+    def evento(self, tipo: str, **datos) -> None:
+        self._revisar_fork()
+        registro = {
+            "ts": round(time.time(), 3),
+            "etapa": self.etapa,
+            "tipo": tipo,
+            "pid": os.getpid(),
+            "rss_mb": round(rss_mb(), 1),
+            **datos,
+        }
+        linea = json.dumps(registro, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(linea)
+
+    def cola(self, profundidad: int) -> None:
+        """Registra la profundidad actual de la cola de trabajo pendiente."""
+        self.evento("cola", profundidad=profundidad)
+
+    @contextmanager
+    def medir(self, tipo: str, **datos):
+        """Mide un bloque y emite un evento con su duración; el bloque puede agregar campos."""
+        inicio = time.perf_counter()
+        try:
+            yield datos
+        finally:
+            self.evento(tipo, segundos=round(time.perf_counter() - inicio, 4), **datos)
+
+    def resumen(self) -> dict:
+        """Agrega los eventos de esta etapa en la ejecución actual (todos los procesos)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+        eventos = [e for e in leer_eventos(self.path) if e["etapa"] == self.etapa]
+        return agregar_eventos(eventos, time.time() - self.inicio)
+
+    def cerrar(self) -> dict:
+        resumen = self.resumen()
+        self.evento("resumen", **resumen)
+        imprimir_resumen(self.etapa, resumen)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        return resumen
+
+
+class MetricasAsincronas:
+    """
+    Sumidero no bloqueante de mensajes y eventos para workers con hilos.
+
+    `log()` y `evento()` solo encolan (cola acotada): si la cola está llena, los
+    mensajes se descartan y se cuentan, mientras que los eventos esperan su turno
+    para no perder tokens ni costos del registro JSONL. Un único hilo de fondo
+    imprime, escribe los eventos con `Metricas` y cada `intervalo` segundos muestra
+    costo acumulado, tokens/s y latencia p50/p95 de las llamadas.
+    """
+
+    _FIN = object()
+
+    def __init__(
+        self,
+        metricas: Metricas,
+        tipo_llamada: str = "llamada",
+        capacidad: int = 10_000,
+        intervalo: float = 15.0,
+    ):
+        self.metricas = metricas
+        self.tipo_llamada = tipo_llamada
+        self.intervalo = intervalo
+        self._cola: queue.Queue = queue.Queue(maxsize=capacidad)
+        self._hilo: threading.Thread | None = None
+        self._inicio_hilo = threading.Lock()
+        self._lock_descartados = threading.Lock()
+        self.descartados = 0
+
+        # Contadores, actualizados solo desde el hilo de fondo
+        self.inicio = time.time()
+        self.llamadas = 0
+        self.errores = 0
+        self.tokens = 0
+        self.costo_usd = 0.0
+        self._latencias: deque[float] = deque(maxlen=10_000)
+
+    def _asegurar_hilo(self) -> None:
+        if self._hilo is None:
+            with self._inicio_hilo:
+                if self._hilo is None:
+                    self._hilo = threading.Thread(target=self._procesar, daemon=True)
+                    self._hilo.start()
+
+    def log(self, mensaje: str) -> None:
+        self._asegurar_hilo()
+        try:
+            self._cola.put_nowait(("log", mensaje))
+        except queue.Full:
+            with self._lock_descartados:
+                self.descartados += 1
+
+    def evento(self, tipo: str, **datos) -> None:
+        self._asegurar_hilo()
+        self._cola.put(("evento", (tipo, datos)))
+
+    def cola(self, profundidad: int) -> None:
+        self.evento("cola", profundidad=profundidad)
+
+    def vaciar(self) -> None:
+        """Espera a que el hilo de fondo procese todo lo encolado hasta ahora."""
+        if self._hilo is None:
+            return
+        procesado = threading.Event()
+        self._cola.put(("vaciar", procesado))
+        procesado.wait()
+
+    @contextmanager
+    def medir(self, tipo: str, **datos):
+        """Como Metricas.medir, pero el evento se encola en lugar de escribirse."""
+        inicio = time.perf_counter()
+        try:
+            yield datos
+        finally:
+            self.evento(tipo, segundos=round(time.perf_counter() - inicio, 4), **datos)
+
+    def _acumular(self, tipo: str, datos: dict) -> None:
+        if tipo != self.tipo_llamada:
+            return
+        self.llamadas += datos.get("llamadas", 1)
+        self.errores += datos.get("errores", 0)
+        self.tokens += datos.get("tokens_prompt", 0) + datos.get("tokens_completion", 0)
+        self.costo_usd += datos.get("costo_usd", 0.0)
+        if "segundos" in datos:
+            self._latencias.append(datos["segundos"])
+
+    def resumen_en_vivo(self) -> str:
+        segundos = max(time.time() - self.inicio, 1e-9)
+        latencias = list(self._latencias)
+        return (
+            f"📡 [{self.metricas.etapa}] {self.llamadas} llamadas ({self.errores} errores) | "
+            f"${self.costo_usd:.4f} USD | {self.tokens / segundos:.0f} tokens/s | "
+            f"p50={percentil(latencias, 50):.2f}s p95={percentil(latencias, 95):.2f}s"
+        )
+
+    def _procesar(self) -> None:
+        siguiente_resumen = time.monotonic() + self.intervalo
+        while True:
+            try:
+                item = self._cola.get(timeout=max(0.0, siguiente_resumen - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is self._FIN:
+                return
+            if item is not None:
+                clase, contenido = item
+                if clase == "log":
+                    print(contenido)
+                elif clase == "vaciar":
+                    contenido.set()
+                else:
+                    tipo, datos = contenido
+                    self.metricas.evento(tipo, **datos)
+                    self._acumular(tipo, datos)
+
+            if time.monotonic() >= siguiente_resumen:
+                print(self.resumen_en_vivo())
+                siguiente_resumen = time.monotonic() + self.intervalo
+
+    def cerrar(self) -> dict:
+        """Vacía la cola, detiene el hilo y emite el resumen de la etapa."""
+        if self._hilo is not None:
+            self._cola.put(self._FIN)
+            self._hilo.join()
+            self._hilo = None
+            print(self.resumen_en_vivo())
+        if self.descartados:
+            print(f"⚠️ {self.descartados} mensajes descartados por cola llena")
+        return self.metricas.cerrar()
+
+
+def leer_eventos(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8") as file:
+        return [json.loads(linea) for linea in file if linea.strip()]
+
+
+def agregar_eventos(eventos: list[dict], segundos_totales: float) -> dict:
+    """Totales, tasas por segundo y percentiles de latencia por tipo de evento."""
+    por_tipo: dict[str, list[dict]] = defaultdict(list)
+    rss_por_pid: dict[int, float] = {}
+    for evento in eventos:
+        if evento["tipo"] in TIPOS_SIN_AGREGAR:
+            continue
+        por_tipo[evento["tipo"]].append(evento)
+        rss_por_pid[evento["pid"]] = max(rss_por_pid.get(evento["pid"], 0), evento["rss_mb"])
+
+    segundos_totales = max(segundos_totales, 1e-9)
+    tipos = {}
+    for tipo, lista in por_tipo.items():
+        if tipo == "cola":
+            profundidades = [e["profundidad"] for e in lista]
+            tipos[tipo] = {
+                "n": len(lista),
+                "profundidad": {
+                    "p50": percentil(profundidades, 50),
+                    "max": max(profundidades),
+                },
+            }
+            continue
+
+        totales: dict[str, float] = defaultdict(float)
+        for evento in lista:
+            for clave, valor in evento.items():
+                if clave in {"ts", "pid", "rss_mb", "segundos"}:
+                    continue
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    totales[clave] += valor
+
+        latencias = [e["segundos"] for e in lista if "segundos" in e]
+        tipos[tipo] = {
+            "n": len(lista),
+            "por_segundo": round(len(lista) / segundos_totales, 3),
+            "totales": dict(totales),
+            "tasas": {f"{k}_por_s": round(v / segundos_totales, 3) for k, v in totales.items()},
+        }
+        if latencias:
+            tipos[tipo]["latencia"] = {
+                "p50": round(percentil(latencias, 50), 4),
+                "p95": round(percentil(latencias, 95), 4),
+                "max": round(max(latencias), 4),
+            }
+
+    return {
+        "segundos": round(segundos_totales, 2),
+        "procesos": len(rss_por_pid),
+        "rss_mb_max": round(max(rss_por_pid.values(), default=rss_mb()), 1),
+        "tipos": tipos,
+    }
+
+
+def imprimir_resumen(etapa: str, resumen: dict) -> None:
+    print(
+        f"\n📈 Métricas [{etapa}] {resumen['segundos']}s | "
+        f"{resumen['procesos']} procesos | RSS máx {resumen['rss_mb_max']} MB"
+    )
+    for tipo, datos in resumen["tipos"].items():
+        if tipo == "cola":
+            profundidad = datos["profundidad"]
+            print(f"   {'cola':12} p50={profundidad['p50']} max={profundidad['max']}")
+            continue
+        tasas = ", ".join(f"{k}={v}" for k, v in datos["tasas"].items())
+        latencia = datos.get("latencia")
+        latencia = (
+            f" | p50={latencia['p50']}s p95={latencia['p95']}s max={latencia['max']}s"
+            if latencia
+            else ""
+        )
+        print(f"   {tipo:12} n={datos['n']} ({datos['por_segundo']}/s){latencia}")
+        if tasas:
+            print(f"   {'':12} {tasas}")
+
+
+@contextmanager
+def perfilar(etapa: str, metricas_dir: Path = METRICAS_DIR):
+    """Perfilado opt-in del bloque según PIPELINE_PROFILE (cprofile o pyspy)."""
+    modo = os.environ.get("PIPELINE_PROFILE", "").lower()
+    perfiles_dir = metricas_dir / "perfiles"
+
+    if modo == "cprofile":
+        perfiles_dir.mkdir(parents=True, exist_ok=True)
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+            destino = perfiles_dir / f"{etapa}-{os.getpid()}.prof"
+            perfil.dump_stats(destino)
+            print(f"🔬 Perfil cProfile guardado en {destino}")
+        return
+
+    if modo == "pyspy" and shutil.which("py-spy"):
+        perfiles_dir.mkdir(parents=True, exist_ok=True)
+        destino = perfiles_dir / f"{etapa}-{os.getpid()}.svg"
+        proceso = subprocess.Popen(
+            ["py-spy", "record", "--pid", str(os.getpid()), "--subprocesses", "-o", str(destino)]
+        )
+        try:
+            yield
+        finally:
+            proceso.send_signal(signal.SIGINT)
+            proceso.wait()
+            print(f"🔬 Flamegraph de py-spy guardado en {destino}")
+        return
+
+    if modo == "pyspy":
+        print("⚠️ PIPELINE_PROFILE=pyspy pero py-spy no está instalado; se ejecuta sin perfilar")
+    yield
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python utils_metricas.py metricas/<run_id>.jsonl")
+        sys.exit(1)
+
+    eventos_run = leer_eventos(Path(sys.argv[1]))
+    por_etapa: dict[str, list[dict]] = defaultdict(list)
+    for e in eventos_run:
+        por_etapa[e["etapa"]].append(e)
+
+    for nombre, lista in por_etapa.items():
+        duracion = max(e["ts"] for e in lista) - min(e["ts"] for e in lista)
+        imprimir_resumen(nombre, agregar_eventos(lista, duracion))
@@ -0,0 +1,218 @@
+"""
+Planificador de recursos compartido por las etapas de CPU del pipeline.
+
+Cada script fijaba su propia concurrencia (5 procesos de rasterizado, 8 procesos
+de YOLO con los hilos intra-op por defecto de torch, el clasificador con todos
+los núcleos) y, ejecutados a la vez, se pisaban. Este módulo:
+
+- Lee los núcleos realmente disponibles: afinidad del proceso y cuota de CPU del
+  cgroup (v2 `cpu.max`, v1 `cpu.cfs_quota_us`), y el límite de memoria del cgroup
+  (o la memoria física si no hay límite). PIPELINE_CPUS los fija a mano.
+- Reparte los núcleos entre las etapas que corren a la vez según su peso, y dentro
+  de cada etapa decide procesos × hilos: tantos procesos como permitan sus núcleos
+  y la memoria (cada proceso carga su modelo), y el resto en hilos por proceso.
+- `configurar_hilos` aplica los hilos en cada worker (torch, OpenCV y las
+  variables OMP/MKL/OpenBLAS), pensado como `initializer` de ProcessPoolExecutor.
+
+Las descargas y el OCR esperan a la red y no entran en el reparto: sus hilos
+siguen en c_scraper_parallel.MAX_WORKERS y b_openai_api.NUM_WORKERS.
+
+Uso:
+    plan = planificar(["imagenes", "zonas"])   # {"imagenes": Asignacion(...), ...}
+    asignacion("zonas")                        # etapa ejecutada sola
+    python utils_recursos.py [etapa ...]       # muestra recursos detectados y plan
+"""
+
+import math
+import os
+import sys
+from dataclasses import asdict, dataclass
+
+# 🔧 Núcleos que se dejan para el sistema y el proceso principal de cada etapa
+NUCLEOS_RESERVADOS = 1
+# 🔧 Fracción de la memoria disponible que pueden ocupar los workers
+FRACCION_MEMORIA = 0.8
+
+VARIABLES_HILOS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+@dataclass
+class PerfilEtapa:
+    peso: float  # parte de los núcleos frente a otras etapas simultáneas
+    memoria_mb: int  # memoria estimada por proceso (modelo cargado incluido)
+    max_hilos: int  # hilos intra-op a partir de los cuales no mejora
+    max_procesos: int | None = None
+
+
+PERFILES = {
+    # pdfium/poppler: un hilo por página, escala con procesos
+    "imagenes": PerfilEtapa(peso=1.0, memoria_mb=300, max_hilos=1),
+    # EfficientNet-B0 en un solo proceso: escala con hilos de torch
+    "clasificacion": PerfilEtapa(peso=1.0, memoria_mb=700, max_hilos=4, max_procesos=1),
+    # YOLO: cada proceso carga el modelo, pocos hilos por proceso rinden más
+    "zonas": PerfilEtapa(peso=2.0, memoria_mb=900, max_hilos=4),
+}
+
+
+@dataclass
+class Asignacion:
+    procesos: int
+    hilos: int  # hilos intra-op por proceso
+    nucleos: float  # núcleos asignados a la etapa
+    memoria_mb: float  # memoria asignada a la etapa
+
+
+# ========== RECURSOS DETECTADOS ==========
+
+
+def _leer(path):
+    try:
+        with open(path, encoding="ascii") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def cuota_cgroup() -> float | None:
+    """Núcleos permitidos por la cuota de CPU del cgroup (None si no hay cuota)."""
+    cpu_max = _leer("/sys/fs/cgroup/cpu.max")  # cgroup v2: "<cuota> <periodo>" o "max <periodo>"
+    if cpu_max:
+        cuota, periodo = cpu_max.split()
+        return None if cuota == "max" else int(cuota) / int(periodo)
+
+    cuota = _leer("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")  # cgroup v1
+    periodo = _leer("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if cuota and periodo and int(cuota) > 0:
+        return int(cuota) / int(periodo)
+    return None
+
+
+def cpus_disponibles() -> int:
+    """Núcleos utilizables: afinidad del proceso acotada por la cuota del cgroup."""
+    if os.environ.get("PIPELINE_CPUS"):
+        return max(1, int(os.environ["PIPELINE_CPUS"]))
+
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS
+        cpus = os.cpu_count() or 1
+    cuota = cuota_cgroup()
+    if cuota is not None:
+        cpus = min(cpus, max(1, math.floor(cuota)))
+    return cpus
+
+
+def memoria_disponible_mb() -> float:
+    """Límite de memoria del cgroup o, si no hay, memoria física total."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        limite = _leer(path)
+        # cgroup v1 sin límite reporta un valor cercano a 2^63
+        if limite and limite != "max" and int(limite) < 1 << 60:
+            return int(limite) / 1024 / 1024
+
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (AttributeError, ValueError, OSError):
+        return float("inf")
+
+
+# ========== PLAN ==========
+
+
+def planificar(etapas, procesos=None, cpus=None, memoria_mb=None) -> dict[str, Asignacion]:
+    """
+    Reparte núcleos y memoria entre `etapas` (las que corren a la vez).
+
+    Args:
+        etapas: nombres de PERFILES
+        procesos: {etapa: procesos} fijados por el llamador (p. ej. 1 si la etapa corre
+            dentro del proceso principal); los hilos se ajustan a ese número
+        cpus, memoria_mb: recursos a repartir (por defecto, los detectados)
+
+    Returns:
+        dict[str, Asignacion]
+    """
+    procesos = procesos or {}
+    cpus = cpus_disponibles() if cpus is None else cpus
+    memoria_mb = memoria_disponible_mb() if memoria_mb is None else memoria_mb
+    nucleos_totales = max(1, cpus - NUCLEOS_RESERVADOS)
+    memoria_total = memoria_mb * FRACCION_MEMORIA
+    peso_total = sum(PERFILES[etapa].peso for etapa in etapas)
+
+    plan = {}
+    for etapa in etapas:
+        perfil = PERFILES[etapa]
+        fraccion = perfil.peso / peso_total
+        nucleos = nucleos_totales * fraccion
+        memoria = memoria_total * fraccion
+
+        if etapa in procesos:
+            n_procesos = max(1, procesos[etapa])
+        else:
+            n_procesos = max(1, math.floor(nucleos))
+            if perfil.max_procesos is not None:
+                n_procesos = min(n_procesos, perfil.max_procesos)
+            # Cada proceso carga su propio modelo: la memoria limita los procesos
+            if math.isfinite(memoria):
+                n_procesos = max(1, min(n_procesos, math.floor(memoria / perfil.memoria_mb)))
+
+        hilos = max(1, min(perfil.max_hilos, math.floor(nucleos / n_procesos)))
+        memoria = round(memoria) if math.isfinite(memoria) else memoria
+        plan[etapa] = Asignacion(n_procesos, hilos, round(nucleos, 2), memoria)
+    return plan
+
+
+def asignacion(etapa, procesos=None) -> Asignacion:
+    """Asignación de una etapa que corre sola (scripts ejecutados por separado)."""
+    fijos = {etapa: procesos} if procesos else None
+    return planificar([etapa], procesos=fijos)[etapa]
+
+
+def configurar_hilos(hilos: int) -> None:
+    """
+    Limita los hilos intra-op del proceso actual. Las variables de entorno cubren
+    las bibliotecas que se importen después; torch y OpenCV ya importados se ajustan
+    directamente.
+    """
+    for variable in VARIABLES_HILOS:
+        os.environ[variable] = str(hilos)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(hilos)
+    if "cv2" in sys.modules:
+        sys.modules["cv2"].setNumThreads(hilos)
+
+
+def describir(plan: dict[str, Asignacion]) -> dict:
+    """Plan serializable (para imprimir o registrar en métricas)."""
+    return {
+        "cpus": cpus_disponibles(),
+        "cuota_cgroup": cuota_cgroup(),
+        "memoria_mb": memoria_disponible_mb(),
+        "etapas": {etapa: asdict(asig) for etapa, asig in plan.items()},
+    }
+
+
+def imprimir_plan(plan: dict[str, Asignacion]) -> None:
+    datos = describir(plan)
+    cuota = datos["cuota_cgroup"]
+    print(
+        f"🧮 Recursos: {datos['cpus']} CPUs"
+        f"{f' (cuota cgroup {cuota:g})' if cuota is not None else ''}, "
+        f"{datos['memoria_mb']:.0f} MB de memoria"
+    )
+    for etapa, asig in plan.items():
+        print(
+            f"  {etapa:14} : {asig.procesos} procesos × {asig.hilos} hilos "
+            f"({asig.nucleos:g} núcleos, {asig.memoria_mb:.0f} MB)"
+        )
+
+
+if __name__ == "__main__":
+    etapas_cli = sys.argv[1:] or list(PERFILES)
+    desconocidas = [etapa for etapa in etapas_cli if etapa not in PERFILES]
+    if desconocidas:
+        print(
+            f"Etapas desconocidas: {', '.join(desconocidas)} (disponibles: {', '.join(PERFILES)})"
+        )
+        sys.exit(1)
+    imprimir_plan(planificar(etapas_cli))